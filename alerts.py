@@ -0,0 +1,250 @@
+# User-defined price alerts, checked against every batch of new prices.
+import bisect
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+from datetime import datetime
+
+DEFAULT_RULES_PATH = os.path.join(os.path.expanduser("~"), ".stock_tracker", "alerts.json")
+DEFAULT_LOG_PATH = os.path.join(os.path.expanduser("~"), ".stock_tracker", "alerts.log")
+
+# What a rule watches; all but 'price' are percentages
+METRICS = {
+    'price': "Price",
+    'move_open': "% since open",
+    'move_ytd': "% YTD",
+    'move_purchase': "% since purchase",
+    'drawdown': "Drawdown from high %",
+}
+OPS = ('>=', '<=')
+
+# Choices offered in the GUI: (label, metric, op)
+CONDITIONS = [
+    ("Price ≥", 'price', '>='),
+    ("Price ≤", 'price', '<='),
+    ("% since open ≥", 'move_open', '>='),
+    ("% since open ≤", 'move_open', '<='),
+    ("% YTD ≥", 'move_ytd', '>='),
+    ("% YTD ≤", 'move_ytd', '<='),
+    ("% since purchase ≥", 'move_purchase', '>='),
+    ("% since purchase ≤", 'move_purchase', '<='),
+    ("Drawdown from high % ≥", 'drawdown', '>='),
+]
+
+
+class AlertRule:
+    __slots__ = ('id', 'symbol', 'metric', 'op', 'threshold', 'note')
+
+    def __init__(self, id, symbol, metric, op, threshold, note=""):
+        self.id = id
+        self.symbol = symbol
+        self.metric = metric
+        self.op = op
+        self.threshold = threshold
+        self.note = note
+
+    def describe(self):
+        value = f"${self.threshold:,.2f}" if self.metric == 'price' else f"{self.threshold:+.2f}%"
+        return f"{self.symbol} {METRICS[self.metric]} {self.op} {value}"
+
+    def to_dict(self):
+        return {'symbol': self.symbol, 'metric': self.metric, 'op': self.op,
+                'threshold': self.threshold, 'note': self.note}
+
+
+class Alert:
+    __slots__ = ('rule', 'value', 'price', 'time')
+
+    def __init__(self, rule, value, price, time):
+        self.rule = rule
+        self.value = value
+        self.price = price
+        self.time = time
+
+    def message(self):
+        value = f"${self.value:,.2f}" if self.rule.metric == 'price' else f"{self.value:+.2f}%"
+        return f"{self.rule.describe()} (now {value}, price ${self.price:,.2f})"
+
+
+class AlertEngine:
+    """Rules indexed by symbol, metric and direction.
+
+    Each (symbol, metric, op) bucket keeps its thresholds sorted, so when
+    a metric moves from `previous` to `value` the rules it crossed are a
+    bisect range of that bucket. check() only looks at symbols that have
+    rules and whose price changed, which makes a refresh cost about
+    O(changed symbols * log rules) however many rules there are.
+
+    A rule fires when its condition becomes true: on the first price seen
+    if it already holds, afterwards only when the metric crosses the
+    threshold again.
+    """
+
+    def __init__(self):
+        self.rules = {}
+        self.buckets = {}
+        self.references = {}
+        self.last_price = {}
+        self.last_values = {}
+        self.pending = []
+        self.stale = set()
+        self._ids = itertools.count(1)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def add_rule(self, symbol, metric, op, threshold, note=""):
+        if metric not in METRICS:
+            raise ValueError(f"unknown metric {metric!r}")
+        if op not in OPS:
+            raise ValueError(f"unknown comparison {op!r}")
+        rule = AlertRule(next(self._ids), symbol.strip().upper(), metric, op, float(threshold), note)
+        self.rules[rule.id] = rule
+        bucket = self.buckets.setdefault(rule.symbol, {}).setdefault((metric, op), ([], []))
+        position = bisect.bisect_right(bucket[0], rule.threshold)
+        bucket[0].insert(position, rule.threshold)
+        bucket[1].insert(position, rule.id)
+
+        # A condition that already holds fires on the next check
+        value = self.last_values.get((rule.symbol, metric))
+        if value is not None and (value >= rule.threshold if op == '>=' else value <= rule.threshold):
+            self.pending.append(rule)
+        return rule
+
+    def remove_rule(self, rule_id):
+        rule = self.rules.pop(rule_id, None)
+        if rule is None:
+            return
+        symbol_buckets = self.buckets[rule.symbol]
+        thresholds, ids = symbol_buckets[(rule.metric, rule.op)]
+        position = ids.index(rule_id)
+        del thresholds[position]
+        del ids[position]
+        if not ids:
+            del symbol_buckets[(rule.metric, rule.op)]
+        if not symbol_buckets:
+            del self.buckets[rule.symbol]
+            self.last_price.pop(rule.symbol, None)
+
+    def clear(self):
+        self.rules.clear()
+        self.buckets.clear()
+        self.last_price.clear()
+        self.last_values.clear()
+        self.pending.clear()
+        self.stale.clear()
+
+    def set_reference(self, symbol, open=None, ytd_start=None, cost_basis=None, high=None):
+        """Prices the percentage metrics are measured from; None leaves a reference as it was"""
+        refs = self.references.setdefault(symbol, {})
+        for key, value in (('open', open), ('ytd_start', ytd_start), ('cost_basis', cost_basis)):
+            if value is not None:
+                refs[key] = value
+        if high is not None:
+            refs['high'] = max(high, refs.get('high', high))
+        # New references change the metrics; re-check the symbol even if its price didn't move
+        self.stale.add(symbol)
+
+    def metrics(self, symbol, price):
+        refs = self.references.get(symbol, {})
+        values = {'price': price}
+        for metric, key in (('move_open', 'open'), ('move_ytd', 'ytd_start'),
+                            ('move_purchase', 'cost_basis')):
+            reference = refs.get(key)
+            if reference:
+                values[metric] = (price / reference - 1) * 100
+        high = max(refs.get('high', price), price)
+        refs['high'] = high
+        if high > 0:
+            values['drawdown'] = (1 - price / high) * 100
+        return values
+
+    def check(self, quotes, now=None):
+        """Evaluate the rules for symbols in quotes ({ticker: price}); returns fired Alerts"""
+        now = now or datetime.now()
+        fired = [Alert(rule, self.last_values[(rule.symbol, rule.metric)], self.last_price[rule.symbol], now)
+                 for rule in self.pending if rule.id in self.rules and rule.symbol in self.last_price]
+        self.pending = []
+        for symbol in self.buckets.keys() & quotes.keys():
+            price = quotes[symbol]
+            if price is None or price != price:
+                continue
+            if self.last_price.get(symbol) == price and symbol not in self.stale:
+                continue
+            self.last_price[symbol] = price
+            self.stale.discard(symbol)
+            values = self.metrics(symbol, price)
+            for (metric, op), (thresholds, ids) in self.buckets[symbol].items():
+                value = values.get(metric)
+                if value is None:
+                    continue
+                previous = self.last_values.get((symbol, metric))
+                if op == '>=':
+                    # Thresholds in (previous, value] were crossed upwards
+                    lo = 0 if previous is None else bisect.bisect_right(thresholds, previous)
+                    hi = bisect.bisect_right(thresholds, value)
+                else:
+                    # Thresholds in [value, previous) were crossed downwards
+                    lo = bisect.bisect_left(thresholds, value)
+                    hi = len(thresholds) if previous is None else bisect.bisect_left(thresholds, previous)
+                for rule_id in ids[lo:hi]:
+                    fired.append(Alert(self.rules[rule_id], value, price, now))
+            for metric, value in values.items():
+                self.last_values[(symbol, metric)] = value
+        return fired
+
+    def to_list(self):
+        return [rule.to_dict() for rule in self.rules.values()]
+
+
+def load_rules(engine, path=DEFAULT_RULES_PATH):
+    """Add the rules saved at path to engine; returns how many were loaded"""
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        saved = json.load(f)
+    for item in saved:
+        engine.add_rule(item['symbol'], item['metric'], item['op'], item['threshold'], item.get('note', ""))
+    return len(saved)
+
+
+def save_rules(engine, path=DEFAULT_RULES_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(engine.to_list(), f, indent=1)
+    os.replace(tmp, path)
+
+
+def log_alerts(alerts, path=DEFAULT_LOG_PATH):
+    """Append fired alerts to the alert log, one line each"""
+    if not alerts:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a") as f:
+        for alert in alerts:
+            f.write(f"{alert.time:%Y-%m-%d %H:%M:%S}\t{alert.message()}\n")
+
+
+def desktop_notify(title, message):
+    """Best-effort desktop notification; returns False if no notifier is available"""
+    try:
+        if sys.platform == "darwin" and shutil.which("osascript"):
+            script = f"display notification {json.dumps(message)} with title {json.dumps(title)}"
+            subprocess.Popen(["osascript", "-e", script])
+        elif sys.platform.startswith("linux") and shutil.which("notify-send"):
+            subprocess.Popen(["notify-send", title, message])
+        elif sys.platform == "win32" and shutil.which("powershell"):
+            script = ("[reflection.assembly]::loadwithpartialname('System.Windows.Forms') | Out-Null;"
+                      "$n = New-Object System.Windows.Forms.NotifyIcon;"
+                      "$n.Icon = [System.Drawing.SystemIcons]::Information; $n.Visible = $true;"
+                      f"$n.ShowBalloonTip(10000, {json.dumps(title)}, {json.dumps(message)}, 'Info')")
+            subprocess.Popen(["powershell", "-NoProfile", "-Command", script])
+        else:
+            return False
+    except OSError:
+        return False
+    return True
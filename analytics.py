@@ -0,0 +1,294 @@
+# Rolling risk/return statistics for many symbols at once.
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from portfolio import build_price_matrix
+
+TRADING_DAYS = 252
+
+# Trailing return windows, in trading days
+RETURN_WINDOWS = {'1W': 5, '1M': 21, '3M': 63, '1Y': 252}
+
+# Calendar days of history to load: the 1Y window plus weekends and holidays
+LOOKBACK_DAYS = 400
+
+DEFAULT_BENCHMARK = "SPY"
+
+
+def lookback_start(now=None, days=LOOKBACK_DAYS):
+    """Start date string for the history the analytics need"""
+    now = now or datetime.now()
+    return (now - timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def forward_fill(matrix):
+    """Carry each column's last close over gaps (leading NaNs stay NaN)"""
+    valid = ~np.isnan(matrix)
+    rows = np.where(valid, np.arange(len(matrix))[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return matrix[rows, np.arange(matrix.shape[1])]
+
+
+class RollingAnalytics:
+    """Trailing returns, volatility, drawdown, beta and correlations.
+
+    Closes for every symbol (plus the benchmark) live in one aligned
+    (dates x symbols) matrix, forward-filled over gaps. Volatility, beta
+    and correlations use daily log returns over the last `window` bars and
+    are derived from running sums: per-symbol sum and sum of squares, and
+    the cross-product matrix R'R with its pairwise counts. A new bar adds
+    its return row and drops the one leaving the window (a rank-2 update
+    of R'R), so nothing is recomputed from scratch. Max drawdown covers
+    all loaded bars and is kept as a running peak/trough.
+
+    Returns missing for a symbol (before its first close) count as zero
+    in the sums and are left out of its counts.
+    """
+
+    def __init__(self, symbols, benchmark=DEFAULT_BENCHMARK, window=TRADING_DAYS):
+        self.symbols = list(symbols)
+        self.benchmark = benchmark
+        self.columns = list(self.symbols)
+        if benchmark and benchmark not in self.columns:
+            self.columns.append(benchmark)
+        self.bench_col = self.columns.index(benchmark) if benchmark else None
+        self.window = window
+
+        n = len(self.columns)
+        self.dates = np.empty(0, dtype='datetime64[D]')
+        self.closes = np.empty((0, n))
+        self.n_rows = 0
+        self._reset_state()
+
+    def _reset_state(self):
+        n = len(self.columns)
+        self.sum = np.zeros(n)
+        self.sumsq = np.zeros(n)
+        self.count = np.zeros(n)
+        self.cross = np.zeros((n, n))
+        self.pair_count = np.zeros((n, n))
+        self.peak = np.full(n, np.nan)
+        self.max_drawdown = np.zeros(n)
+        # Drawdown state before the last bar, so a revised last bar can be re-applied
+        self._drawdown_before_last = (self.peak.copy(), self.max_drawdown.copy())
+
+    @classmethod
+    def from_histories(cls, histories, symbols, benchmark=DEFAULT_BENCHMARK, window=TRADING_DAYS):
+        analytics = cls(symbols, benchmark, window)
+        dates, matrix = build_price_matrix(histories, analytics.columns)
+        analytics.load(dates, matrix)
+        return analytics
+
+    def __len__(self):
+        return self.n_rows
+
+    @property
+    def last_date(self):
+        return self.dates[self.n_rows - 1] if self.n_rows else None
+
+    # Loading and incremental updates
+    def load(self, dates, matrix):
+        """Rebuild every statistic from a full (dates x columns) close matrix"""
+        matrix = forward_fill(np.asarray(matrix, dtype=np.float64))
+        self.dates = np.asarray(dates, dtype='datetime64[D]').copy()
+        self.closes = matrix
+        self.n_rows = len(self.dates)
+        self._reset_state()
+        if not self.n_rows:
+            return
+
+        # Drawdown over all rows, in one pass per column
+        running_peak = np.fmax.accumulate(matrix, axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            drawdown = matrix / running_peak - 1
+        drawdown[np.isnan(drawdown)] = 0.0
+        self.max_drawdown = drawdown.min(axis=0)
+        self.peak = running_peak[-1].copy()
+        if self.n_rows > 1:
+            self._drawdown_before_last = (running_peak[-2].copy(), drawdown[:-1].min(axis=0))
+
+        # Sums over the return rows still inside the window
+        first = max(1, self.n_rows - self.window)
+        returns, valid = self._returns(first, self.n_rows)
+        self.sum = returns.sum(axis=0)
+        self.sumsq = (returns * returns).sum(axis=0)
+        self.count = valid.sum(axis=0)
+        self.cross = returns.T @ returns
+        self.pair_count = valid.T @ valid
+
+    def _returns(self, start, stop):
+        """Log returns of rows [start, stop) against the previous row, zero where missing"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            returns = np.log(self.closes[start:stop] / self.closes[start - 1:stop - 1])
+        valid = np.isfinite(returns)
+        return np.where(valid, returns, 0.0), valid.astype(np.float64)
+
+    def _apply_return(self, row, sign):
+        returns, valid = self._returns(row, row + 1)
+        returns, valid = returns[0], valid[0]
+        self.sum += sign * returns
+        self.sumsq += sign * returns * returns
+        self.count += sign * valid
+        self.cross += sign * np.outer(returns, returns)
+        self.pair_count += sign * np.outer(valid, valid)
+
+    def _apply_drawdown(self, prices):
+        self._drawdown_before_last = (self.peak.copy(), self.max_drawdown.copy())
+        self.peak = np.fmax(self.peak, prices)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            drawdown = prices / self.peak - 1
+        self.max_drawdown = np.fmin(self.max_drawdown, drawdown)
+
+    def append_bar(self, date, prices):
+        """Add one new bar (one close per column, NaN where unknown)"""
+        prices = np.asarray(prices, dtype=np.float64)
+        if self.n_rows:
+            prices = np.where(np.isnan(prices), self.closes[self.n_rows - 1], prices)
+
+        if self.n_rows == len(self.closes):
+            capacity = max(16, 2 * len(self.closes))
+            closes = np.full((capacity, len(self.columns)), np.nan)
+            closes[:self.n_rows] = self.closes[:self.n_rows]
+            dates = np.empty(capacity, dtype='datetime64[D]')
+            dates[:self.n_rows] = self.dates[:self.n_rows]
+            self.closes, self.dates = closes, dates
+
+        row = self.n_rows
+        self.closes[row] = prices
+        self.dates[row] = np.datetime64(date, 'D')
+        self.n_rows += 1
+        if row >= 1:
+            self._apply_return(row, 1)
+            dropped = row - self.window
+            if dropped >= 1:
+                self._apply_return(dropped, -1)
+        self._apply_drawdown(prices)
+
+    def revise_last_bar(self, prices):
+        """Replace the closes of the latest bar (e.g. an intraday quote moved)"""
+        row = self.n_rows - 1
+        prices = np.asarray(prices, dtype=np.float64)
+        prices = np.where(np.isnan(prices), self.closes[row], prices)
+        if row >= 1:
+            self._apply_return(row, -1)
+        self.closes[row] = prices
+        if row >= 1:
+            self._apply_return(row, 1)
+        self.peak, self.max_drawdown = self._drawdown_before_last
+        self._apply_drawdown(prices)
+
+    def update(self, dates, matrix):
+        """Apply bars from an aligned matrix: the last known date is revised,
+        later dates are appended and earlier ones ignored"""
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        last = self.last_date
+        for date, prices in zip(dates, matrix):
+            if last is None or date > last:
+                self.append_bar(date, prices)
+                last = date
+            elif date == last:
+                self.revise_last_bar(prices)
+
+    def update_histories(self, histories):
+        """Apply freshly fetched histories (only bars from last_date on matter)"""
+        dates, matrix = build_price_matrix(histories, self.columns)
+        if self.n_rows:
+            keep = dates >= self.last_date
+            dates, matrix = dates[keep], matrix[keep]
+        self.update(dates, matrix)
+
+    def update_quotes(self, quotes, date):
+        """Apply live last prices as the bar for `date`.
+
+        Returns True if any tracked symbol had a quote.
+        """
+        prices = np.array([quotes.get(ticker, np.nan) for ticker in self.columns], dtype=np.float64)
+        if np.isnan(prices).all():
+            return False
+        self.update([np.datetime64(date, 'D')], [prices])
+        return True
+
+    # Results
+    def _moments(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.sum / self.count
+            variance = self.sumsq / self.count - mean * mean
+        return mean, np.maximum(variance, 0.0)
+
+    def trailing_returns(self):
+        """{label: array of simple returns over that many bars}"""
+        results = {}
+        last = self.closes[self.n_rows - 1] if self.n_rows else np.full(len(self.columns), np.nan)
+        for label, bars in RETURN_WINDOWS.items():
+            if self.n_rows > bars:
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    results[label] = last / self.closes[self.n_rows - 1 - bars] - 1
+            else:
+                results[label] = np.full(len(self.columns), np.nan)
+        return results
+
+    def volatility(self):
+        """Annualized volatility of daily log returns over the window"""
+        _, variance = self._moments()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sample = variance * self.count / (self.count - 1)
+        return np.where(self.count > 1, np.sqrt(sample * TRADING_DAYS), np.nan)
+
+    def covariance(self):
+        """Covariance matrix of daily log returns (pairwise counts)"""
+        mean, _ = self._moments()
+        mean = np.nan_to_num(mean)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = self.cross / self.pair_count - np.outer(mean, mean)
+        cov[self.pair_count < 2] = np.nan
+        return cov
+
+    def beta(self):
+        if self.bench_col is None:
+            return np.full(len(self.columns), np.nan)
+        b = self.bench_col
+        mean, variance = self._moments()
+        mean = np.nan_to_num(mean)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = self.cross[:, b] / self.pair_count[:, b] - mean * mean[b]
+            beta = cov / variance[b]
+        beta[(self.pair_count[:, b] < 2) | (variance[b] == 0)] = np.nan
+        return beta
+
+    def correlation(self):
+        """Correlation matrix of the requested symbols as a DataFrame"""
+        n = len(self.symbols)
+        cov = self.covariance()[:n, :n]
+        _, variance = self._moments()
+        std = np.sqrt(variance[:n])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = np.clip(cov / np.outer(std, std), -1.0, 1.0)
+        np.fill_diagonal(corr, np.where(self.count[:n] > 1, 1.0, np.nan))
+        return pd.DataFrame(corr, index=self.symbols, columns=self.symbols)
+
+    def top_pairs(self, limit=200):
+        """The `limit` most strongly correlated (or anti-correlated) pairs,
+        as (symbol_a, symbol_b, correlation) sorted by |correlation|"""
+        corr = self.correlation().to_numpy()
+        upper_a, upper_b = np.triu_indices(len(self.symbols), k=1)
+        values = corr[upper_a, upper_b]
+        ok = ~np.isnan(values)
+        upper_a, upper_b, values = upper_a[ok], upper_b[ok], values[ok]
+        if len(values) > limit:
+            keep = np.argpartition(-np.abs(values), limit)[:limit]
+            upper_a, upper_b, values = upper_a[keep], upper_b[keep], values[keep]
+        order = np.argsort(-np.abs(values), kind='stable')
+        return [(self.symbols[upper_a[i]], self.symbols[upper_b[i]], float(values[i])) for i in order]
+
+    def summary(self):
+        """One row per requested symbol: last close, trailing returns,
+        volatility, max drawdown and beta (fractions, NaN when unknown)"""
+        n = len(self.symbols)
+        last = self.closes[self.n_rows - 1, :n] if self.n_rows else np.full(n, np.nan)
+        frame = pd.DataFrame({'ticker': self.symbols, 'last_price': last})
+        for label, values in self.trailing_returns().items():
+            frame[f'return_{label}'] = values[:n]
+        frame['volatility'] = self.volatility()[:n]
+        frame['max_drawdown'] = np.where(np.isnan(last), np.nan, self.max_drawdown[:n])
+        frame['beta'] = self.beta()[:n]
+        return frame
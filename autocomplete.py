@@ -0,0 +1,117 @@
+import tkinter as tk
+
+# Keys that move around the entry rather than change what's typed
+NAVIGATION_KEYS = {"Up", "Down", "Left", "Right", "Return", "KP_Enter", "Tab", "Escape",
+                   "Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R", "Home", "End"}
+
+
+class TickerCompleter:
+    """Drop-down ticker suggestions under an existing Entry.
+
+    On every keystroke the word being typed (the text after the last comma
+    when multiple=True) is looked up with index.complete(), which only
+    does a couple of binary searches, so the list keeps up with typing.
+    Up/Down move through the suggestions, Return or Tab accepts one and
+    Escape closes the list. `index` is a callable returning the current
+    SymbolIndex, since the index is swapped out when it is refreshed.
+    """
+
+    def __init__(self, entry, index, multiple=False, limit=8):
+        self.entry = entry
+        self.index = index
+        self.multiple = multiple
+        self.limit = limit
+        self.matches = []
+        self.popup = None
+        self.listbox = None
+
+        entry.bind("<KeyRelease>", self._on_key, add="+")
+        entry.bind("<Down>", lambda e: self._move(1))
+        entry.bind("<Up>", lambda e: self._move(-1))
+        entry.bind("<Return>", self._on_accept_key, add="+")
+        entry.bind("<Tab>", self._on_accept_key, add="+")
+        entry.bind("<Escape>", lambda e: self.hide())
+        # Delayed so a click on the list lands before it is closed
+        entry.bind("<FocusOut>", lambda e: entry.after(150, self.hide), add="+")
+
+    def _word(self):
+        text = self.entry.get()
+        if not self.multiple:
+            return 0, text
+        start = text.rfind(",") + 1
+        return start, text[start:]
+
+    def _on_key(self, event):
+        if event.keysym in NAVIGATION_KEYS:
+            return
+        _, word = self._word()
+        index = self.index()
+        self.matches = index.complete(word, self.limit) if index is not None and word.strip() else []
+        # Nothing to offer once the word is exactly the only match
+        if len(self.matches) == 1 and self.matches[0][0] == word.strip().upper():
+            self.matches = []
+        if self.matches:
+            self.show()
+        else:
+            self.hide()
+
+    def show(self):
+        if self.popup is None:
+            self.popup = tk.Toplevel(self.entry)
+            self.popup.overrideredirect(True)
+            self.listbox = tk.Listbox(self.popup, font=("Arial", 10), activestyle="none",
+                                      exportselection=False)
+            self.listbox.pack(fill=tk.BOTH, expand=True)
+            self.listbox.bind("<ButtonRelease-1>", lambda e: self.accept())
+        self.listbox.delete(0, tk.END)
+        for ticker, name, exchange in self.matches:
+            detail = " - ".join(part for part in (name, exchange) if part)
+            self.listbox.insert(tk.END, f"{ticker}  {detail}" if detail else ticker)
+        self.listbox.config(height=len(self.matches), width=max(30, self.entry.cget("width")))
+        self.listbox.selection_clear(0, tk.END)
+        x = self.entry.winfo_rootx()
+        y = self.entry.winfo_rooty() + self.entry.winfo_height()
+        self.popup.geometry(f"+{x}+{y}")
+        self.popup.deiconify()
+        self.popup.lift()
+
+    def hide(self):
+        self.matches = []
+        if self.popup is not None:
+            self.popup.withdraw()
+
+    @property
+    def visible(self):
+        return bool(self.matches) and self.popup is not None
+
+    def _move(self, step):
+        if not self.visible:
+            return None
+        current = self.listbox.curselection()
+        position = (current[0] + step if current else (0 if step > 0 else len(self.matches) - 1))
+        position = max(0, min(len(self.matches) - 1, position))
+        self.listbox.selection_clear(0, tk.END)
+        self.listbox.selection_set(position)
+        self.listbox.see(position)
+        return "break"
+
+    def _on_accept_key(self, event):
+        if self.visible and self.listbox.curselection():
+            self.accept()
+            return "break"
+        self.hide()
+        return None
+
+    def accept(self):
+        """Replace the word being typed with the selected (or first) ticker"""
+        if not self.visible:
+            return
+        current = self.listbox.curselection()
+        ticker = self.matches[current[0] if current else 0][0]
+        start, _ = self._word()
+        text = self.entry.get()
+        prefix = text[:start] + (" " if start and self.multiple else "")
+        self.entry.delete(0, tk.END)
+        self.entry.insert(0, prefix + ticker)
+        self.entry.icursor(tk.END)
+        self.hide()
@@ -0,0 +1,193 @@
+"""Offline benchmarks for the YTD and portfolio refresh paths.
+
+Runs the same fetch + compute code the GUI and CLI use against the
+synthetic provider, for several universe sizes and cache setups, and
+reports wall time, throughput and peak traced memory:
+
+    python benchmarks.py
+    python benchmarks.py --sizes 10 100 --latency 0.05 --repeat 3 --json bench.json
+    python benchmarks.py --sizes 1000 --cache none --processes 4
+"""
+import argparse
+import functools
+import gc
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+
+import market_data
+from fake_provider import SyntheticProvider, synthetic_symbols
+from history_cache import HistoryCache
+from portfolio import Holdings
+from price_cache import PriceCache
+from process_pool import ShardPool, iter_portfolio_sharded, iter_ytd_sharded
+from tracker_core import iter_portfolio, iter_ytd
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+CACHE_MODES = ['none', 'sqlite-cold', 'sqlite-warm', 'memory-warm']
+
+
+def make_holdings(lot_count, symbols, seed=0):
+    """lot_count lots spread over the given symbols with purchase dates in the last two years"""
+    rng = np.random.default_rng(seed)
+    holdings = Holdings()
+    today = np.datetime64(datetime.now().strftime("%Y-%m-%d"))
+    holdings.extend([symbols[i] for i in rng.integers(0, len(symbols), lot_count)],
+                    rng.uniform(1, 500, lot_count).round(2),
+                    today - rng.integers(5, 730, lot_count))
+    return holdings
+
+
+def run_ytd(source, symbols, chunk_size):
+    return sum(1 for _ in iter_ytd(symbols, source, chunk_size=chunk_size))
+
+
+def run_portfolio(source, holdings, chunk_size):
+    return sum(len(lots) for lots, _ in iter_portfolio(holdings, source, chunk_size=chunk_size))
+
+
+class CacheSetup:
+    """Builds the price source for one cache mode, warming it when needed"""
+
+    def __init__(self, mode, workdir):
+        self.mode = mode
+        self.workdir = workdir
+        self.counter = 0
+
+    def source(self, warm_with=None):
+        if self.mode == 'none':
+            return market_data
+        self.counter += 1
+        store = PriceCache(os.path.join(self.workdir, f"prices{self.counter}.db"), today_ttl=3600)
+        source = HistoryCache(store) if self.mode == 'memory-warm' else store
+        if self.mode != 'sqlite-cold' and warm_with is not None:
+            warm_with(source)
+        return source
+
+
+def measure(run, make_source, repeat, provider):
+    """Best wall time over `repeat` runs, then one traced run for peak
+    memory and the number of provider requests a single refresh makes"""
+    times = []
+    items = 0
+    for _ in range(repeat):
+        source = make_source()
+        gc.collect()
+        start = time.perf_counter()
+        items = run(source)
+        times.append(time.perf_counter() - start)
+
+    source = make_source()
+    gc.collect()
+    calls_before = provider.calls
+    tracemalloc.start()
+    run(source)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), items, peak, provider.calls - calls_before
+
+
+def run_benchmarks(sizes, repeat=1, latency=0.0, error_rate=0.0, chunk_size=100, modes=CACHE_MODES, seed=0,
+                   processes=0):
+    make_provider = functools.partial(SyntheticProvider, seed=seed, latency=latency, error_rate=error_rate,
+                                      history_start=f"{datetime.now().year - 3}-01-01")
+    provider = make_provider()
+    previous_provider = market_data.get_default_provider()
+    market_data.set_default_provider(provider)
+    workdir = tempfile.mkdtemp(prefix="stock_tracker_bench_")
+    results = []
+    # Worker processes start once, outside the timings; they fetch uncached
+    pool = None
+    if processes > 1:
+        pool = ShardPool(processes, source=market_data, source_options={'use_cache': False},
+                         provider_factory=make_provider, chunk_size=chunk_size)
+    try:
+        for size in sizes:
+            symbols = synthetic_symbols(size)
+            holdings = make_holdings(size, synthetic_symbols(max(1, size // 4)), seed=seed)
+            scenarios = [
+                ('ytd', lambda source: run_ytd(source, symbols, chunk_size)),
+                ('portfolio', lambda source: run_portfolio(source, holdings, chunk_size)),
+            ]
+            for name, run in scenarios:
+                for mode in modes:
+                    setup = CacheSetup(mode, workdir)
+                    seconds, items, peak, calls = measure(
+                        run, lambda: setup.source(warm_with=run), repeat, provider)
+                    results.append({
+                        'scenario': name,
+                        'size': size,
+                        'cache': mode,
+                        'seconds': seconds,
+                        'items': items,
+                        'items_per_sec': items / seconds if seconds else float('inf'),
+                        'peak_mb': peak / (1024 * 1024),
+                        'provider_calls': calls,
+                    })
+                    print(format_row(results[-1]), flush=True)
+            if pool is not None:
+                sharded = [
+                    ('ytd', lambda _: sum(1 for _ in iter_ytd_sharded(symbols, pool))),
+                    ('portfolio', lambda _: sum(len(lots) for lots, _ in iter_portfolio_sharded(holdings, pool))),
+                ]
+                for name, run in sharded:
+                    # Requests are made in the workers, so the parent's provider sees none
+                    seconds, items, peak, calls = measure(run, lambda: None, repeat, provider)
+                    results.append({
+                        'scenario': name,
+                        'size': size,
+                        'cache': f'procs-{processes}',
+                        'seconds': seconds,
+                        'items': items,
+                        'items_per_sec': items / seconds if seconds else float('inf'),
+                        'peak_mb': peak / (1024 * 1024),
+                        'provider_calls': calls,
+                    })
+                    print(format_row(results[-1]), flush=True)
+    finally:
+        if pool is not None:
+            pool.close()
+        market_data.set_default_provider(previous_provider)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def format_row(row):
+    return (f"{row['scenario']:<10} {row['size']:>7,} {row['cache']:<12} "
+            f"{row['seconds'] * 1000:>10.1f} ms {row['items_per_sec']:>12,.0f}/s "
+            f"{row['peak_mb']:>9.1f} MB {row['provider_calls']:>6} calls")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark YTD and portfolio refreshes offline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="symbol counts for YTD and lot counts for the portfolio")
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per case (best is reported)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of simulated latency per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of symbols that fail")
+    parser.add_argument("--chunk-size", type=int, default=100, help="symbols per bulk request")
+    parser.add_argument("--cache", choices=CACHE_MODES, nargs="+", default=CACHE_MODES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=0,
+                        help="also run each size sharded across this many worker processes")
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    args = parser.parse_args(argv)
+
+    print(f"{'scenario':<10} {'size':>7} {'cache':<12} {'wall':>13} {'throughput':>14} "
+          f"{'peak mem':>12} {'requests':>11}")
+    results = run_benchmarks(args.sizes, repeat=args.repeat, latency=args.latency,
+                             error_rate=args.error_rate, chunk_size=args.chunk_size,
+                             modes=args.cache, seed=args.seed, processes=args.processes)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,341 @@
+import argparse
+import csv
+import json
+import math
+import sys
+
+YTD_FIELDS = ['ticker', 'current_price', 'ytd_start_price', 'ytd_change_pct', 'status', 'error']
+LOT_FIELDS = ['ticker', 'shares', 'purchase_date', 'purchase_price', 'current_price',
+              'cost', 'value', 'gain', 'gain_pct', 'status', 'currency', 'adjusted']
+HISTORY_FIELDS = ['date', 'value', 'flow', 'invested', 'twr']
+BAR_FIELDS = ['ticker', 'time', 'open', 'high', 'low', 'close', 'volume']
+
+
+class RowWriter:
+    """Writes result rows to a stream as they are produced.
+
+    csv writes a header then one line per row; json writes a single array
+    whose elements are emitted one at a time, so nothing is buffered.
+    """
+
+    def __init__(self, out, fmt, fields):
+        self.out = out
+        self.fmt = fmt
+        self.fields = fields
+        self.count = 0
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(out, fieldnames=fields, extrasaction='ignore')
+            self.writer.writeheader()
+        else:
+            out.write("[")
+
+    def write(self, row):
+        row = {field: _clean(row.get(field)) for field in self.fields}
+        if self.fmt == 'csv':
+            self.writer.writerow(row)
+        else:
+            self.out.write(("\n  " if self.count == 0 else ",\n  ") + json.dumps(row))
+        self.count += 1
+        self.out.flush()
+
+    def close(self):
+        if self.fmt == 'json':
+            self.out.write("\n]\n" if self.count else "]\n")
+        self.out.flush()
+
+
+def _clean(value):
+    if value is None:
+        return None
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float):
+        return None if math.isnan(value) else round(value, 4)
+    return value if isinstance(value, (int, str)) else str(value)
+
+
+def _shard_pool(args, source):
+    """A ShardPool for --processes, or None to fetch in this process"""
+    if args.processes <= 1:
+        return None
+    from process_pool import ShardPool
+
+    pool = ShardPool(args.processes, source=source, chunk_size=args.chunk_size,
+                     source_options={'use_cache': not args.no_cache, 'archive_path': args.archive})
+    if pool.in_process:
+        print(f"Process pool unavailable ({pool.fallback_reason}); running in-process", file=sys.stderr)
+    return pool
+
+
+def cmd_ytd(args):
+    from process_pool import iter_ytd_sharded
+    from symbol_index import SymbolIndex
+    from tracker_core import iter_ytd, make_source
+
+    # Checked against the local symbol list first, so typos don't cost a download
+    tickers, problems = SymbolIndex.load().check(args.tickers.split(","), allow_unknown=args.allow_unknown)
+    for ticker, problem in problems.items():
+        print(f"{ticker}: {problem}; skipped", file=sys.stderr)
+    source = make_source(use_cache=not args.no_cache, archive_path=args.archive)
+    pool = _shard_pool(args, source)
+    rows = (iter_ytd(tickers, source, chunk_size=args.chunk_size) if pool is None
+            else iter_ytd_sharded(tickers, pool))
+    writer = RowWriter(sys.stdout, args.format, YTD_FIELDS)
+    try:
+        for row in rows:
+            writer.write(row)
+    finally:
+        if pool is not None:
+            pool.close()
+    writer.close()
+    return 0
+
+
+def cmd_portfolio(args):
+    from corporate_actions import Valuation, currency_symbol
+    from portfolio import STATUS_ERROR, STATUS_NO_DATA, summarize_lots
+    from holdings_io import import_holdings
+    from process_pool import iter_portfolio_sharded
+    from tracker_core import iter_portfolio, make_source
+
+    status_names = {STATUS_ERROR: 'ERROR', STATUS_NO_DATA: 'NO DATA'}
+    holdings, report = import_holdings(args.holdings)
+    if report.errors:
+        print(report.summary(), file=sys.stderr)
+        for line in report.error_lines(limit=20):
+            print(f"  {line}", file=sys.stderr)
+    source = make_source(use_cache=not args.no_cache, archive_path=args.archive)
+    valuation = Valuation(source, base_currency=args.base_currency.upper(), total_return=args.total_return)
+    pool = _shard_pool(args, source)
+    chunks = (iter_portfolio(holdings, source, chunk_size=args.chunk_size, valuation=valuation) if pool is None
+              else iter_portfolio_sharded(holdings, pool, valuation=valuation))
+    writer = RowWriter(sys.stdout, args.format, LOT_FIELDS)
+
+    totals = {'cost': 0.0, 'value': 0.0}
+    try:
+        for lots, errors in chunks:
+            for ticker, error in errors.items():
+                print(f"{ticker}: {error}", file=sys.stderr)
+            chunk_totals = summarize_lots(lots)
+            totals['cost'] += chunk_totals['cost']
+            totals['value'] += chunk_totals['value']
+            for row in lots.to_dict('records'):
+                row['purchase_date'] = str(row['purchase_date'])[:10]
+                row['status'] = status_names.get(row['status'], 'OK')
+                writer.write(row)
+    finally:
+        if pool is not None:
+            pool.close()
+    writer.close()
+
+    gain = totals['value'] - totals['cost']
+    gain_pct = gain / totals['cost'] * 100 if totals['cost'] > 0 else 0.0
+    money = currency_symbol(valuation.base_currency)
+    print(f"Total Investment: {money}{totals['cost']:,.2f}  Current Value: {money}{totals['value']:,.2f}  "
+          f"Total Gain/Loss: {money}{gain:+,.2f} ({gain_pct:+.2f}%)", file=sys.stderr)
+    return 0
+
+
+def cmd_history(args):
+    from corporate_actions import Valuation
+    from holdings_io import import_holdings
+    from portfolio_history import (PortfolioHistoryStore, history_stats, time_weighted_returns,
+                                   update_portfolio_history)
+    from tracker_core import make_source
+
+    holdings, report = import_holdings(args.holdings)
+    if report.errors:
+        print(report.summary(), file=sys.stderr)
+    source = make_source(use_cache=not args.no_cache, archive_path=args.archive)
+    store = None if args.no_cache else PortfolioHistoryStore()
+    valuation = Valuation(source, base_currency=args.base_currency.upper(), total_return=args.total_return)
+    series, errors = update_portfolio_history(holdings, source, store, chunk_size=args.chunk_size,
+                                              valuation=valuation)
+    for ticker, error in errors.items():
+        print(f"{ticker}: {error}", file=sys.stderr)
+
+    writer = RowWriter(sys.stdout, args.format, HISTORY_FIELDS)
+    twr = time_weighted_returns(series).to_numpy()
+    invested = series['flow'].cumsum().to_numpy()
+    for i, (date, row) in enumerate(zip(series.index.strftime("%Y-%m-%d"), series.itertuples(index=False))):
+        writer.write({'date': date, 'value': row.value, 'flow': row.flow,
+                      'invested': invested[i], 'twr': twr[i]})
+    writer.close()
+
+    stats = history_stats(series)
+    if stats['start'] is not None:
+        irr = "N/A" if stats['xirr'] is None else f"{stats['xirr'] * 100:+.2f}%/yr"
+        print(f"Time-weighted return: {stats['twr'] * 100:+.2f}%  Money-weighted (XIRR): {irr}",
+              file=sys.stderr)
+    return 0
+
+
+def cmd_archive(args):
+    import numpy as np
+    from compact_series import write_archive
+    from corporate_actions import action_rows, find_actions_store
+    from market_data import chunked
+    from tracker_core import make_source, parse_tickers
+
+    tickers = parse_tickers(args.tickers) if args.tickers else []
+    if args.tickers_file:
+        with open(args.tickers_file) as f:
+            tickers += parse_tickers(",".join(line.split("#")[0] for line in f))
+    source = make_source(use_cache=not args.no_cache)
+
+    histories = {}
+    for chunk in chunked(tickers, args.chunk_size):
+        fetched, errors = source.fetch_histories(chunk, start=args.start)
+        histories.update(fetched)
+        for ticker, error in errors.items():
+            print(f"{ticker}: {error}", file=sys.stderr)
+    actions = action_rows(find_actions_store(source), list(histories), histories)
+    count = write_archive(args.path, histories, dtype=np.float64 if args.float64 else np.float32,
+                          keep_ohlc=args.ohlc, actions=actions)
+    print(f"Wrote {count:,} symbols to {args.path}", file=sys.stderr)
+    return 0
+
+
+def cmd_intraday(args):
+    from intraday import TIMEFRAMES, IntradayAggregator
+    from market_data import fetch_intraday
+    from symbol_index import SymbolIndex
+
+    tickers, problems = SymbolIndex.load().check(args.tickers.split(","), allow_unknown=args.allow_unknown)
+    for ticker, problem in problems.items():
+        print(f"{ticker}: {problem}; skipped", file=sys.stderr)
+    # Two sessions, so the change is measured from the previous close
+    bars, errors = fetch_intraday(tickers, period="2d", chunk_size=args.chunk_size)
+    for ticker, error in errors.items():
+        print(f"{ticker}: {error}", file=sys.stderr)
+
+    aggregator = IntradayAggregator()
+    writer = RowWriter(sys.stdout, args.format, BAR_FIELDS)
+    for ticker in tickers:
+        if not aggregator.ingest(ticker, bars.get(ticker)):
+            continue
+        frame = aggregator.bars(ticker, TIMEFRAMES[args.interval])
+        for time, bar in zip(frame.index.strftime("%Y-%m-%d %H:%M"), frame.itertuples(index=False)):
+            writer.write({'ticker': ticker, 'time': time, 'open': bar.Open, 'high': bar.High,
+                          'low': bar.Low, 'close': bar.Close, 'volume': bar.Volume})
+    writer.close()
+
+    for ticker in tickers:
+        session = aggregator.session(ticker)
+        if session is not None:
+            change = "N/A" if session['change_pct'] is None else f"{session['change_pct']:+.2f}%"
+            print(f"{ticker}: last {session['last']:,.2f} at {session['time']:%H:%M}, "
+                  f"session change {change}", file=sys.stderr)
+    return 0
+
+
+def cmd_symbols(args):
+    from symbol_index import DEFAULT_INDEX_PATH, SymbolIndex, refresh_symbol_index
+
+    path = args.file or DEFAULT_INDEX_PATH
+    index = SymbolIndex.load(path)
+    if args.refresh or (index.is_stale() and not args.query):
+        try:
+            index = refresh_symbol_index(index.records(), path)
+        except OSError as e:
+            print(f"Could not download the symbol list: {e}", file=sys.stderr)
+            return 1
+        print(f"{len(index):,} symbols saved to {path}", file=sys.stderr)
+    for query in args.query:
+        for ticker, name, exchange in index.complete(query, args.limit):
+            print(f"{ticker}\t{name}\t{exchange}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m stock_tracker",
+        description="Headless YTD and portfolio reports (run without arguments for the GUI)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always download instead of using the local price cache")
+    parser.add_argument("--chunk-size", type=int, default=100,
+                        help="symbols per bulk download (default: 100)")
+    parser.add_argument("--archive", metavar="DIR",
+                        help="serve prices from a memory-mapped archive made with the archive command")
+    parser.add_argument("--processes", type=int, default=0, metavar="N",
+                        help="shard ytd/portfolio fetches across N worker processes (default: 0, in-process)")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="write fetch/cache/compute timings as a Chrome trace (chrome://tracing)")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="run under cProfile and write the stats to PATH (.prof)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ytd = sub.add_parser("ytd", help="year-to-date performance for a list of tickers")
+    ytd.add_argument("tickers", help="comma-separated tickers, e.g. AAPL,MSFT")
+    ytd.add_argument("--format", choices=["csv", "json"], default="csv")
+    ytd.add_argument("--allow-unknown", action="store_true",
+                     help="fetch tickers that aren't in the local symbol list instead of skipping them")
+    ytd.set_defaults(func=cmd_ytd)
+
+    portfolio = sub.add_parser("portfolio", help="value the lots in a holdings CSV")
+    portfolio.add_argument("holdings", help="CSV/JSON export with ticker, shares, purchase_date columns")
+    portfolio.add_argument("--format", choices=["csv", "json"], default="csv")
+    portfolio.add_argument("--base-currency", default="USD",
+                           help="currency to value lots in, converting non-USD listings (default: USD)")
+    portfolio.add_argument("--total-return", action="store_true",
+                           help="reinvest dividends instead of reporting price return only")
+    portfolio.set_defaults(func=cmd_portfolio)
+
+    history = sub.add_parser("history", help="daily portfolio value with time- and money-weighted returns")
+    history.add_argument("holdings", help="CSV/JSON export with ticker, shares, purchase_date columns")
+    history.add_argument("--format", choices=["csv", "json"], default="csv")
+    history.add_argument("--base-currency", default="USD",
+                         help="currency to value the portfolio in (default: USD)")
+    history.add_argument("--total-return", action="store_true",
+                         help="reinvest dividends instead of reporting price return only")
+    history.set_defaults(func=cmd_history)
+
+    archive = sub.add_parser("archive", help="write daily closes to a compact memory-mapped archive")
+    archive.add_argument("path", help="archive directory to create or overwrite")
+    archive.add_argument("tickers", nargs="?", help="comma-separated tickers")
+    archive.add_argument("--tickers-file", help="file with one ticker per line")
+    archive.add_argument("--start", default="2015-01-01", help="first date to include (default: 2015-01-01)")
+    archive.add_argument("--ohlc", action="store_true", help="also keep open/high/low")
+    archive.add_argument("--float64", action="store_true", help="store float64 instead of float32")
+    archive.set_defaults(func=cmd_archive)
+
+    intraday = sub.add_parser("intraday", help="today's session bars and change for a list of tickers")
+    intraday.add_argument("tickers", help="comma-separated tickers, e.g. AAPL,MSFT")
+    intraday.add_argument("--interval", choices=["1m", "5m", "15m", "30m", "60m"], default="5m",
+                          help="bar size, rolled up from minute bars (default: 5m)")
+    intraday.add_argument("--format", choices=["csv", "json"], default="csv")
+    intraday.add_argument("--allow-unknown", action="store_true",
+                          help="fetch tickers that aren't in the local symbol list instead of skipping them")
+    intraday.set_defaults(func=cmd_intraday)
+
+    symbols = sub.add_parser("symbols", help="refresh or search the local symbol list")
+    symbols.add_argument("query", nargs="*", help="tickers or company names to look up")
+    symbols.add_argument("--refresh", action="store_true", help="re-download the listings now")
+    symbols.add_argument("--file", help="symbol list to use (CSV with ticker,name,exchange columns)")
+    symbols.add_argument("--limit", type=int, default=10, help="matches per query (default: 10)")
+    symbols.set_defaults(func=cmd_symbols)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        return args.func(args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if args.trace:
+            from instrumentation import format_summary, tracer
+            tracer.export_chrome_trace(args.trace)
+            for line in format_summary(tracer.summary()):
+                print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
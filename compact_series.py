@@ -0,0 +1,251 @@
+# Compact price series: int32 day numbers and close-only float arrays,
+# in memory and as a memory-mapped on-disk archive.
+import json
+import os
+import numpy as np
+import pandas as pd
+from market_data import unique_tickers
+
+ARCHIVE_VERSION = 1
+OHLC_FIELDS = ('Open', 'High', 'Low')
+
+# actions.npy rows: symbol id, day number and the action's factors
+ACTION_DTYPE = np.dtype([('symbol', np.int32), ('day', np.int32),
+                         ('split', np.float64), ('dividend_factor', np.float64)])
+
+
+def day_numbers(index):
+    """Dates (DatetimeIndex, tz-aware or not, or datetime64 values) as int32 days since 1970-01-01"""
+    if isinstance(index, pd.DatetimeIndex):
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        index = index.values
+    return np.asarray(index).astype('datetime64[D]').astype(np.int32)
+
+
+def day_index(days):
+    """Inverse of day_numbers: a tz-naive DatetimeIndex named 'Date'"""
+    return pd.DatetimeIndex(np.asarray(days, dtype=np.int32).astype('datetime64[D]').astype('datetime64[ns]'),
+                            name='Date')
+
+
+def _day(value):
+    return int(np.datetime64(str(value)[:10], 'D').astype(np.int32))
+
+
+class CompactHistory:
+    """One symbol's daily bars as plain arrays.
+
+    days are int32 day numbers, close is float32 or float64, and ohlc is
+    an optional (n x 3) Open/High/Low array. Nothing else from the
+    provider's frame (volume, dividends, splits, the tz-aware index) is
+    kept, since only the close is used. to_frame() rebuilds the small
+    DataFrame the rest of the app expects.
+    """
+
+    __slots__ = ('days', 'close', 'ohlc')
+
+    def __init__(self, days, close, ohlc=None):
+        self.days = days
+        self.close = close
+        self.ohlc = ohlc
+
+    @classmethod
+    def from_frame(cls, hist, dtype=np.float64, keep_ohlc=False):
+        if hist is None or hist.empty:
+            return cls(np.empty(0, dtype=np.int32), np.empty(0, dtype=dtype))
+        ohlc = None
+        if keep_ohlc and all(field in hist.columns for field in OHLC_FIELDS):
+            ohlc = hist[list(OHLC_FIELDS)].to_numpy(dtype=dtype)
+        return cls(day_numbers(hist.index), hist['Close'].to_numpy(dtype=dtype), ohlc)
+
+    def __len__(self):
+        return len(self.days)
+
+    @property
+    def nbytes(self):
+        return self.days.nbytes + self.close.nbytes + (self.ohlc.nbytes if self.ohlc is not None else 0)
+
+    def slice(self, start=None, end=None):
+        """Bars in [start, end), as views on the same arrays"""
+        lo = 0 if start is None else np.searchsorted(self.days, _day(start))
+        hi = len(self.days) if end is None else np.searchsorted(self.days, _day(end))
+        return CompactHistory(self.days[lo:hi], self.close[lo:hi],
+                              None if self.ohlc is None else self.ohlc[lo:hi])
+
+    def to_frame(self):
+        if not len(self.days):
+            return pd.DataFrame()
+        columns = {'Close': self.close}
+        if self.ohlc is not None:
+            columns = {field: self.ohlc[:, i] for i, field in enumerate(OHLC_FIELDS)}
+            columns['Close'] = self.close
+        return pd.DataFrame(columns, index=day_index(self.days), copy=False)
+
+
+def write_archive(path, histories, dtype=np.float32, keep_ohlc=False, actions=None):
+    """Write histories ({ticker: frame}) as a memory-mappable archive directory.
+
+    Layout: meta.json (symbols in id order, dtype, fields), days.npy (the
+    shared int32 calendar) and close.npy, a (symbols x days) matrix with
+    NaN where a symbol has no bar, so each symbol's series is contiguous
+    on disk. With keep_ohlc, open/high/low.npy have the same shape.
+    actions, (rows, covered) as PriceCache.action_rows() returns them, are
+    kept in actions.npy with the covered symbols in meta.json, so prices
+    and the splits/dividends they're adjusted for stay on the same basis.
+    Returns the number of symbols written.
+    """
+    os.makedirs(path, exist_ok=True)
+    symbols = [ticker for ticker in unique_tickers(histories) if not histories[ticker].empty]
+    symbol_days = {ticker: day_numbers(histories[ticker].index) for ticker in symbols}
+    days = (np.unique(np.concatenate(list(symbol_days.values()))) if symbols
+            else np.empty(0, dtype=np.int32)).astype(np.int32)
+    fields = ['Close'] + (list(OHLC_FIELDS) if keep_ohlc else [])
+
+    # Each file is written under a temporary name and moved into place
+    tmp = os.path.join(path, "days.npy.tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, days)
+    os.replace(tmp, os.path.join(path, "days.npy"))
+    for field in fields:
+        tmp = os.path.join(path, f"{field.lower()}.npy.tmp")
+        # Filled one symbol at a time through a memmap, so the whole
+        # matrix never has to be in memory at once
+        matrix = np.lib.format.open_memmap(tmp, mode='w+', dtype=dtype, shape=(len(symbols), len(days)))
+        for row, ticker in enumerate(symbols):
+            matrix[row] = np.nan
+            columns = np.searchsorted(days, symbol_days[ticker])
+            matrix[row, columns] = histories[ticker][field].to_numpy(dtype=dtype)
+        matrix.flush()
+        del matrix
+        os.replace(tmp, os.path.join(path, f"{field.lower()}.npy"))
+
+    meta = {'version': ARCHIVE_VERSION, 'symbols': symbols,
+            'dtype': np.dtype(dtype).name, 'fields': fields}
+    actions_path = os.path.join(path, "actions.npy")
+    if actions is not None:
+        rows, covered = actions
+        symbol_ids = {ticker: i for i, ticker in enumerate(symbols)}
+        table = np.array([(symbol_ids[row[0]],) + tuple(row[1:]) for row in rows if row[0] in symbol_ids],
+                         dtype=ACTION_DTYPE)
+        with open(actions_path + ".tmp", "wb") as f:
+            np.save(f, table)
+        os.replace(actions_path + ".tmp", actions_path)
+        meta['action_symbols'] = sorted(symbol_ids[ticker] for ticker in covered if ticker in symbol_ids)
+    elif os.path.exists(actions_path):
+        # Left from an earlier archive in the same directory
+        os.remove(actions_path)
+
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return len(symbols)
+
+
+class PriceArchive:
+    """Read-only, memory-mapped view of an archive made by write_archive().
+
+    Opening one only reads meta.json and the calendar; price rows are
+    paged in by the OS as they are touched. fetch_histories() follows the
+    market_data contract, so an archive can stand in for the price source.
+    Symbols not in the archive go to `fallback` (another source) if one
+    is given, otherwise they are reported as errors. action_rows() serves
+    the splits and dividends stored with the prices, so a Valuation finds
+    the archive as its actions store.
+    """
+
+    def __init__(self, path, fallback=None):
+        self.path = path
+        self.fallback = fallback
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get('version') != ARCHIVE_VERSION:
+            raise ValueError(f"unsupported archive version {meta.get('version')!r} in {path}")
+        self.symbols = meta['symbols']
+        self.symbol_ids = {ticker: i for i, ticker in enumerate(self.symbols)}
+        self.fields = meta['fields']
+        self.days = np.load(os.path.join(path, "days.npy"))
+        self.arrays = {field: np.load(os.path.join(path, f"{field.lower()}.npy"), mmap_mode='r')
+                       for field in self.fields}
+        # Archives written without actions cover no symbol's splits and dividends
+        self.action_symbols = set(meta.get('action_symbols', ()))
+        self.actions = (np.load(os.path.join(path, "actions.npy")) if 'action_symbols' in meta
+                        else np.empty(0, dtype=ACTION_DTYPE))
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, ticker):
+        return ticker in self.symbol_ids
+
+    @property
+    def nbytes(self):
+        return self.days.nbytes + sum(array.nbytes for array in self.arrays.values())
+
+    def _columns(self, start, end):
+        lo = 0 if start is None else np.searchsorted(self.days, _day(start))
+        hi = len(self.days) if end is None else np.searchsorted(self.days, _day(end))
+        return lo, hi
+
+    def series(self, ticker, start=None, end=None):
+        """CompactHistory for one symbol in [start, end), without the NaN padding"""
+        row = self.symbol_ids[ticker]
+        lo, hi = self._columns(start, end)
+        close = np.asarray(self.arrays['Close'][row, lo:hi])
+        present = ~np.isnan(close)
+        ohlc = None
+        if all(field in self.arrays for field in OHLC_FIELDS):
+            ohlc = np.column_stack([np.asarray(self.arrays[field][row, lo:hi])[present]
+                                    for field in OHLC_FIELDS])
+        return CompactHistory(self.days[lo:hi][present], close[present], ohlc)
+
+    def matrix(self, symbols, start=None, end=None):
+        """(dates, dates x symbols close matrix) like portfolio.build_price_matrix,
+        read straight from the archive; symbols it lacks are all-NaN columns"""
+        lo, hi = self._columns(start, end)
+        close = self.arrays['Close']
+        matrix = np.full((hi - lo, len(symbols)), np.nan)
+        for col, ticker in enumerate(symbols):
+            row = self.symbol_ids.get(ticker)
+            if row is not None:
+                matrix[:, col] = close[row, lo:hi]
+        return self.days[lo:hi].astype('datetime64[D]'), matrix
+
+    def action_rows(self, tickers):
+        """Same contract as PriceCache.action_rows(): archived symbols from
+        the archive, the rest from the store behind the fallback, if any"""
+        from corporate_actions import find_actions_store
+
+        tickers = unique_tickers(tickers)
+        ids = np.array([self.symbol_ids[ticker] for ticker in tickers if ticker in self.symbol_ids],
+                       dtype=np.int32)
+        rows = [(self.symbols[symbol], day, split, dividend_factor)
+                for symbol, day, split, dividend_factor in self.actions[np.isin(self.actions['symbol'], ids)].tolist()]
+        covered = {self.symbols[symbol] for symbol in ids.tolist() if symbol in self.action_symbols}
+        store = find_actions_store(self.fallback)
+        rest = [ticker for ticker in tickers if ticker not in self.symbol_ids]
+        if rest and store is not None:
+            more, more_covered = store.action_rows(rest)
+            rows += list(more)
+            covered |= set(more_covered)
+        return rows, covered
+
+    def fetch_histories(self, tickers, start=None, end=None):
+        """Same contract as market_data.fetch_histories"""
+        histories = {}
+        errors = {}
+        missing = []
+        for ticker in unique_tickers(tickers):
+            if ticker in self.symbol_ids:
+                hist = self.series(ticker, start, end).to_frame()
+                if not hist.empty:
+                    histories[ticker] = hist
+            else:
+                missing.append(ticker)
+        if missing:
+            if self.fallback is not None:
+                more, more_errors = self.fallback.fetch_histories(missing, start=start, end=end)
+                histories.update(more)
+                errors.update(more_errors)
+            else:
+                errors.update({ticker: "not in price archive" for ticker in missing})
+        return histories, errors
@@ -0,0 +1,331 @@
+# Splits, dividends and currency conversion for valuing lots.
+import numpy as np
+import pandas as pd
+from compact_series import _day, day_numbers
+from market_data import unique_tickers
+from portfolio import STATUS_ERROR, STATUS_OK, Holdings
+
+DEFAULT_BASE_CURRENCY = "USD"
+
+# Reported for priced lots whose symbol's splits and dividends aren't known
+UNADJUSTED = "splits/dividends unknown, not adjusted"
+
+# Listing currency by Yahoo exchange suffix; symbols without one are USD
+CURRENCY_SUFFIXES = {
+    '.L': 'GBp', '.IL': 'USD', '.TO': 'CAD', '.V': 'CAD', '.NE': 'CAD', '.CN': 'CAD',
+    '.DE': 'EUR', '.F': 'EUR', '.PA': 'EUR', '.AS': 'EUR', '.BR': 'EUR', '.MI': 'EUR',
+    '.MC': 'EUR', '.LS': 'EUR', '.HE': 'EUR', '.VI': 'EUR', '.IR': 'EUR',
+    '.SW': 'CHF', '.ST': 'SEK', '.OL': 'NOK', '.CO': 'DKK', '.WA': 'PLN',
+    '.T': 'JPY', '.HK': 'HKD', '.SS': 'CNY', '.SZ': 'CNY', '.KS': 'KRW', '.KQ': 'KRW',
+    '.TW': 'TWD', '.SI': 'SGD', '.NS': 'INR', '.BO': 'INR', '.AX': 'AUD', '.NZ': 'NZD',
+    '.SA': 'BRL', '.MX': 'MXN', '.JO': 'ZAc', '.TA': 'ILA',
+}
+
+# Exchanges that quote in minor units: (currency, minor units per unit)
+MINOR_UNITS = {'GBp': ('GBP', 100), 'GBX': ('GBP', 100), 'ZAc': ('ZAR', 100), 'ILA': ('ILS', 100)}
+
+# Base currencies offered in the GUI, with the symbol amounts are shown with
+CURRENCY_SYMBOLS = {
+    'USD': "$", 'EUR': "€", 'GBP': "£", 'JPY': "¥", 'CAD': "C$", 'AUD': "A$",
+    'CHF': "CHF ", 'HKD': "HK$", 'SEK': "kr ", 'INR': "₹",
+}
+
+
+def listing_currency(ticker, overrides=None):
+    """Currency a symbol is quoted in, from overrides or its exchange suffix"""
+    if overrides and ticker in overrides:
+        return overrides[ticker]
+    dot = ticker.rfind(".")
+    if dot > 0:
+        return CURRENCY_SUFFIXES.get(ticker[dot:].upper(), DEFAULT_BASE_CURRENCY)
+    return DEFAULT_BASE_CURRENCY
+
+
+def fx_symbol(currency, base):
+    """Yahoo symbol whose close converts one unit of currency into base"""
+    return f"{currency}{base}=X"
+
+
+def currency_symbol(currency):
+    return CURRENCY_SYMBOLS.get(currency, f"{currency} ")
+
+
+def find_actions_store(source):
+    """The store behind a source (HistoryCache, PriceArchive, ...) that
+    records splits and dividends, i.e. has action_rows(), if any"""
+    seen = set()
+    while source is not None and id(source) not in seen:
+        seen.add(id(source))
+        if hasattr(source, 'action_rows'):
+            return source
+        source = getattr(source, 'backend', None) or getattr(source, 'fallback', None)
+    return None
+
+
+def action_rows_from_histories(histories):
+    """Same shape as PriceCache.action_rows(), from frames that still carry
+    the provider's Dividends/Stock Splits columns (uncached fetches)"""
+    from price_cache import ACTION_COLUMNS, _actions, _date_strings
+
+    rows = []
+    covered = set()
+    for ticker, hist in (histories or {}).items():
+        if hist.empty or not any(column in hist.columns for column in ACTION_COLUMNS):
+            continue
+        covered.add(ticker)
+        for _, date, _, split, dividend_factor in _actions(ticker, hist, _date_strings(hist.index)):
+            rows.append((ticker, _day(date), split, dividend_factor))
+    return rows, covered
+
+
+def action_rows(store, tickers, histories=None):
+    """(rows, covered) as PriceCache.action_rows() returns them, from store
+    (see find_actions_store) and, for symbols it doesn't cover, from
+    histories' action columns"""
+    rows, covered = store.action_rows(tickers) if store is not None else ([], set())
+    rows, covered = list(rows), set(covered)
+    rest = {ticker: histories[ticker] for ticker in tickers
+            if ticker not in covered and ticker in (histories or {})}
+    if rest:
+        more, more_covered = action_rows_from_histories(rest)
+        rows += more
+        covered |= more_covered
+    return rows, covered
+
+
+class ActionTable:
+    """Splits and dividend factors for many symbols, looked up for many lots at once.
+
+    Rows are kept sorted by (symbol id, day) under a single int64 key, with
+    the products of each symbol's factors from every row to its last, so
+    the factors after a purchase are one searchsorted for all lots.
+    `covered` symbols have known actions (possibly none); ids() is -1 for
+    the rest.
+    """
+
+    def __init__(self, rows=(), covered=()):
+        rows = list(rows)
+        self.index = pd.Index(sorted(set(covered) | {row[0] for row in rows}), dtype=object)
+        ids = self.index.get_indexer([row[0] for row in rows]).astype(np.int64)
+        days = np.array([row[1] for row in rows], dtype=np.int64)
+        order = np.lexsort((days, ids))
+        self.row_ids = ids[order]
+        self.keys = _keys(self.row_ids, days[order])
+        splits = np.array([row[2] for row in rows], dtype=float)[order]
+        dividends = np.array([row[3] for row in rows], dtype=float)[order]
+        # Suffix products, symbol by symbol
+        self.splits_after = np.empty(len(rows))
+        self.dividends_after = np.empty(len(rows))
+        bounds = np.flatnonzero(np.diff(self.row_ids)) + 1
+        for lo, hi in zip(np.append(0, bounds), np.append(bounds, len(rows))):
+            self.splits_after[lo:hi] = np.cumprod(splits[lo:hi][::-1])[::-1]
+            self.dividends_after[lo:hi] = np.cumprod(dividends[lo:hi][::-1])[::-1]
+
+    def __contains__(self, ticker):
+        return ticker in self.index
+
+    def ids(self, tickers):
+        return self.index.get_indexer(list(tickers)).astype(np.int64)
+
+    def factors(self, ids, purchase_days):
+        """(split multiplier, dividend factor) per lot, from the lots' symbol
+        ids and purchase days: products of the actions dated after each
+        purchase, 1.0 when there are none (or the symbol isn't covered)"""
+        ids = np.asarray(ids, dtype=np.int64)
+        first_after = np.searchsorted(self.keys, _keys(ids, purchase_days), side='right')
+        hit = first_after < len(self.keys)
+        hit[hit] = self.row_ids[first_after[hit]] == ids[hit]
+        splits = np.ones(len(ids))
+        dividends = np.ones(len(ids))
+        splits[hit] = self.splits_after[first_after[hit]]
+        dividends[hit] = self.dividends_after[first_after[hit]]
+        return splits, dividends
+
+
+def _keys(ids, days):
+    # Sorts by symbol id, then day; days are offset so negative ones stay in order
+    return ids * (1 << 32) + (np.asarray(days, dtype=np.int64) + (1 << 31))
+
+
+class Valuation:
+    """Turns value_holdings() lots into split-, dividend- and currency-aware ones.
+
+    Prices from the provider are split- and dividend-adjusted, so:
+      - shares are scaled by every split after the purchase date;
+      - by default (price return) the purchase price is the actual close
+        paid, i.e. the adjusted close with the later dividends undone;
+      - with total_return, dividends are reinvested: the share count grows
+        by the same factor instead, and the cost stays what was paid;
+      - prices are converted from the listing currency into base_currency
+        at the FX close on the purchase date (cost) and the latest FX close
+        (value). Minor-unit quotes (GBp, ZAc, ...) are scaled to units.
+
+    Splits and dividends come from the PriceCache behind `source`, which
+    records them with the bars at no extra network cost; FX rates are
+    ordinary '<CUR><BASE>=X' series fetched through `source`, so they are
+    cached and refreshed incrementally like any other symbol.
+    """
+
+    def __init__(self, source, base_currency=DEFAULT_BASE_CURRENCY, total_return=False,
+                 currency_overrides=None):
+        self.source = source
+        self.base_currency = base_currency
+        self.total_return = total_return
+        self.currency_overrides = dict(currency_overrides or {})
+        self.store = find_actions_store(source)
+
+    def action_table(self, tickers, histories=None):
+        return ActionTable(*action_rows(self.store, tickers, histories))
+
+    def currencies(self, tickers):
+        return {ticker: listing_currency(ticker, self.currency_overrides) for ticker in tickers}
+
+    def _fx_rates(self, currencies, start):
+        """{listing currency: (int32 days, closes)} in base units per listing unit"""
+        rates = {}
+        errors = {}
+        needed = {}
+        for currency in set(currencies):
+            unit, minor = MINOR_UNITS.get(currency, (currency, 1))
+            if unit == self.base_currency:
+                rates[currency] = (np.zeros(1, dtype=np.int32), np.array([1.0 / minor]))
+            else:
+                needed.setdefault(fx_symbol(unit, self.base_currency), []).append((currency, minor))
+        if needed:
+            histories, fetch_errors = self.source.fetch_histories(list(needed), start=start)
+            for symbol, uses in needed.items():
+                hist = histories.get(symbol)
+                for currency, minor in uses:
+                    if hist is None or hist.empty:
+                        errors[currency] = fetch_errors.get(symbol) or f"no FX rates for {symbol}"
+                    else:
+                        rates[currency] = (day_numbers(hist.index), hist['Close'].to_numpy(dtype=float) / minor)
+        return rates, errors
+
+    def apply(self, lots, histories=None):
+        """Adjusted copy of lots plus {ticker: error} for lots that couldn't be converted.
+
+        Adds currency, purchase_fx and fx_rate columns; prices, cost and
+        value are in the base currency. histories supply the actions of
+        symbols the store behind the source doesn't cover. Lots whose
+        actions are still unknown get adjusted=False and an UNADJUSTED
+        message, but keep their status.
+        """
+        lots = lots.copy()
+        tickers = unique_tickers(lots['ticker'].tolist())
+        currencies = self.currencies(tickers)
+        lots['currency'] = lots['ticker'].map(currencies).fillna(self.base_currency)
+        lots['purchase_fx'] = 1.0
+        lots['fx_rate'] = 1.0
+        lots['adjusted'] = True
+        if lots.empty:
+            return lots, {}
+
+        shares = lots['shares'].to_numpy(dtype=float).copy()
+        purchase_price = lots['purchase_price'].to_numpy(dtype=float).copy()
+        current_price = lots['current_price'].to_numpy(dtype=float).copy()
+        purchase_days = lots['purchase_date'].to_numpy().astype('datetime64[D]').astype(np.int32)
+        ticker_values = lots['ticker'].to_numpy()
+
+        table = self.action_table(tickers, histories)
+        ids = table.ids(ticker_values)
+        split, dividend = table.factors(ids, purchase_days)
+        shares *= split
+        if self.total_return:
+            shares /= dividend
+        else:
+            purchase_price /= dividend
+
+        errors = {}
+        purchase_fx = np.ones(len(lots))
+        fx_rate = np.ones(len(lots))
+        if any(currency != self.base_currency for currency in currencies.values()):
+            start = str(np.datetime64(int(purchase_days.min()) - 10, 'D'))
+            rates, fx_errors = self._fx_rates(currencies.values(), start)
+            lot_currencies = lots['currency'].to_numpy()
+            for currency in set(lot_currencies):
+                rows = np.flatnonzero(lot_currencies == currency)
+                if currency not in rates:
+                    purchase_fx[rows] = fx_rate[rows] = np.nan
+                    for ticker in set(ticker_values[rows]):
+                        errors[ticker] = fx_errors.get(currency, f"no FX rate for {currency}")
+                    continue
+                days, closes = rates[currency]
+                # Rate on the purchase day, or the nearest one before it
+                at = np.clip(np.searchsorted(days, purchase_days[rows], side='right') - 1, 0, len(days) - 1)
+                purchase_fx[rows] = closes[at]
+                fx_rate[rows] = closes[-1]
+
+        purchase_price *= purchase_fx
+        current_price *= fx_rate
+        cost = purchase_price * shares
+        value = current_price * shares
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gain_pct = (value - cost) / cost * 100
+
+        lots['shares'] = shares
+        lots['purchase_price'] = purchase_price
+        lots['current_price'] = current_price
+        lots['cost'] = cost
+        lots['value'] = value
+        lots['gain'] = value - cost
+        lots['gain_pct'] = gain_pct
+        lots['purchase_fx'] = purchase_fx
+        lots['fx_rate'] = fx_rate
+        lots['adjusted'] = ids >= 0
+        if errors:
+            failed = lots['ticker'].isin(errors.keys()) & (lots['status'] == STATUS_OK)
+            lots.loc[failed, 'status'] = STATUS_ERROR
+        unadjusted = set(ticker_values[(ids < 0) & (lots['status'] == STATUS_OK).to_numpy()])
+        return lots, {**{ticker: UNADJUSTED for ticker in unadjusted}, **errors}
+
+    def history_inputs(self, holdings, dates, matrix, symbols, histories=None):
+        """(holdings, matrix, errors) to pass to portfolio_history.daily_equity,
+        so the daily series is valued the way apply() values lots.
+
+        Shares are split-adjusted. Closes are turned back into the prices
+        actually quoted on each day (the later dividends undone), or with
+        total_return left adjusted while each lot's shares grow instead,
+        and converted at each day's FX rate. A lot's flow is then its cost
+        as apply() reports it, and stored rows stay valid when a new split
+        or dividend arrives. Symbols without FX rates become NaN columns,
+        which daily_equity leaves out; they are reported in errors.
+        """
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        days = dates.astype(np.int32)
+        matrix = np.array(matrix, dtype=np.float64)
+        table = self.action_table(symbols, histories)
+        split, dividend = table.factors(table.ids(holdings.symbols)[holdings.ticker_ids], holdings.purchase_days)
+        shares = holdings.shares * split
+        symbol_ids = table.ids(symbols)
+        if self.total_return:
+            shares = shares / dividend
+        elif matrix.size:
+            _, later = table.factors(np.tile(symbol_ids, len(days)), np.repeat(days, len(symbols)))
+            matrix /= later.reshape(matrix.shape)
+
+        errors = {}
+        priced = ~np.isnan(matrix).all(axis=0) if len(days) else np.zeros(len(symbols), dtype=bool)
+        for col in np.flatnonzero((symbol_ids < 0) & priced):
+            errors[symbols[col]] = UNADJUSTED
+        currencies = self.currencies(symbols)
+        if len(days) and any(currency != self.base_currency for currency in currencies.values()):
+            rates, fx_errors = self._fx_rates(currencies.values(), str(dates[0] - 10))
+            by_currency = {}
+            for col, symbol in enumerate(symbols):
+                by_currency.setdefault(currencies[symbol], []).append(col)
+            for currency, columns in by_currency.items():
+                if currency not in rates:
+                    matrix[:, columns] = np.nan
+                    for col in columns:
+                        errors[symbols[col]] = fx_errors.get(currency, f"no FX rate for {currency}")
+                    continue
+                rate_days, closes = rates[currency]
+                # Each day's rate, or the nearest one before it
+                at = np.clip(np.searchsorted(rate_days, days, side='right') - 1, 0, len(rate_days) - 1)
+                matrix[:, columns] *= closes[at][:, None]
+
+        adjusted = Holdings(capacity=max(64, len(holdings)))
+        adjusted.extend(np.asarray(holdings.symbols, dtype=object)[holdings.ticker_ids], shares,
+                        holdings.purchase_dates)
+        return adjusted, matrix, errors
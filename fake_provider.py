@@ -0,0 +1,180 @@
+import threading
+import time
+import zlib
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from market_data import PriceProvider
+from live_refresh import MARKET_CLOSE, MARKET_OPEN, MARKET_TZ
+
+
+def synthetic_symbols(count, prefix="SYM"):
+    """Deterministic symbol names: SYM00000, SYM00001, ..."""
+    return [f"{prefix}{i:05d}" for i in range(count)]
+
+
+class SyntheticProvider(PriceProvider):
+    """Offline provider serving seeded random-walk OHLCV data.
+
+    Every symbol gets its own reproducible series derived from (seed,
+    ticker), so runs are deterministic without any network. latency adds
+    a sleep per download call and error_rate makes that fraction of
+    symbols fail, to exercise the slow-network and error paths. Drop it
+    in with market_data.set_default_provider(SyntheticProvider()).
+
+    Like yf.download(actions=True), frames carry Dividends and Stock
+    Splits columns: some symbols pay quarterly dividends and a few have
+    one split. Closes are treated as already adjusted for them.
+
+    Intraday minute bars run from each day's open to its close; today's
+    stop at the current minute (clock() returns "now" in exchange time).
+    """
+
+    def __init__(self, seed=0, latency=0.0, error_rate=0.0, history_start="2015-01-01",
+                 missing=(), clock=None):
+        self.seed = seed
+        self.clock = clock or (lambda: datetime.now(MARKET_TZ) if MARKET_TZ else datetime.now())
+        self.latency = latency
+        self.error_rate = error_rate
+        self.history_start = history_start
+        self.missing = set(missing)
+        self.calls = 0
+        self.symbols_served = 0
+        self._dates = None
+        self._lock = threading.Lock()
+
+    def _symbol_seed(self, ticker):
+        return zlib.crc32(f"{self.seed}:{ticker}".encode())
+
+    def fails(self, ticker):
+        if not self.error_rate:
+            return False
+        return np.random.default_rng(self._symbol_seed(ticker) ^ 0x5EED).random() < self.error_rate
+
+    def trading_days(self):
+        """Business days from history_start to today, shared by every symbol"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        if self._dates is None or self._dates[0] != today:
+            self._dates = (today, pd.bdate_range(self.history_start, today, name='Date'))
+        return self._dates[1]
+
+    def series(self, ticker):
+        """Full daily OHLCV history for ticker, from history_start to today.
+
+        Series are regenerated on each call rather than kept, so large
+        synthetic universes don't sit in memory.
+        """
+        dates = self.trading_days()
+        rng = np.random.default_rng(self._symbol_seed(ticker))
+        drift = rng.normal(0.0003, 0.0002)
+        vol = rng.uniform(0.01, 0.03)
+        log_returns = rng.normal(drift, vol, len(dates))
+        close = rng.uniform(10, 500) * np.exp(np.cumsum(log_returns))
+        spread = np.abs(rng.normal(0, vol / 2, len(dates)))
+        open_ = close * np.exp(rng.normal(0, vol / 3, len(dates)))
+        hist = pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) * (1 + spread),
+            'Low': np.minimum(open_, close) * (1 - spread),
+            'Close': close,
+            'Volume': rng.integers(100_000, 10_000_000, len(dates)).astype(np.float64),
+        }, index=dates)
+        # Drawn from their own generator so the prices above don't depend on them
+        actions = np.random.default_rng(self._symbol_seed(ticker) ^ 0xD1D)
+        dividends = np.zeros(len(dates))
+        splits = np.zeros(len(dates))
+        if actions.random() < 0.4:
+            quarterly_yield = actions.uniform(0.01, 0.04) / 4
+            paid = np.arange(int(actions.integers(1, 63)), len(dates), 63)
+            dividends[paid] = (close[paid - 1] * quarterly_yield).round(4)
+        if len(dates) > 1 and actions.random() < 0.1:
+            splits[int(actions.integers(1, len(dates)))] = float(actions.choice([2, 3, 4]))
+        hist['Dividends'] = dividends
+        hist['Stock Splits'] = splits
+        return hist
+
+    def download(self, tickers, start=None, end=None):
+        if self.latency:
+            time.sleep(self.latency)
+
+        errors = {}
+        frames = {}
+        for ticker in tickers:
+            if ticker in self.missing:
+                continue
+            if self.fails(ticker):
+                errors[ticker] = "synthetic error"
+                continue
+            hist = self.series(ticker)
+            if start is not None:
+                hist = hist.loc[start:]
+            if end is not None:
+                hist = hist[hist.index < pd.Timestamp(end)]
+            frames[ticker] = hist
+
+        with self._lock:
+            self.calls += 1
+            self.symbols_served += len(frames)
+        if not frames:
+            return pd.DataFrame(), errors
+        return pd.concat(frames, axis=1), errors
+
+    def intraday(self, ticker, sessions=1, interval=1):
+        """interval-minute bars for the last `sessions` sessions up to clock()"""
+        from intraday import rollup
+
+        now = self.clock()
+        daily = self.series(ticker)
+        session_minutes = (MARKET_CLOSE.hour * 60 + MARKET_CLOSE.minute
+                           - MARKET_OPEN.hour * 60 - MARKET_OPEN.minute)
+        elapsed = (now.hour * 60 + now.minute) - (MARKET_OPEN.hour * 60 + MARKET_OPEN.minute)
+        today = pd.Timestamp(now.strftime("%Y-%m-%d"))
+        # Today's session only counts once it has opened
+        days = daily.index[(daily.index < today) | ((daily.index == today) & (elapsed >= 0))]
+
+        minutes = []
+        values = []
+        for day in days[-sessions:]:
+            count = session_minutes if day < today else min(session_minutes, elapsed + 1)
+            rng = np.random.default_rng(self._symbol_seed(f"{ticker}@{day:%Y-%m-%d}"))
+            open_, close, volume = daily.loc[day, ['Open', 'Close', 'Volume']]
+            # Brownian bridge from the day's open to its close
+            t = np.arange(1, session_minutes + 1) / session_minutes
+            walk = np.cumsum(rng.normal(0, 0.0008, session_minutes))
+            path = open_ * np.exp(t * np.log(close / open_) + walk - t * walk[-1])[:count]
+            opens = np.r_[open_, path[:-1]]
+            spread = np.abs(rng.normal(0, 0.0004, count))
+            start = (day + pd.Timedelta(hours=MARKET_OPEN.hour, minutes=MARKET_OPEN.minute)).value // 60_000_000_000
+            minutes.append(start + np.arange(count))
+            values.append(np.column_stack([
+                opens, np.maximum(opens, path) * (1 + spread), np.minimum(opens, path) * (1 - spread),
+                path, rng.uniform(0.5, 1.5, count) * volume / session_minutes]))
+        if not minutes:
+            return pd.DataFrame()
+        minutes, values = rollup(np.concatenate(minutes), np.concatenate(values), interval)
+        index = pd.DatetimeIndex(minutes.astype('datetime64[m]').astype('datetime64[ns]'), name='Datetime')
+        if MARKET_TZ is not None:
+            index = index.tz_localize(MARKET_TZ)
+        return pd.DataFrame(values, index=index, columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+
+    def download_intraday(self, tickers, interval="1m", period="1d"):
+        if self.latency:
+            time.sleep(self.latency)
+        sessions = int(period.rstrip("d"))
+        minutes = int(interval.rstrip("m"))
+        errors = {}
+        frames = {}
+        for ticker in tickers:
+            if ticker in self.missing:
+                continue
+            if self.fails(ticker):
+                errors[ticker] = "synthetic error"
+                continue
+            frames[ticker] = self.intraday(ticker, sessions, minutes)
+
+        with self._lock:
+            self.calls += 1
+            self.symbols_served += len(frames)
+        if not frames:
+            return pd.DataFrame(), errors
+        return pd.concat(frames, axis=1), errors
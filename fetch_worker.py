@@ -0,0 +1,129 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Default number of fetch threads and how often the Tk side drains results
+DEFAULT_WORKERS = 4
+POLL_INTERVAL_MS = 50
+
+
+class RefreshJob:
+    """One in-flight refresh: a set of tasks sharing a cancel flag"""
+
+    def __init__(self, channel, on_result, on_done, on_error):
+        self.channel = channel
+        self.on_result = on_result
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancel_event = threading.Event()
+        self.futures = []
+        self.remaining = 0
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+        for future in self.futures:
+            future.cancel()
+
+
+class BackgroundFetcher:
+    """Runs fetch tasks on a thread pool and hands results back to Tk.
+
+    Worker threads never touch widgets: each finished task puts its result
+    on a queue that the main thread drains with root.after(). Jobs are
+    grouped by channel (e.g. 'ytd', 'portfolio'); starting a new job on a
+    channel cancels the one still running there.
+    """
+
+    def __init__(self, root, max_workers=DEFAULT_WORKERS, poll_interval=POLL_INTERVAL_MS):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix="stock-fetch")
+        self.results = queue.Queue()
+        self.jobs = {}
+        self._polling = False
+
+    def start(self, channel, tasks, on_result, on_done=None, on_error=None):
+        """Run tasks (zero-argument callables) concurrently.
+
+        on_result(result) is called on the Tk thread as each task finishes,
+        on_error(exc) if a task raises, and on_done() once all have finished.
+        """
+        self.cancel(channel)
+
+        job = RefreshJob(channel, on_result, on_done, on_error)
+        self.jobs[channel] = job
+        tasks = list(tasks)
+        job.remaining = len(tasks)
+
+        for task in tasks:
+            job.futures.append(self.executor.submit(self._run, job, task))
+
+        if not tasks:
+            self._finish(job)
+        else:
+            self._schedule_poll()
+        return job
+
+    def cancel(self, channel):
+        job = self.jobs.pop(channel, None)
+        if job is not None:
+            job.cancel()
+
+    def is_running(self, channel):
+        return channel in self.jobs
+
+    def shutdown(self):
+        for channel in list(self.jobs):
+            self.cancel(channel)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job, task):
+        if job.cancelled:
+            return
+        try:
+            result = task()
+        except Exception as e:
+            self.results.put((job, None, e))
+        else:
+            self.results.put((job, result, None))
+
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        self._polling = False
+        while True:
+            try:
+                job, result, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+
+            # Results from a cancelled or superseded job are dropped
+            if job.cancelled or self.jobs.get(job.channel) is not job:
+                continue
+
+            job.remaining -= 1
+            if error is not None:
+                if job.on_error:
+                    job.on_error(error)
+            else:
+                job.on_result(result)
+
+            if job.remaining <= 0:
+                self._finish(job)
+
+        if self.jobs:
+            self._schedule_poll()
+
+    def _finish(self, job):
+        if self.jobs.get(job.channel) is job:
+            del self.jobs[job.channel]
+        if job.on_done:
+            job.on_done()
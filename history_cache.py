@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import OrderedDict
+from compact_series import CompactHistory
+from market_data import unique_tickers
+from instrumentation import tracer
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL = 5 * 60
+
+
+class CachedHistory:
+    __slots__ = ('series', 'start', 'loaded_at', 'nbytes')
+
+    def __init__(self, series, start, loaded_at):
+        self.series = series
+        self.start = start
+        self.loaded_at = loaded_at
+        self.nbytes = series.nbytes
+
+
+class HistoryCache:
+    """In-memory LRU of per-symbol price series shared by both tabs.
+
+    Each symbol keeps one series running from the earliest start date
+    asked for up to the latest bar; any narrower [start, end) request is
+    answered by slicing it. Entries expire after ttl seconds and the
+    least recently used ones are dropped once max_bytes is exceeded.
+    Concurrent requests for a symbol that is already being fetched wait
+    for that fetch instead of starting another one.
+
+    Series are kept as CompactHistory (int32 days, close-only float
+    arrays) rather than the provider's OHLCV frames, so served histories
+    only carry a 'Close' column (plus Open/High/Low with keep_ohlc).
+    """
+
+    def __init__(self, backend, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL, keep_ohlc=False):
+        # backend is anything with fetch_histories(tickers, start, end),
+        # e.g. a PriceCache or the market_data module itself
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.keep_ohlc = keep_ohlc
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def fetch_histories(self, tickers, start=None, end=None):
+        """Same contract as market_data.fetch_histories"""
+        start = start or "1970-01-01"
+        histories = {}
+        errors = {}
+        to_fetch = []
+        waiting = []
+
+        with self.lock, tracer.span("history_cache.lookup", "cache") as span:
+            now = time.time()
+            for ticker in unique_tickers(tickers):
+                entry = self._lookup(ticker, start, now)
+                if entry is not None:
+                    self.hits += 1
+                    histories[ticker] = entry.series.slice(start, end).to_frame()
+                elif ticker in self.inflight:
+                    waiting.append((ticker, self.inflight[ticker]))
+                else:
+                    self.misses += 1
+                    self.inflight[ticker] = threading.Event()
+                    to_fetch.append(ticker)
+
+            # Widen the fetch to cover whatever was cached before, so the
+            # new series is a superset of the old one
+            fetch_start = min([start] + [self.entries[t].start for t in to_fetch if t in self.entries])
+            span.update(hits=len(histories), misses=len(to_fetch), waiting=len(waiting))
+
+        if to_fetch:
+            try:
+                fetched, fetch_errors = self.backend.fetch_histories(to_fetch, start=fetch_start)
+                errors.update(fetch_errors)
+                with self.lock:
+                    now = time.time()
+                    for ticker, hist in fetched.items():
+                        series = CompactHistory.from_frame(hist, keep_ohlc=self.keep_ohlc)
+                        self._store(ticker, CachedHistory(series, fetch_start, now))
+                        histories[ticker] = series.slice(start, end).to_frame()
+            finally:
+                with self.lock:
+                    for ticker in to_fetch:
+                        self.inflight.pop(ticker).set()
+
+        # Symbols another thread was already fetching: wait, then retry
+        # (the retry is a hit unless that fetch failed or started later)
+        for ticker, event in waiting:
+            event.wait()
+            more, more_errors = self.fetch_histories([ticker], start=start, end=end)
+            histories.update(more)
+            errors.update(more_errors)
+
+        return histories, errors
+
+    def _lookup(self, ticker, start, now):
+        entry = self.entries.get(ticker)
+        if entry is None:
+            return None
+        if now - entry.loaded_at > self.ttl:
+            self._evict(ticker)
+            return None
+        if start < entry.start:
+            return None
+        self.entries.move_to_end(ticker)
+        return entry
+
+    def _store(self, ticker, entry):
+        if ticker in self.entries:
+            self._evict(ticker)
+        self.entries[ticker] = entry
+        self.total_bytes += entry.nbytes
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            self._evict(next(iter(self.entries)))
+
+    def _evict(self, ticker):
+        entry = self.entries.pop(ticker)
+        self.total_bytes -= entry.nbytes
+
+    def invalidate(self, tickers=None):
+        with self.lock:
+            for ticker in list(self.entries if tickers is None else tickers):
+                if ticker in self.entries:
+                    self._evict(ticker)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'symbols': len(self.entries),
+                'bytes': self.total_bytes,
+            }
+
+    def describe(self):
+        stats = self.stats()
+        return (f"cache {stats['hits']} hits / {stats['misses']} misses, "
+                f"{stats['symbols']} symbols, {stats['bytes'] / (1024 * 1024):.1f} MB")
+
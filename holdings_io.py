@@ -0,0 +1,184 @@
+import json
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from portfolio import Holdings
+from symbol_index import TICKER_PATTERN
+
+DEFAULT_HOLDINGS_PATH = os.path.join(os.path.expanduser("~"), ".stock_tracker", "holdings.db")
+
+# Rows parsed per chunk when importing large exports
+IMPORT_CHUNK_SIZE = 10000
+
+# Header spellings seen in brokerage exports, mapped to our column names
+COLUMN_ALIASES = {
+    'ticker': 'ticker', 'symbol': 'ticker', 'security': 'ticker',
+    'shares': 'shares', 'quantity': 'shares', 'qty': 'shares', 'units': 'shares',
+    'purchase_date': 'purchase_date', 'date': 'purchase_date', 'date_acquired': 'purchase_date',
+    'acquired': 'purchase_date', 'acquisition_date': 'purchase_date', 'trade_date': 'purchase_date',
+    'open_date': 'purchase_date',
+}
+REQUIRED_COLUMNS = ('ticker', 'shares', 'purchase_date')
+
+
+class ImportReport:
+    """Outcome of one import: counts plus every rejected row"""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows_read = 0
+        self.rows_added = 0
+        self.errors = []
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+    def summary(self):
+        text = f"Imported {self.rows_added:,} of {self.rows_read:,} lots from {os.path.basename(self.path)}"
+        if self.errors:
+            text += f"; {len(self.errors):,} rows rejected"
+        return text
+
+    def error_lines(self, limit=None):
+        errors = self.errors if limit is None else self.errors[:limit]
+        return [f"row {row}: {message}" for row, message in errors]
+
+
+def _normalize_columns(frame):
+    renamed = {}
+    for column in frame.columns:
+        key = str(column).strip().lower().replace(' ', '_').replace('-', '_')
+        if key in COLUMN_ALIASES and COLUMN_ALIASES[key] not in renamed.values():
+            renamed[column] = COLUMN_ALIASES[key]
+    return frame.rename(columns=renamed)
+
+
+def _iter_chunks(path, chunk_size):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.jsonl', '.ndjson'):
+        yield from pd.read_json(path, lines=True, dtype=False, chunksize=chunk_size)
+    elif ext == '.json':
+        # A plain JSON array has to be parsed whole; it is still validated in chunks
+        with open(path) as f:
+            records = json.load(f)
+        if isinstance(records, dict):
+            records = records.get('holdings', [])
+        for start in range(0, len(records), chunk_size):
+            yield pd.DataFrame.from_records(records[start:start + chunk_size])
+    else:
+        yield from pd.read_csv(path, dtype=str, chunksize=chunk_size,
+                               skipinitialspace=True, keep_default_na=False)
+
+
+def validate_chunk(frame, first_row=2):
+    """Vectorized checks on one chunk of raw rows.
+
+    Returns (tickers, shares, dates, bad) where bad lists
+    (row_number, message) for rows that were rejected. Row numbers count
+    the header as row 1, as a spreadsheet would.
+    """
+    frame = _normalize_columns(frame)
+    missing = [c for c in REQUIRED_COLUMNS if c not in frame.columns]
+    if missing:
+        raise ValueError(f"missing column(s): {', '.join(missing)}")
+
+    tickers = frame['ticker'].astype(str).str.replace(r"\s+", "", regex=True).str.lstrip("$").str.upper()
+    shares = pd.to_numeric(frame['shares'].astype(str).str.replace(',', '').str.strip(),
+                           errors='coerce')
+    dates = pd.to_datetime(frame['purchase_date'].astype(str).str.strip().str[:10],
+                           format="%Y-%m-%d", errors='coerce')
+
+    bad_ticker = (tickers == '') | tickers.isin(['NAN', 'NONE'])
+    bad_symbol = ~bad_ticker & ~tickers.str.fullmatch(TICKER_PATTERN)
+    bad_shares = shares.isna() | ~np.isfinite(shares.fillna(0)) | (shares <= 0)
+    bad_date = dates.isna()
+    ok = ~(bad_ticker | bad_symbol | bad_shares | bad_date)
+
+    bad = []
+    row_numbers = np.arange(first_row, first_row + len(frame))
+    for i in np.flatnonzero(~ok.to_numpy()):
+        reasons = []
+        if bad_ticker.iloc[i]:
+            reasons.append("missing ticker")
+        if bad_symbol.iloc[i]:
+            reasons.append(f"invalid ticker {tickers.iloc[i]!r}")
+        if bad_shares.iloc[i]:
+            reasons.append(f"invalid shares {frame['shares'].iloc[i]!r}")
+        if bad_date.iloc[i]:
+            reasons.append(f"invalid date {frame['purchase_date'].iloc[i]!r} (use YYYY-MM-DD)")
+        bad.append((int(row_numbers[i]), ", ".join(reasons)))
+
+    return (tickers[ok].to_numpy(), shares[ok].to_numpy(dtype=np.float64),
+            dates[ok].to_numpy().astype('datetime64[D]'), bad)
+
+
+def import_holdings(path, holdings=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """Stream lots from a CSV/JSON/JSON-lines export into holdings.
+
+    Invalid rows are skipped and collected in the returned ImportReport
+    instead of stopping the import. Returns (holdings, report).
+    """
+    holdings = holdings if holdings is not None else Holdings()
+    report = ImportReport(path)
+    next_row = 2
+    for chunk in _iter_chunks(path, chunk_size):
+        tickers, shares, dates, bad = validate_chunk(chunk, first_row=next_row)
+        holdings.extend(tickers, shares, dates)
+        report.rows_read += len(chunk)
+        report.rows_added += len(tickers)
+        report.errors.extend(bad)
+        next_row += len(chunk)
+    return holdings, report
+
+
+def export_holdings(holdings, path):
+    """Write lots to CSV, or JSON when the path ends in .json"""
+    frame = holdings.to_frame()
+    frame['purchase_date'] = frame['purchase_date'].astype(str)
+    if path.lower().endswith('.json'):
+        frame.to_json(path, orient='records', indent=1)
+    else:
+        frame.to_csv(path, index=False)
+
+
+def save_holdings(holdings, path=DEFAULT_HOLDINGS_PATH):
+    """Replace the saved portfolio with the current lots"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lots (
+                    ticker TEXT NOT NULL,
+                    shares REAL NOT NULL,
+                    purchase_date TEXT NOT NULL
+                )
+            """)
+            conn.execute("DELETE FROM lots")
+            symbols = holdings.symbols
+            conn.executemany(
+                "INSERT INTO lots (ticker, shares, purchase_date) VALUES (?, ?, ?)",
+                zip((symbols[i] for i in holdings.ticker_ids.tolist()),
+                    holdings.shares.tolist(),
+                    holdings.purchase_dates.astype(str).tolist()))
+    finally:
+        conn.close()
+
+
+def load_holdings(path=DEFAULT_HOLDINGS_PATH, holdings=None):
+    """Load the saved portfolio; returns empty holdings if there is none"""
+    holdings = holdings if holdings is not None else Holdings()
+    if not os.path.exists(path):
+        return holdings
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("SELECT ticker, shares, purchase_date FROM lots ORDER BY rowid").fetchall()
+    except sqlite3.OperationalError:
+        rows = []
+    finally:
+        conn.close()
+    if rows:
+        tickers, shares, dates = zip(*rows)
+        holdings.extend(tickers, shares, dates)
+    return holdings
@@ -0,0 +1,226 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+# Spans kept in memory; older ones are dropped first
+DEFAULT_MAX_SPANS = 200000
+
+
+class Span:
+    __slots__ = ('name', 'cat', 'start', 'end', 'thread', 'args')
+
+    def __init__(self, name, cat, start, end, thread, args):
+        self.name = name
+        self.cat = cat
+        self.start = start
+        self.end = end
+        self.thread = thread
+        self.args = args
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'cat': self.cat,
+            'start': self.start,
+            'duration_ms': self.duration * 1000,
+            'thread': self.thread,
+            'args': self.args,
+        }
+
+
+class Tracer:
+    """Collects timing spans from any thread.
+
+    Code wraps a phase in `with tracer.span(name, cat, **args) as args:`
+    and may add counters (rows, bytes, ...) to args inside the block.
+    Categories used by the app are 'fetch', 'cache', 'compute' and
+    'render'. Spans can be summarized per category or exported as JSON
+    or a Chrome trace (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self, max_spans=DEFAULT_MAX_SPANS, enabled=True):
+        self.enabled = enabled
+        self.spans = deque(maxlen=max_spans)
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def now(self):
+        return time.perf_counter()
+
+    @contextmanager
+    def span(self, name, cat="app", /, **args):
+        if not self.enabled:
+            yield args
+            return
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.add(name, cat, start, time.perf_counter(), **args)
+
+    def add(self, name, cat, start, end, /, **args):
+        # Positional-only so spans can carry their own 'start'/'name' args
+        if not self.enabled:
+            return
+        span = Span(name, cat, start, end, threading.current_thread().name, args)
+        with self.lock:
+            self.spans.append(span)
+
+    def since(self, start):
+        with self.lock:
+            return [span for span in self.spans if span.start >= start]
+
+    def clear(self):
+        with self.lock:
+            self.spans.clear()
+
+    def summary(self, since=None):
+        """Per-category count/total/max time plus fetch and cache counters"""
+        spans = self.since(since) if since is not None else self.since(0)
+        categories = {}
+        totals = Counter()
+        for span in spans:
+            stats = categories.setdefault(span.cat, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            ms = span.duration * 1000
+            stats['count'] += 1
+            stats['total_ms'] += ms
+            stats['max_ms'] = max(stats['max_ms'], ms)
+            if span.cat == 'fetch':
+                for key in ('symbols', 'rows', 'bytes'):
+                    totals[key] += span.args.get(key, 0)
+            elif span.cat == 'cache':
+                for key in ('hits', 'misses'):
+                    totals[key] += span.args.get(key, 0)
+        result = {'categories': categories, 'counters': dict(totals)}
+        if spans:
+            result['wall_ms'] = (max(s.end for s in spans) - min(s.start for s in spans)) * 1000
+        return result
+
+    def export_json(self, path, since=None):
+        spans = self.since(since) if since is not None else self.since(0)
+        with open(path, "w") as f:
+            json.dump([span.to_dict() for span in spans], f, indent=1, default=str)
+
+    def export_chrome_trace(self, path, since=None):
+        """Write spans in the Trace Event format (complete 'X' events, microseconds)"""
+        spans = self.since(since) if since is not None else self.since(0)
+        thread_ids = {}
+        events = []
+        for span in spans:
+            tid = thread_ids.setdefault(span.thread, len(thread_ids) + 1)
+            events.append({
+                'name': span.name,
+                'cat': span.cat,
+                'ph': 'X',
+                'ts': (span.start - self.origin) * 1e6,
+                'dur': span.duration * 1e6,
+                'pid': 1,
+                'tid': tid,
+                'args': {k: (v if isinstance(v, (int, float, str, bool)) else str(v))
+                         for k, v in span.args.items()},
+            })
+        for thread, tid in thread_ids.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid,
+                           'args': {'name': thread}})
+        with open(path, "w") as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+# Shared tracer used by the fetch, cache and compute modules and the GUI
+tracer = Tracer()
+
+
+def format_summary(summary):
+    """Human-readable lines for a summary() result"""
+    lines = []
+    for cat in ('fetch', 'cache', 'compute', 'render'):
+        stats = summary['categories'].get(cat)
+        if stats:
+            lines.append(f"  {cat:<8} {stats['count']:>6,} spans   total {stats['total_ms']:>10,.1f} ms"
+                         f"   max {stats['max_ms']:>8,.1f} ms")
+    counters = summary['counters']
+    if counters.get('symbols'):
+        lines.append(f"  Fetched {counters['symbols']:,} symbols, {counters.get('rows', 0):,} rows, "
+                     f"{counters.get('bytes', 0) / (1024 * 1024):.1f} MB")
+    lookups = counters.get('hits', 0) + counters.get('misses', 0)
+    if lookups:
+        lines.append(f"  Cache hit rate {counters['hits'] / lookups:.1%} "
+                     f"({counters['hits']:,} hits / {counters['misses']:,} misses)")
+    return lines
+
+
+def frame_bytes(hist):
+    """Approximate in-memory size of a fetched frame"""
+    if hist is None or hist.empty:
+        return 0
+    return int(hist.memory_usage(index=True, deep=False).sum())
+
+
+class SamplingProfiler:
+    """Low-overhead stack sampler covering every thread.
+
+    A daemon thread snapshots sys._current_frames() every `interval`
+    seconds and counts collapsed stacks, so background fetch workers are
+    profiled as well as the Tk thread. write_collapsed() produces the
+    'frame;frame;frame count' format flamegraph tools read.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def top(self, limit=20):
+        """Most frequently sampled leaf functions"""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(limit)
+
+    def write_collapsed(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
@@ -0,0 +1,235 @@
+# Intraday bars: a fixed-size ring of minute bars per symbol, rolled up
+# into 5m/15m/... bars on demand, plus current-session figures.
+import numpy as np
+import pandas as pd
+from live_refresh import MARKET_OPEN, MARKET_TZ
+
+# Two regular sessions of minute bars (390 each) plus some slack
+DEFAULT_CAPACITY = 800
+
+# Timeframes offered for display, in minutes
+TIMEFRAMES = {'1m': 1, '5m': 5, '15m': 15, '30m': 30, '60m': 60}
+
+# Higher timeframes start at the session open (9:30, 9:35, ... or 9:30, 10:30, ...)
+SESSION_ANCHOR = MARKET_OPEN.hour * 60 + MARKET_OPEN.minute
+
+OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def local_minutes(index):
+    """Bar times as int64 minutes since 1970-01-01 in exchange wall-clock time,
+    so minute // 1440 is the session day and minute % 1440 the time of day"""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        if MARKET_TZ is not None:
+            index = index.tz_convert(MARKET_TZ)
+        index = index.tz_localize(None)
+    return index.values.astype('datetime64[m]').astype(np.int64)
+
+
+def minute_index(minutes):
+    """Inverse of local_minutes: a naive DatetimeIndex in exchange time"""
+    return pd.DatetimeIndex(np.asarray(minutes, dtype=np.int64).astype('datetime64[m]')
+                            .astype('datetime64[ns]'), name='Datetime')
+
+
+def bar_arrays(frame):
+    """(minutes, n x 5 OHLCV array) from a provider's intraday frame"""
+    if frame is None or frame.empty:
+        return np.empty(0, dtype=np.int64), np.empty((0, 5))
+    values = np.column_stack([frame[field].to_numpy(dtype=np.float64) if field in frame.columns
+                              else np.zeros(len(frame)) for field in OHLCV])
+    return local_minutes(frame.index), values
+
+
+def rollup(minutes, values, size, anchor=SESSION_ANCHOR):
+    """Combine minute bars into size-minute bars aligned to anchor (minute of
+    the day): first open, highest high, lowest low, last close, summed volume"""
+    if size <= 1 or not len(minutes):
+        return minutes, values
+    day, time_of_day = np.divmod(minutes, 1440)
+    buckets = day * 1440 + anchor + (time_of_day - anchor) // size * size
+    # Bars are in time order, so each bucket is one run of equal keys
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+    rolled = np.column_stack([
+        values[starts, 0],
+        np.maximum.reduceat(values[:, 1], starts),
+        np.minimum.reduceat(values[:, 2], starts),
+        values[ends, 3],
+        np.add.reduceat(values[:, 4], starts),
+    ])
+    return buckets[starts], rolled
+
+
+class BarRing:
+    """One symbol's latest minute bars in preallocated arrays.
+
+    The newest `capacity` bars are kept; once full, each new bar
+    overwrites the oldest, so memory stays at capacity * 48 bytes
+    (about 38 KB at the default) however long the app runs. Bars
+    arrive in time order; a bar for the newest minute replaces it
+    (re-polled minute bars are revised while the minute is open) and
+    older ones are ignored. Ticks are folded into the current minute.
+    """
+
+    __slots__ = ('minutes', 'values', 'start', 'count')
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.minutes = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros((capacity, 5))
+        self.start = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def capacity(self):
+        return len(self.minutes)
+
+    @property
+    def nbytes(self):
+        return self.minutes.nbytes + self.values.nbytes
+
+    def _slot(self, i):
+        """Array position of the i-th oldest bar (negative i counts from the newest)"""
+        return (self.start + i % self.count) % self.capacity
+
+    @property
+    def last_minute(self):
+        return int(self.minutes[self._slot(-1)]) if self.count else None
+
+    def add_bars(self, minutes, values):
+        """Append time-ordered minute bars; returns how many were new or revised"""
+        if not len(minutes):
+            return 0
+        last = self.last_minute
+        revised = 0
+        if last is not None:
+            same = np.flatnonzero(minutes == last)
+            if len(same):
+                self.values[self._slot(-1)] = values[same[-1]]
+                revised = 1
+            newer = minutes > last
+            minutes, values = minutes[newer], values[newer]
+        # Only the newest `capacity` can survive anyway
+        minutes, values = minutes[-self.capacity:], values[-self.capacity:]
+        added = len(minutes)
+        if added:
+            slots = (self.start + self.count + np.arange(added)) % self.capacity
+            self.minutes[slots] = minutes
+            self.values[slots] = values
+            overflow = max(0, self.count + added - self.capacity)
+            self.start = (self.start + overflow) % self.capacity
+            self.count = min(self.capacity, self.count + added)
+        return added + revised
+
+    def add_tick(self, minute, price, size=0.0):
+        """Fold one trade into the bar for its minute"""
+        last = self.last_minute
+        if last is not None and minute < last:
+            return False
+        if minute == last:
+            bar = self.values[self._slot(-1)]
+            bar[1] = max(bar[1], price)
+            bar[2] = min(bar[2], price)
+            bar[3] = price
+            bar[4] += size
+            return True
+        return self.add_bars(np.array([minute], dtype=np.int64),
+                             np.array([[price, price, price, price, size]])) > 0
+
+    def bars(self):
+        """(minutes, values) copies in time order"""
+        slots = (self.start + np.arange(self.count)) % self.capacity
+        return self.minutes[slots], self.values[slots]
+
+    def last_close(self):
+        return float(self.values[self._slot(-1), 3]) if self.count else None
+
+
+class IntradayAggregator:
+    """Minute-bar rings for many symbols.
+
+    Feed it provider bars (ingest) or trades (add_tick); read back the
+    last prices, bars at any timeframe (rolled up from the minute bars
+    when asked), and session figures. The previous close is the last
+    bar of the session before the newest one in the ring, which is why
+    the ring holds two sessions.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.rings = {}
+
+    def __len__(self):
+        return len(self.rings)
+
+    def __contains__(self, ticker):
+        return ticker in self.rings and len(self.rings[ticker]) > 0
+
+    @property
+    def nbytes(self):
+        return sum(ring.nbytes for ring in self.rings.values())
+
+    def symbols(self):
+        return [ticker for ticker in self.rings if len(self.rings[ticker])]
+
+    def _ring(self, ticker):
+        ring = self.rings.get(ticker)
+        if ring is None:
+            ring = self.rings[ticker] = BarRing(self.capacity)
+        return ring
+
+    def add_bars(self, ticker, minutes, values):
+        return self._ring(ticker).add_bars(minutes, values)
+
+    def ingest(self, ticker, frame):
+        """Add a provider's intraday frame for ticker; returns bars new or revised"""
+        return self.add_bars(ticker, *bar_arrays(frame))
+
+    def add_tick(self, ticker, when, price, size=0.0):
+        """Fold a trade at `when` (a datetime) into ticker's current bar"""
+        return self._ring(ticker).add_tick(int(local_minutes([when])[0]), price, size)
+
+    def last_prices(self, tickers=None):
+        tickers = self.rings if tickers is None else tickers
+        return {ticker: self.rings[ticker].last_close() for ticker in tickers
+                if ticker in self.rings and len(self.rings[ticker])}
+
+    def bars(self, ticker, timeframe=1, session_only=True):
+        """DataFrame of timeframe-minute OHLCV bars, indexed by exchange time"""
+        ring = self.rings.get(ticker)
+        minutes, values = ring.bars() if ring is not None else (np.empty(0, dtype=np.int64), np.empty((0, 5)))
+        if session_only and len(minutes):
+            today = minutes >= minutes[-1] // 1440 * 1440
+            minutes, values = minutes[today], values[today]
+        minutes, values = rollup(minutes, values, timeframe)
+        return pd.DataFrame(values, index=minute_index(minutes), columns=OHLCV)
+
+    def session(self, ticker):
+        """Current-session figures for ticker, or None without bars.
+
+        change_pct is the move from the previous close to the last price;
+        it is None until a previous close is known.
+        """
+        ring = self.rings.get(ticker)
+        if ring is None or not len(ring):
+            return None
+        minutes, values = ring.bars()
+        first = np.searchsorted(minutes, minutes[-1] // 1440 * 1440)
+        today = values[first:]
+        previous_close = float(values[first - 1, 3]) if first > 0 else None
+        last = float(today[-1, 3])
+        return {
+            'ticker': ticker,
+            'time': minute_index(minutes[-1:])[0],
+            'last': last,
+            'open': float(today[0, 0]),
+            'high': float(today[:, 1].max()),
+            'low': float(today[:, 2].min()),
+            'volume': float(today[:, 4].sum()),
+            'previous_close': previous_close,
+            'change_pct': (last / previous_close - 1) * 100 if previous_close else None,
+        }
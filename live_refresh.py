@@ -0,0 +1,90 @@
+import random
+from datetime import datetime, time as dt_time
+
+try:
+    from zoneinfo import ZoneInfo
+    MARKET_TZ = ZoneInfo("America/New_York")
+except Exception:
+    # No tz database available (e.g. Windows without tzdata); use local time
+    MARKET_TZ = None
+
+MARKET_OPEN = dt_time(9, 30)
+MARKET_CLOSE = dt_time(16, 0)
+
+DEFAULT_INTERVAL = 60
+# Shortest poll the UI allows, to stay clear of provider rate limits
+MIN_INTERVAL = 15
+DEFAULT_CLOSED_INTERVAL = 15 * 60
+DEFAULT_MAX_BACKOFF = 30 * 60
+
+
+def is_market_open(now=None):
+    """Regular US equity session, Monday-Friday 9:30-16:00 New York time (holidays not included)"""
+    if now is None:
+        now = datetime.now(MARKET_TZ) if MARKET_TZ else datetime.now()
+    elif MARKET_TZ is not None and now.tzinfo is not None:
+        now = now.astimezone(MARKET_TZ)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+class LiveScheduler:
+    """Polls on a Tk timer while live mode is on.
+
+    tick(done) should start one refresh and call done(ok) when it has
+    finished; the next poll is only scheduled after that, so refreshes
+    never overlap. The delay is `interval` during market hours and
+    `closed_interval` outside them. After failures it doubles each time
+    (with a little jitter) up to `max_backoff`, and resets on success.
+    """
+
+    def __init__(self, root, tick, interval=DEFAULT_INTERVAL,
+                 closed_interval=DEFAULT_CLOSED_INTERVAL, max_backoff=DEFAULT_MAX_BACKOFF,
+                 market_open=is_market_open):
+        self.root = root
+        self.tick = tick
+        self.interval = interval
+        self.closed_interval = closed_interval
+        self.max_backoff = max_backoff
+        self.market_open = market_open
+        self.failures = 0
+        self.running = False
+        self._after_id = None
+        self._generation = 0
+
+    def start(self, delay=0):
+        self.stop()
+        self.running = True
+        self.failures = 0
+        self._schedule(delay)
+
+    def stop(self):
+        self.running = False
+        self._generation += 1
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def next_delay(self):
+        """Seconds until the next poll"""
+        base = self.interval if self.market_open() else max(self.interval, self.closed_interval)
+        if self.failures:
+            delay = min(self.max_backoff, base * 2 ** self.failures)
+            return delay * random.uniform(0.9, 1.1)
+        return base
+
+    def _schedule(self, delay):
+        self._after_id = self.root.after(int(delay * 1000), self._run)
+
+    def _run(self):
+        self._after_id = None
+        if not self.running:
+            return
+        generation = self._generation
+        self.tick(lambda ok: self._done(ok, generation))
+
+    def _done(self, ok, generation):
+        # A stop() or restart while the tick was running wins
+        if not self.running or generation != self._generation:
+            return
+        self.failures = 0 if ok else self.failures + 1
+        self._schedule(self.next_delay())
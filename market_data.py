@@ -0,0 +1,212 @@
+from datetime import datetime, timedelta
+import pandas as pd
+from instrumentation import frame_bytes, tracer
+
+# How many symbols go into a single bulk download request
+DEFAULT_CHUNK_SIZE = 100
+
+
+class PriceProvider:
+    """Base class for price data sources.
+
+    A provider downloads daily history for many symbols in one call and
+    returns (frame, errors): frame is a wide DataFrame with (ticker, field)
+    MultiIndex columns, the same shape yf.download produces with
+    group_by='ticker', and errors maps symbols that failed to a message.
+    Errors come back with each call rather than being kept on the
+    provider, since one provider serves concurrent chunk fetches.
+    """
+
+    def download(self, tickers, start=None, end=None):
+        raise NotImplementedError
+
+    def download_intraday(self, tickers, interval="1m", period="1d"):
+        """Intraday bars for the last `period` of sessions, as (frame, errors) like download()"""
+        raise NotImplementedError
+
+
+class YFinanceProvider(PriceProvider):
+    """Bulk downloads from Yahoo Finance via yf.download"""
+
+    def __init__(self, threads=True):
+        self.threads = threads
+
+    def download(self, tickers, start=None, end=None):
+        import yfinance as yf
+
+        tickers = list(tickers)
+        frame = yf.download(tickers, start=start, end=end,
+                            group_by='ticker', auto_adjust=True, actions=True,
+                            progress=False, threads=self.threads)
+        return frame, missing_errors(frame, tickers)
+
+    def download_intraday(self, tickers, interval="1m", period="1d"):
+        import yfinance as yf
+
+        tickers = list(tickers)
+        # Regular session only, so the first bar of the day is the 9:30 open
+        frame = yf.download(tickers, period=period, interval=interval,
+                            group_by='ticker', auto_adjust=True, prepost=False,
+                            progress=False, threads=self.threads)
+        return frame, missing_errors(frame, tickers)
+
+
+def missing_errors(frame, tickers):
+    """Errors for symbols a bulk download came back without.
+
+    yf.download doesn't raise for symbols it couldn't get (bad or delisted
+    symbols, failed requests); it logs them and leaves their columns
+    missing or all NaN, so that is what counts as a failure here.
+    """
+    if frame is None or frame.empty:
+        return {ticker: "no data returned" for ticker in tickers}
+    if not isinstance(frame.columns, pd.MultiIndex):
+        has_data = 'Close' in frame.columns and frame['Close'].notna().any()
+        return {} if has_data else {ticker: "no data returned" for ticker in tickers}
+    return {ticker: "no data returned" for ticker in tickers
+            if (ticker, 'Close') not in frame.columns or not frame[(ticker, 'Close')].notna().any()}
+
+
+_default_provider = None
+
+
+def get_default_provider():
+    global _default_provider
+    if _default_provider is None:
+        _default_provider = YFinanceProvider()
+    return _default_provider
+
+
+def set_default_provider(provider):
+    """Swap the provider used when none is passed explicitly (e.g. a fake for offline runs)"""
+    global _default_provider
+    _default_provider = provider
+
+
+def unique_tickers(tickers):
+    """Drop duplicate symbols while keeping the original order"""
+    seen = set()
+    result = []
+    for ticker in tickers:
+        if ticker and ticker not in seen:
+            seen.add(ticker)
+            result.append(ticker)
+    return result
+
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def split_wide_frame(frame, tickers):
+    """Split a wide (ticker, field) frame into one OHLCV frame per ticker.
+
+    Symbols with no rows (or only NaN closes) get an empty frame.
+    """
+    histories = {}
+    if frame is None or frame.empty:
+        return {ticker: pd.DataFrame() for ticker in tickers}
+
+    if isinstance(frame.columns, pd.MultiIndex):
+        level0 = set(frame.columns.get_level_values(0))
+        for ticker in tickers:
+            if ticker not in level0:
+                histories[ticker] = pd.DataFrame()
+                continue
+            hist = frame[ticker]
+            if 'Close' in hist.columns:
+                hist = hist.dropna(subset=['Close'])
+            histories[ticker] = hist
+    else:
+        # Single-symbol downloads can come back with flat columns
+        hist = frame.dropna(subset=['Close']) if 'Close' in frame.columns else frame
+        for ticker in tickers:
+            histories[ticker] = hist
+    return histories
+
+
+def fetch_histories(tickers, start=None, end=None, provider=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Fetch daily history for many tickers in a few bulk requests.
+
+    Returns (histories, errors): histories maps each ticker to its own
+    DataFrame (possibly empty), errors maps tickers that failed to an
+    error message. A failing chunk only marks its own symbols as errors.
+    """
+    provider = provider or get_default_provider()
+    tickers = unique_tickers(tickers)
+    histories = {}
+    errors = {}
+
+    for chunk in chunked(tickers, max(1, chunk_size)):
+        with tracer.span("provider.download", "fetch", symbols=len(chunk), start=start) as span:
+            try:
+                frame, chunk_errors = provider.download(chunk, start=start, end=end)
+            except Exception as e:
+                for ticker in chunk:
+                    errors[ticker] = str(e)
+                span['error'] = str(e)
+                continue
+
+            for ticker, hist in split_wide_frame(frame, chunk).items():
+                if ticker in chunk_errors and hist.empty:
+                    errors[ticker] = str(chunk_errors[ticker])
+                else:
+                    histories[ticker] = hist
+            span['rows'] = int(sum(len(histories[t]) for t in chunk if t in histories))
+            span['bytes'] = frame_bytes(frame)
+
+    return histories, errors
+
+
+def fetch_latest_quotes(tickers, provider=None, chunk_size=DEFAULT_CHUNK_SIZE, lookback_days=7):
+    """Latest close per ticker from a short recent window.
+
+    Returns (quotes, errors) where quotes maps ticker to its last price.
+    """
+    start = (datetime.now() - timedelta(days=lookback_days)).strftime("%Y-%m-%d")
+    histories, errors = fetch_histories(tickers, start=start, provider=provider, chunk_size=chunk_size)
+    quotes = {}
+    for ticker, hist in histories.items():
+        if not hist.empty:
+            quotes[ticker] = float(hist['Close'].iloc[-1])
+    return quotes, errors
+
+
+def fetch_intraday(tickers, interval="1m", period="1d", provider=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Intraday bars per ticker, in bulk requests like fetch_histories.
+
+    Returns (bars, errors); bars maps each ticker to an OHLCV frame
+    indexed by bar start time.
+    """
+    provider = provider or get_default_provider()
+    tickers = unique_tickers(tickers)
+    bars = {}
+    errors = {}
+    for chunk in chunked(tickers, max(1, chunk_size)):
+        with tracer.span("provider.download_intraday", "fetch", symbols=len(chunk),
+                         interval=interval, period=period) as span:
+            try:
+                frame, chunk_errors = provider.download_intraday(chunk, interval=interval, period=period)
+            except Exception as e:
+                for ticker in chunk:
+                    errors[ticker] = str(e)
+                span['error'] = str(e)
+                continue
+            for ticker, hist in split_wide_frame(frame, chunk).items():
+                if ticker in chunk_errors and hist.empty:
+                    errors[ticker] = str(chunk_errors[ticker])
+                else:
+                    bars[ticker] = hist
+            span['rows'] = int(sum(len(bars[t]) for t in chunk if t in bars))
+    return bars, errors
+
+
+def ytd_range(now=None):
+    """Start and end date strings used for the YTD fetch.
+
+    end is exclusive, so it is tomorrow: today's bar (still moving during
+    the session) is included.
+    """
+    now = now or datetime.now()
+    return f"{now.year}-01-01", (now + timedelta(days=1)).strftime("%Y-%m-%d")
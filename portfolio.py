@@ -0,0 +1,280 @@
+import numpy as np
+import pandas as pd
+
+# Per-lot valuation status codes
+STATUS_OK = 0
+STATUS_NO_DATA = 1
+STATUS_ERROR = 2
+
+
+class Holdings:
+    """Columnar store of portfolio lots.
+
+    Tickers are interned into a symbol table and each lot is one slot in
+    three parallel arrays (int32 ticker id, float64 shares, int32 purchase
+    day number), so valuing tens of thousands of lots is array math rather
+    than a dict per row, at 16 bytes a lot.
+    """
+
+    def __init__(self, capacity=64):
+        self.symbols = []
+        self.symbol_ids = {}
+        self._ticker_ids = np.empty(capacity, dtype=np.int32)
+        self._shares = np.empty(capacity, dtype=np.float64)
+        self._days = np.empty(capacity, dtype=np.int32)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return self.size > 0
+
+    def __iter__(self):
+        """Lots as dicts, in the same shape the GUI used to keep them"""
+        for i in range(self.size):
+            yield self.lot(i)
+
+    @property
+    def ticker_ids(self):
+        return self._ticker_ids[:self.size]
+
+    @property
+    def shares(self):
+        return self._shares[:self.size]
+
+    @property
+    def purchase_days(self):
+        """Purchase dates as int32 days since 1970-01-01"""
+        return self._days[:self.size]
+
+    @property
+    def purchase_dates(self):
+        return self._days[:self.size].astype('datetime64[D]')
+
+    def lot(self, i):
+        return {
+            'ticker': self.symbols[self._ticker_ids[i]],
+            'shares': float(self._shares[i]),
+            'purchase_date': str(self._days[i].astype('datetime64[D]')),
+        }
+
+    def symbol_id(self, ticker):
+        symbol_id = self.symbol_ids.get(ticker)
+        if symbol_id is None:
+            symbol_id = len(self.symbols)
+            self.symbols.append(ticker)
+            self.symbol_ids[ticker] = symbol_id
+        return symbol_id
+
+    def append(self, ticker, shares, purchase_date):
+        self._reserve(self.size + 1)
+        self._ticker_ids[self.size] = self.symbol_id(ticker)
+        self._shares[self.size] = shares
+        self._days[self.size] = np.datetime64(purchase_date, 'D').astype(np.int32)
+        self.size += 1
+
+    def extend(self, tickers, shares, purchase_dates):
+        """Append many lots at once from parallel sequences"""
+        ids = np.fromiter((self.symbol_id(t) for t in tickers), dtype=np.int32)
+        count = len(ids)
+        self._reserve(self.size + count)
+        end = self.size + count
+        self._ticker_ids[self.size:end] = ids
+        self._shares[self.size:end] = np.asarray(shares, dtype=np.float64)
+        self._days[self.size:end] = np.asarray(purchase_dates, dtype='datetime64[D]').astype(np.int32)
+        self.size = end
+
+    def copy(self):
+        """Independent snapshot, e.g. for valuing in a worker thread while the GUI edits"""
+        snapshot = Holdings(capacity=max(64, self.size))
+        snapshot.symbols = list(self.symbols)
+        snapshot.symbol_ids = dict(self.symbol_ids)
+        snapshot._ticker_ids[:self.size] = self.ticker_ids
+        snapshot._shares[:self.size] = self.shares
+        snapshot._days[:self.size] = self.purchase_days
+        snapshot.size = self.size
+        return snapshot
+
+    def clear(self):
+        self.symbols = []
+        self.symbol_ids = {}
+        self.size = 0
+
+    def _reserve(self, needed):
+        capacity = len(self._shares)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self._ticker_ids = _grow(self._ticker_ids, capacity)
+        self._shares = _grow(self._shares, capacity)
+        self._days = _grow(self._days, capacity)
+
+    def held_symbols(self):
+        """Symbols with at least one lot, in first-added order"""
+        return [self.symbols[i] for i in np.unique(self.ticker_ids)]
+
+    def earliest_dates(self):
+        """Earliest purchase date per held symbol, as {ticker: 'YYYY-MM-DD'}"""
+        earliest = np.full(len(self.symbols), np.datetime64('9999-12-31'), dtype='datetime64[D]')
+        np.minimum.at(earliest, self.ticker_ids, self.purchase_dates)
+        return {self.symbols[i]: str(earliest[i]) for i in np.unique(self.ticker_ids)}
+
+    def to_frame(self):
+        return pd.DataFrame({
+            'ticker': np.asarray(self.symbols, dtype=object)[self.ticker_ids] if self.size else [],
+            'shares': self.shares.copy(),
+            'purchase_date': self.purchase_dates.copy(),
+        })
+
+
+def _grow(array, capacity):
+    grown = np.empty(capacity, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def build_price_matrix(histories, symbols):
+    """Align Close series into one (dates x symbols) matrix, NaN where missing"""
+    date_arrays = []
+    for ticker in symbols:
+        hist = histories.get(ticker)
+        if hist is not None and not hist.empty:
+            date_arrays.append(_day_index(hist.index))
+    if not date_arrays:
+        return np.empty(0, dtype='datetime64[D]'), np.empty((0, len(symbols)))
+
+    dates = np.unique(np.concatenate(date_arrays))
+    matrix = np.full((len(dates), len(symbols)), np.nan)
+    for col, ticker in enumerate(symbols):
+        hist = histories.get(ticker)
+        if hist is None or hist.empty:
+            continue
+        rows = np.searchsorted(dates, _day_index(hist.index))
+        matrix[rows, col] = hist['Close'].to_numpy(dtype=np.float64)
+    return dates, matrix
+
+
+def _day_index(index):
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.values.astype('datetime64[D]')
+
+
+def value_holdings(holdings, histories, errors=None, mask=None):
+    """Value every lot (or the lots selected by mask) in one pass.
+
+    Purchase price is the first close on or after the purchase date and
+    current price the last close, as before, but both are looked up for
+    all lots at once on an aligned price matrix. Returns (lots, totals):
+    a DataFrame with one row per selected lot and the aggregate figures.
+    """
+    errors = errors or {}
+    lot_index = np.arange(len(holdings)) if mask is None else np.flatnonzero(mask)
+    ticker_ids = holdings.ticker_ids[lot_index]
+    purchase_dates = holdings.purchase_dates[lot_index]
+
+    # Only the symbols these lots hold get a column in the price matrix
+    symbols = holdings.symbols
+    used_ids = np.unique(ticker_ids)
+    columns = np.searchsorted(used_ids, ticker_ids)
+    dates, matrix = build_price_matrix(histories, [symbols[i] for i in used_ids])
+    n_dates = len(dates)
+
+    purchase_price = np.full(len(lot_index), np.nan)
+    current_price = np.full(len(lot_index), np.nan)
+
+    if n_dates:
+        valid = ~np.isnan(matrix)
+        # next_valid[i, c]: first row >= i with a close for symbol c
+        row_ids = np.where(valid, np.arange(n_dates)[:, None], n_dates)
+        next_valid = np.minimum.accumulate(row_ids[::-1], axis=0)[::-1]
+        # last row with a close for each symbol
+        last_valid = np.where(valid.any(axis=0),
+                              n_dates - 1 - np.argmax(valid[::-1], axis=0), -1)
+
+        start_rows = np.searchsorted(dates, purchase_dates)
+        in_range = start_rows < n_dates
+        buy_rows = np.full(len(lot_index), n_dates)
+        buy_rows[in_range] = next_valid[start_rows[in_range], columns[in_range]]
+        has_data = buy_rows < n_dates
+
+        lot_columns = columns[has_data]
+        purchase_price[has_data] = matrix[buy_rows[has_data], lot_columns]
+        current_price[has_data] = matrix[last_valid[lot_columns], lot_columns]
+
+    status = np.where(np.isnan(purchase_price), STATUS_NO_DATA, STATUS_OK)
+    if errors:
+        error_ids = [holdings.symbol_ids[t] for t in errors if t in holdings.symbol_ids]
+        status[np.isin(ticker_ids, error_ids)] = STATUS_ERROR
+
+    lots = lots_frame(holdings, lot_index, purchase_price, current_price, status)
+    return lots, summarize_lots(lots)
+
+
+def lots_frame(holdings, lot_index, purchase_price, current_price, status):
+    """The per-lot result frame for lots already priced (one entry per lot_index)"""
+    ticker_ids = holdings.ticker_ids[lot_index]
+    shares = holdings.shares[lot_index]
+    cost = purchase_price * shares
+    value = current_price * shares
+    gain = value - cost
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gain_pct = (current_price - purchase_price) / purchase_price * 100
+
+    return pd.DataFrame({
+        'lot': lot_index,
+        'ticker': np.asarray(holdings.symbols, dtype=object)[ticker_ids] if len(lot_index) else [],
+        'shares': shares,
+        'purchase_date': holdings.purchase_dates[lot_index],
+        'purchase_price': purchase_price,
+        'current_price': current_price,
+        'cost': cost,
+        'value': value,
+        'gain': gain,
+        'gain_pct': gain_pct,
+        'status': status,
+    })
+
+
+def summarize_lots(lots):
+    """Aggregate cost/value/gain over the lots that have prices"""
+    ok = (lots['status'] == STATUS_OK).to_numpy()
+    total_cost = float(lots['cost'].to_numpy()[ok].sum())
+    total_value = float(lots['value'].to_numpy()[ok].sum())
+    return {
+        'cost': total_cost,
+        'value': total_value,
+        'gain': total_value - total_cost,
+        'gain_pct': (total_value - total_cost) / total_cost * 100 if total_cost > 0 else 0.0,
+    }
+
+
+def revalue_lots(lots, quotes):
+    """Apply new last prices to already-valued lots, in place.
+
+    Only lots whose symbol has a quote that differs from its current
+    price are touched. Quotes are in each symbol's listing currency; lots
+    converted by corporate_actions.Valuation carry the fx_rate to apply.
+    Returns a boolean mask of the lots that changed.
+    """
+    new_price = lots['ticker'].map(quotes).to_numpy(dtype=np.float64, na_value=np.nan)
+    if 'fx_rate' in lots.columns:
+        new_price = new_price * lots['fx_rate'].to_numpy()
+    current = lots['current_price'].to_numpy()
+    changed = ((lots['status'] == STATUS_OK).to_numpy()
+               & ~np.isnan(new_price) & (new_price != current))
+    if not changed.any():
+        return changed
+
+    shares = lots['shares'].to_numpy()[changed]
+    purchase_price = lots['purchase_price'].to_numpy()[changed]
+    price = new_price[changed]
+    value = price * shares
+    lots.loc[changed, 'current_price'] = price
+    lots.loc[changed, 'value'] = value
+    lots.loc[changed, 'gain'] = value - lots['cost'].to_numpy()[changed]
+    lots.loc[changed, 'gain_pct'] = (price - purchase_price) / purchase_price * 100
+    return changed
@@ -0,0 +1,260 @@
+# Daily portfolio value over time, with time- and money-weighted returns.
+import hashlib
+import os
+import sqlite3
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from analytics import forward_fill
+from market_data import DEFAULT_CHUNK_SIZE, chunked
+from portfolio import build_price_matrix
+
+DEFAULT_HISTORY_PATH = os.path.join(os.path.expanduser("~"), ".stock_tracker", "portfolio_history.db")
+
+# Extra calendar days fetched before the last stored day, so every symbol
+# has a close to carry forward into the days being extended
+EXTEND_PAD_DAYS = 10
+
+
+def holdings_fingerprint(holdings, valuation=None):
+    """Hash of every lot and the valuation settings; the stored series is
+    only extended while it matches"""
+    digest = hashlib.sha1()
+    digest.update("\n".join(holdings.symbols[i] for i in holdings.ticker_ids.tolist()).encode())
+    digest.update(holdings.shares.tobytes())
+    digest.update(holdings.purchase_dates.astype('datetime64[D]').tobytes())
+    if valuation is not None:
+        digest.update(repr((valuation.base_currency, valuation.total_return,
+                            sorted(valuation.currency_overrides.items()))).encode())
+    return digest.hexdigest()
+
+
+def daily_equity(holdings, dates, matrix, symbols, after=None):
+    """Portfolio value and contributions for each day of an aligned close matrix.
+
+    A lot counts from the first bar on or after its purchase date, bought
+    at that bar's close (the same purchase price value_holdings uses), so
+    the money put in that day is shares * close. With `after`, only lots
+    bought after that date count as contributions; older lots are simply
+    held from the first row. Lots whose symbol has no close yet are left
+    out. Returns a DataFrame indexed by date with 'value' and 'flow'.
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    closes = forward_fill(np.asarray(matrix, dtype=np.float64))
+    n_dates = len(dates)
+    if not n_dates or not len(holdings):
+        return pd.DataFrame({'value': [], 'flow': []}, index=pd.DatetimeIndex([], name='Date'))
+
+    columns_by_symbol = {symbol: col for col, symbol in enumerate(symbols)}
+    lot_symbols = np.asarray(holdings.symbols, dtype=object)[holdings.ticker_ids]
+    lot_columns = np.array([columns_by_symbol.get(symbol, -1) for symbol in lot_symbols], dtype=np.int64)
+    purchase_dates = holdings.purchase_dates
+    shares = holdings.shares
+
+    # First bar each lot is held on, and its close there
+    lot_rows = np.searchsorted(dates, purchase_dates)
+    held = (lot_rows < n_dates) & (lot_columns >= 0)
+    buy_price = np.full(len(holdings), np.nan)
+    buy_price[held] = closes[lot_rows[held], lot_columns[held]]
+    held &= ~np.isnan(buy_price)
+
+    # Shares of each symbol held per day: add each lot on its first row, then cumulate
+    added = np.zeros((n_dates, len(symbols)))
+    np.add.at(added, (lot_rows[held], lot_columns[held]), shares[held])
+    position = np.cumsum(added, axis=0)
+    value = (position * np.nan_to_num(closes)).sum(axis=1)
+
+    bought = held.copy()
+    if after is not None:
+        bought &= purchase_dates > np.datetime64(after, 'D')
+    flow = np.bincount(lot_rows[bought], weights=(shares * buy_price)[bought], minlength=n_dates)
+
+    return pd.DataFrame({'value': value, 'flow': flow},
+                        index=pd.DatetimeIndex(dates.astype('datetime64[ns]'), name='Date'))
+
+
+def time_weighted_returns(series):
+    """Cumulative time-weighted return for each day (0.0 on the first day).
+
+    Each day's return is (value - money added that day) / previous value,
+    so contributions don't count as performance; days are chain-linked.
+    """
+    value = series['value'].to_numpy()
+    flow = series['flow'].to_numpy()
+    daily = np.zeros(len(value))
+    if len(value) > 1:
+        previous = value[:-1]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            daily[1:] = np.where(previous > 0, (value[1:] - flow[1:]) / previous - 1, 0.0)
+    return pd.Series(np.cumprod(1 + daily) - 1, index=series.index, name='twr')
+
+
+def xirr(amounts, dates, tol=1e-10, max_iter=100):
+    """Annualized money-weighted return for dated cash flows.
+
+    amounts are negative for money put in and positive for money taken out
+    (the final value counts as taken out). Newton's method with a bisection
+    fallback; returns None when there is no solution (e.g. no sign change).
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    days = np.asarray(dates, dtype='datetime64[D]')
+    if len(amounts) < 2 or not ((amounts > 0).any() and (amounts < 0).any()):
+        return None
+    years = (days - days.min()).astype(np.float64) / 365.0
+
+    def npv(rate):
+        return (amounts / (1 + rate) ** years).sum()
+
+    rate = 0.1
+    for _ in range(max_iter):
+        discount = (1 + rate) ** years
+        value = (amounts / discount).sum()
+        slope = (-years * amounts / (discount * (1 + rate))).sum()
+        if slope == 0 or not np.isfinite(value):
+            break
+        step = value / slope
+        rate -= step
+        if rate <= -1:
+            break
+        if abs(step) < tol:
+            return float(rate)
+
+    # Newton wandered off; bisect between a near-total loss and a huge gain
+    low, high = -0.9999, 1e6
+    if np.sign(npv(low)) == np.sign(npv(high)):
+        return None
+    for _ in range(500):
+        mid = (low + high) / 2
+        if np.sign(npv(mid)) == np.sign(npv(low)):
+            low = mid
+        else:
+            high = mid
+        if high - low < tol:
+            break
+    return float((low + high) / 2)
+
+
+def history_stats(series):
+    """Headline figures for an equity series"""
+    if series.empty:
+        return {'start': None, 'end': None, 'value': 0.0, 'invested': 0.0, 'twr': None, 'xirr': None}
+    flows = series['flow'].to_numpy()
+    contributions = flows != 0
+    amounts = np.append(-flows[contributions], series['value'].iloc[-1])
+    flow_dates = np.append(series.index[contributions].values, series.index[-1:].values)
+    return {
+        'start': series.index[0],
+        'end': series.index[-1],
+        'value': float(series['value'].iloc[-1]),
+        'invested': float(flows.sum()),
+        'twr': float(time_weighted_returns(series).iloc[-1]),
+        'xirr': xirr(amounts, flow_dates),
+    }
+
+
+class PortfolioHistoryStore:
+    """SQLite copy of the daily series, tagged with the holdings it was built from.
+
+    Opens a connection per call so it can be used from a worker thread.
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS equity (
+                    date TEXT PRIMARY KEY,
+                    value REAL NOT NULL,
+                    flow REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def load(self):
+        """(fingerprint, series) as last saved; fingerprint is None if nothing is stored"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+            series = pd.read_sql_query("SELECT date, value, flow FROM equity ORDER BY date", conn)
+        finally:
+            conn.close()
+        series.index = pd.DatetimeIndex(pd.to_datetime(series.pop('date')), name='Date')
+        return (row[0] if row else None), series
+
+    def save(self, fingerprint, rows, replace_from=None):
+        """Store rows; everything from replace_from on (or everything, if None) is replaced"""
+        conn = self._connect()
+        try:
+            with conn:
+                if replace_from is None:
+                    conn.execute("DELETE FROM equity")
+                else:
+                    conn.execute("DELETE FROM equity WHERE date >= ?", (str(replace_from)[:10],))
+                conn.executemany(
+                    "INSERT INTO equity (date, value, flow) VALUES (?, ?, ?)",
+                    zip(rows.index.strftime("%Y-%m-%d"), rows['value'].tolist(), rows['flow'].tolist()))
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('fingerprint', ?)",
+                             (fingerprint,))
+        finally:
+            conn.close()
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM equity")
+            conn.execute("DELETE FROM meta")
+
+
+def _equity(holdings, source, symbols, start, chunk_size, valuation, after=None):
+    """daily_equity() for prices from start on, plus {ticker: error}"""
+    histories, errors = {}, {}
+    for chunk in chunked(symbols, chunk_size):
+        chunk_histories, chunk_errors = source.fetch_histories(chunk, start=start)
+        histories.update(chunk_histories)
+        errors.update(chunk_errors)
+    dates, matrix = build_price_matrix(histories, symbols)
+    if valuation is not None:
+        holdings, matrix, valuation_errors = valuation.history_inputs(holdings, dates, matrix, symbols,
+                                                                      histories)
+        errors.update(valuation_errors)
+    return daily_equity(holdings, dates, matrix, symbols, after=after), errors
+
+
+def update_portfolio_history(holdings, source, store=None, chunk_size=DEFAULT_CHUNK_SIZE, valuation=None):
+    """Bring the stored daily series up to date and return (series, errors).
+
+    If the store holds a series built from these same lots, only the last
+    stored day (which may have been mid-session) and the days after it are
+    computed, from a short window of prices. Otherwise the series is built
+    from every lot's full history. Nothing is saved when a symbol fails to
+    download (or can't be valued), so a gap can't end up in the stored series.
+
+    With a valuation (corporate_actions.Valuation) lots are split-adjusted,
+    flows are what was actually paid and everything is in its base
+    currency; without one, holdings and prices are used as they are.
+    """
+    fingerprint = holdings_fingerprint(holdings, valuation)
+    symbols = holdings.held_symbols()
+    stored_fingerprint, stored = store.load() if store is not None else (None, None)
+
+    if stored_fingerprint == fingerprint and stored is not None and len(stored):
+        last = stored.index[-1]
+        previous = stored.index[-2] if len(stored) > 1 else None
+        start = (last - timedelta(days=EXTEND_PAD_DAYS)).strftime("%Y-%m-%d")
+        rows, errors = _equity(holdings, source, symbols, start, chunk_size, valuation,
+                               after=None if previous is None else previous.strftime("%Y-%m-%d"))
+        rows = rows[rows.index >= last]
+        if not rows.empty and not errors:
+            store.save(fingerprint, rows, replace_from=last)
+        return pd.concat([stored[stored.index < last], rows]), errors
+
+    if not symbols:
+        return daily_equity(holdings, [], np.empty((0, 0)), []), {}
+    start = str(holdings.purchase_dates.min())
+    series, errors = _equity(holdings, source, symbols, start, chunk_size, valuation)
+    if store is not None and not errors:
+        store.save(fingerprint, series)
+    return series, errors
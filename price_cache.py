@@ -0,0 +1,312 @@
+import os
+import sqlite3
+import threading
+import time
+import pandas as pd
+from market_data import DEFAULT_CHUNK_SIZE, fetch_histories, unique_tickers
+from instrumentation import tracer
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".stock_tracker", "prices.db")
+
+# How long the most recent bar is trusted before it is fetched again
+DEFAULT_TODAY_TTL = 15 * 60
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Corporate-action columns providers add next to the bars (yf.download(actions=True))
+ACTION_COLUMNS = ['Dividends', 'Stock Splits']
+
+# Symbols per "ticker IN (...)" query, under SQLite's bound-parameter limit
+QUERY_BATCH = 500
+
+
+class PriceCache:
+    """On-disk daily OHLCV store keyed by (ticker, date).
+
+    fetch_histories() serves requests from SQLite and only goes to the
+    provider for the part of the range that is missing: a full fetch the
+    first time a symbol (or an earlier start date) is seen, then an
+    incremental fetch from the last stored bar onwards once the TTL on
+    that bar has expired. The last bar is always re-fetched because
+    today's bar keeps changing until the close.
+
+    Splits and dividends that come with the bars are kept in an actions
+    table. Bars are split- and dividend-adjusted, so when an incremental
+    fetch brings a new action the stored bars before it are re-based in
+    place instead of being downloaded again.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, today_ttl=DEFAULT_TODAY_TTL, provider=None):
+        self.path = path
+        self.today_ttl = today_ttl
+        self.provider = provider
+        self.lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.lock, self.conn:
+            # Worker processes may open a new cache at the same time; one sets it up at a time
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS bars (
+                    ticker TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL, volume REAL,
+                    PRIMARY KEY (ticker, date)
+                ) WITHOUT ROWID
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS coverage (
+                    ticker TEXT PRIMARY KEY,
+                    first_date TEXT NOT NULL,
+                    last_date TEXT,
+                    fetched_at REAL NOT NULL
+                )
+            """)
+            # dividend_factor: what the dividend multiplies earlier (adjusted) prices by
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS actions (
+                    ticker TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    dividend REAL NOT NULL,
+                    split REAL NOT NULL,
+                    dividend_factor REAL NOT NULL,
+                    PRIMARY KEY (ticker, date)
+                ) WITHOUT ROWID
+            """)
+            # Caches made before actions were recorded refetch each symbol once
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(coverage)")]
+            if 'has_actions' not in columns:
+                self.conn.execute("ALTER TABLE coverage ADD COLUMN has_actions INTEGER NOT NULL DEFAULT 0")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def clear(self, tickers=None):
+        with self.lock, self.conn:
+            if tickers is None:
+                self.conn.execute("DELETE FROM bars")
+                self.conn.execute("DELETE FROM coverage")
+                self.conn.execute("DELETE FROM actions")
+            else:
+                for ticker in tickers:
+                    self.conn.execute("DELETE FROM bars WHERE ticker = ?", (ticker,))
+                    self.conn.execute("DELETE FROM coverage WHERE ticker = ?", (ticker,))
+                    self.conn.execute("DELETE FROM actions WHERE ticker = ?", (ticker,))
+
+    def fetch_histories(self, tickers, start=None, end=None, provider=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Same contract as market_data.fetch_histories, backed by the cache"""
+        provider = provider or self.provider
+        tickers = unique_tickers(tickers)
+        start = start or "1970-01-01"
+        now = time.time()
+
+        # Work out what each symbol still needs and group symbols that
+        # need the same fetch start so they share one bulk request
+        fetch_groups = {}
+        for ticker in tickers:
+            fetch_start = self._missing_start(ticker, start, end, now)
+            if fetch_start is not None:
+                fetch_groups.setdefault(fetch_start, []).append(ticker)
+
+        # Fetches always run through to the latest bar so each symbol's
+        # stored range stays contiguous from first_date to last_date
+        errors = {}
+        for fetch_start, group in fetch_groups.items():
+            fetched, group_errors = fetch_histories(group, start=fetch_start,
+                                                    provider=provider, chunk_size=chunk_size)
+            for ticker, hist in fetched.items():
+                self._store(ticker, hist, start if fetch_start == start else None, now)
+            errors.update(group_errors)
+
+        histories = {}
+        with tracer.span("price_cache.load", "cache", symbols=len(tickers),
+                         refetched=sum(len(g) for g in fetch_groups.values())):
+            for ticker in tickers:
+                hist = self.load(ticker, start, end)
+                if ticker in errors and hist.empty:
+                    continue
+                # A failed incremental update still serves the stored bars
+                errors.pop(ticker, None)
+                histories[ticker] = hist
+        return histories, errors
+
+    def _missing_start(self, ticker, start, end, now):
+        """Date to fetch from for this ticker, or None if the cache covers it"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT first_date, last_date, fetched_at, has_actions FROM coverage WHERE ticker = ?",
+                (ticker,)).fetchone()
+
+        if row is None:
+            return start
+        first_date, last_date, fetched_at, has_actions = row
+        if start < first_date:
+            return start
+        if not has_actions:
+            # Stored before actions were kept: fetch the whole range once more
+            return first_date
+        if last_date is None:
+            # Known symbol with no data; retry once the TTL runs out
+            return None if now - fetched_at < self.today_ttl else start
+        if end is not None and end <= last_date:
+            return None
+        if now - fetched_at < self.today_ttl:
+            return None
+        return last_date
+
+    def _store(self, ticker, hist, first_date, fetched_at):
+        rows = []
+        dates = []
+        if not hist.empty:
+            frame = hist.reindex(columns=BAR_COLUMNS)
+            dates = _date_strings(frame.index)
+            for date, values in zip(dates, frame.itertuples(index=False, name=None)):
+                rows.append((ticker, date) + tuple(None if pd.isna(v) else float(v) for v in values))
+        actions = _actions(ticker, hist, dates)
+
+        with self.lock, self.conn:
+            # Take the write lock up front: another process (see process_pool) may
+            # commit between a read here and the first write, which SQLite won't retry
+            self.conn.execute("BEGIN IMMEDIATE")
+            if actions:
+                known = {row[0] for row in self.conn.execute(
+                    "SELECT date FROM actions WHERE ticker = ?", (ticker,))}
+                # Bars stored before a newly seen action are on the old basis
+                for _, date, dividend, split, dividend_factor in actions:
+                    if date in known:
+                        continue
+                    self.conn.execute(
+                        "UPDATE bars SET open = open * ?1, high = high * ?1, low = low * ?1, "
+                        "close = close * ?1, volume = volume * ?2 WHERE ticker = ?3 AND date < ?4",
+                        (dividend_factor / split, split, ticker, min(dates[0], date)))
+                    if split != 1.0:
+                        self.conn.execute(
+                            "UPDATE actions SET dividend = dividend / ? WHERE ticker = ? AND date < ?",
+                            (split, ticker, date))
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO actions (ticker, date, dividend, split, dividend_factor) "
+                    "VALUES (?, ?, ?, ?, ?)", actions)
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO bars (ticker, date, open, high, low, close, volume) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            last_date = self.conn.execute(
+                "SELECT MAX(date) FROM bars WHERE ticker = ?", (ticker,)).fetchone()[0]
+            if first_date is not None:
+                self.conn.execute(
+                    "INSERT INTO coverage (ticker, first_date, last_date, fetched_at, has_actions) "
+                    "VALUES (?, ?, ?, ?, 1) "
+                    "ON CONFLICT(ticker) DO UPDATE SET first_date = MIN(first_date, excluded.first_date), "
+                    "last_date = excluded.last_date, fetched_at = excluded.fetched_at, has_actions = 1",
+                    (ticker, first_date, last_date, fetched_at))
+            else:
+                self.conn.execute(
+                    "UPDATE coverage SET last_date = ?, fetched_at = ?, has_actions = 1 WHERE ticker = ?",
+                    (last_date, fetched_at, ticker))
+
+    def load(self, ticker, start=None, end=None):
+        """Stored bars for ticker in [start, end) as an OHLCV DataFrame"""
+        query = "SELECT date, open, high, low, close, volume FROM bars WHERE ticker = ?"
+        params = [ticker]
+        if start is not None:
+            query += " AND date >= ?"
+            params.append(start)
+        if end is not None:
+            query += " AND date < ?"
+            params.append(end)
+        query += " ORDER BY date"
+
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        if not rows:
+            return pd.DataFrame()
+
+        frame = pd.DataFrame.from_records(rows, columns=['Date'] + BAR_COLUMNS)
+        frame.index = pd.DatetimeIndex(pd.to_datetime(frame.pop('Date')), name='Date')
+        return frame.astype(float)
+
+    def actions(self, tickers, start=None):
+        """Stored splits and dividends as {ticker: DataFrame} indexed by date with
+        dividend, split (1.0 when none) and dividend_factor columns; symbols
+        without actions are left out"""
+        query = "SELECT ticker, date, dividend, split, dividend_factor FROM actions WHERE ticker = ?"
+        if start is not None:
+            query += " AND date > ?"
+        result = {}
+        with self.lock:
+            for ticker in unique_tickers(tickers):
+                params = (ticker,) if start is None else (ticker, start)
+                rows = self.conn.execute(query + " ORDER BY date", params).fetchall()
+                if rows:
+                    frame = pd.DataFrame.from_records(
+                        [row[1:] for row in rows], columns=['Date', 'dividend', 'split', 'dividend_factor'])
+                    frame.index = pd.DatetimeIndex(pd.to_datetime(frame.pop('Date')), name='Date')
+                    result[ticker] = frame
+        return result
+
+    def action_rows(self, tickers):
+        """Actions for many symbols at once, as (rows, covered).
+
+        rows are (ticker, day, split, dividend_factor) tuples with day in
+        days since 1970-01-01, in no particular order; covered is the set
+        of symbols whose actions have been recorded (usually there are none).
+        """
+        tickers = unique_tickers(tickers)
+        rows = []
+        covered = set()
+        with self.lock:
+            for offset in range(0, len(tickers), QUERY_BATCH):
+                batch = tickers[offset:offset + QUERY_BATCH]
+                marks = ",".join("?" * len(batch))
+                rows += self.conn.execute(
+                    "SELECT ticker, CAST(julianday(date) - 2440587.5 AS INTEGER), split, dividend_factor "
+                    f"FROM actions WHERE ticker IN ({marks})", batch).fetchall()
+                covered.update(row[0] for row in self.conn.execute(
+                    f"SELECT ticker FROM coverage WHERE has_actions = 1 AND ticker IN ({marks})", batch))
+        return rows, covered
+
+    def last_bar_date(self, ticker):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT last_date FROM coverage WHERE ticker = ?", (ticker,)).fetchone()
+        return row[0] if row else None
+
+
+def _actions(ticker, hist, dates):
+    """(ticker, date, dividend, split, dividend_factor) rows for the actions in hist.
+
+    Closes are dividend-adjusted, so the raw close before an ex-date is
+    the adjusted one undone for this and any later dividend in the frame;
+    working back from the newest dividend recovers each of them.
+    """
+    if hist.empty or not any(column in hist.columns for column in ACTION_COLUMNS):
+        return []
+    dividends = hist['Dividends'].fillna(0).to_numpy(dtype=float) if 'Dividends' in hist.columns else None
+    splits = hist['Stock Splits'].fillna(0).to_numpy(dtype=float) if 'Stock Splits' in hist.columns else None
+    closes = hist['Close'].to_numpy(dtype=float)
+
+    rows = []
+    later = 1.0
+    for i in range(len(hist) - 1, -1, -1):
+        dividend = dividends[i] if dividends is not None else 0.0
+        split = splits[i] if splits is not None and splits[i] > 0 else 1.0
+        if dividend <= 0 and split == 1.0:
+            continue
+        factor = 1.0
+        if dividend > 0 and i > 0 and closes[i - 1] > 0:
+            raw_previous = closes[i - 1] / later + dividend
+            factor = 1 - dividend / raw_previous
+            later *= factor
+        rows.append((ticker, dates[i], float(dividend), float(split), float(factor)))
+    rows.reverse()
+    return rows
+
+
+def _date_strings(index):
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.strftime("%Y-%m-%d")
@@ -0,0 +1,319 @@
+# Optional multi-process backend: symbols are sharded across worker
+# processes that fetch, parse and reduce their shard to compact rows.
+import os
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from market_data import DEFAULT_CHUNK_SIZE, unique_tickers, ytd_range
+from portfolio import Holdings, lots_frame
+from instrumentation import tracer
+
+# Worker processes when none is given; 0 or 1 means run in-process
+DEFAULT_PROCESSES = max(1, (os.cpu_count() or 2) - 1)
+
+# Shards per worker, so a slow shard doesn't leave the others idle at the end
+SHARDS_PER_PROCESS = 2
+
+# Columns of a YTD row; the status is kept separately as an int8 code
+YTD_COLUMNS = ('current_price', 'ytd_start_price', 'ytd_change_pct', 'session_open', 'high')
+YTD_STATUSES = ('UP', 'DOWN', 'FLAT', 'NO DATA', 'ERROR')
+
+# Columns of a lot row; the status is the portfolio STATUS_* code
+LOT_COLUMNS = ('purchase_price', 'current_price')
+
+
+class SharedRows:
+    """A (rows x columns) float64 block plus an int8 status per row.
+
+    Both live in one shared-memory segment, so a worker writes its results
+    straight into memory the parent reads; only the segment name crosses
+    the process boundary. With shared=False the arrays are ordinary
+    process-local memory (the in-process path).
+    """
+
+    def __init__(self, rows, columns, name=None, shared=True):
+        self.rows = rows
+        self.columns = columns
+        size = rows * columns * 8 + rows
+        self.shm = None
+        if not shared:
+            buffer = bytearray(max(1, size))
+        else:
+            from multiprocessing import shared_memory
+            if name is None:
+                self.shm = shared_memory.SharedMemory(create=True, size=max(1, size))
+            else:
+                self.shm = shared_memory.SharedMemory(name=name)
+            buffer = self.shm.buf
+        self.values = np.ndarray((rows, columns), dtype=np.float64, buffer=buffer)
+        self.status = np.ndarray(rows, dtype=np.int8, buffer=buffer, offset=rows * columns * 8)
+        if name is None:
+            self.values.fill(np.nan)
+            self.status.fill(-1)
+
+    @property
+    def name(self):
+        return self.shm.name if self.shm is not None else None
+
+    def close(self, unlink=False):
+        # The numpy views hold buffer exports that must go before the segment closes
+        self.values = self.status = None
+        if self.shm is not None:
+            self.shm.close()
+            if unlink:
+                self.shm.unlink()
+            self.shm = None
+
+
+# Worker side. Each process builds its own price source once, in the initializer.
+_worker_source = None
+
+
+def _init_worker(source_options, provider_factory):
+    global _worker_source
+    if provider_factory is not None:
+        import market_data
+        market_data.set_default_provider(provider_factory())
+    from tracker_core import make_source
+    _worker_source = make_source(**source_options)
+
+
+def _run_in_worker(reduce, name, rows, columns, args):
+    block = SharedRows(rows, columns, name=name)
+    try:
+        return reduce(_worker_source, block, *args)
+    finally:
+        block.close()
+
+
+def _reduce_ytd(source, block, tickers, start, end, chunk_size):
+    """Fetch a shard and write one YTD row per ticker; returns {ticker: error}"""
+    from tracker_core import ytd_result
+
+    errors = {}
+    for offset in range(0, len(tickers), chunk_size):
+        chunk = tickers[offset:offset + chunk_size]
+        histories, chunk_errors = source.fetch_histories(chunk, start=start, end=end)
+        for i, ticker in enumerate(chunk, offset):
+            result = ytd_result(ticker, histories.get(ticker), chunk_errors.get(ticker))
+            block.status[i] = YTD_STATUSES.index(result['status'])
+            block.values[i] = [np.nan if result[c] is None else result[c] for c in YTD_COLUMNS]
+            if result['error'] is not None:
+                errors[ticker] = result['error']
+    return errors
+
+
+def _reduce_lots(source, block, symbols, ticker_ids, shares, days, chunk_size):
+    """Value a shard of lots and write one row per lot; returns {ticker: error}"""
+    from tracker_core import iter_portfolio
+
+    holdings = Holdings(capacity=max(64, len(ticker_ids)))
+    holdings.extend([symbols[i] for i in ticker_ids], shares, days.astype('datetime64[D]'))
+    errors = {}
+    for lots, chunk_errors in iter_portfolio(holdings, source, chunk_size=chunk_size):
+        index = lots['lot'].to_numpy()
+        block.values[index, 0] = lots['purchase_price'].to_numpy()
+        block.values[index, 1] = lots['current_price'].to_numpy()
+        block.status[index] = lots['status'].to_numpy()
+        errors.update(chunk_errors)
+    return errors
+
+
+def decode_ytd(tickers, block, errors):
+    """YTD result dicts (the ytd_result() shape) from a block of rows"""
+    results = []
+    values = block.values.tolist()
+    for ticker, row, code in zip(tickers, values, block.status.tolist()):
+        result = {'ticker': ticker, 'status': YTD_STATUSES[code] if code >= 0 else 'ERROR',
+                  'error': errors.get(ticker)}
+        for column, value in zip(YTD_COLUMNS, row):
+            result[column] = None if value != value else value
+        results.append(result)
+    return results
+
+
+class ShardPool:
+    """Runs YTD and portfolio refreshes on a pool of worker processes.
+
+    The symbol list is split into shards (about SHARDS_PER_PROCESS per
+    worker). A worker fetches its shard through its own price source
+    (make_source(**source_options), so the SQLite cache is shared on
+    disk), reduces it to fixed-width numeric rows and writes them into a
+    SharedRows segment the parent created; the only things pickled are
+    the shard's inputs and a small {ticker: error} dict. No DataFrame
+    crosses the process boundary.
+
+    With processes <= 1, or when the pool or shared memory can't be set
+    up (restricted sandboxes, frozen apps), shards run in-process on
+    `source`, with identical results. A pool that breaks mid-run (a worker
+    killed) falls back the same way for the shards still outstanding.
+    In-process shards run on a small thread pool of the ShardPool's own,
+    never on the thread that submitted them (the Tk thread in the GUI) or
+    on a future's done-callback. fallback_reason says why the pool isn't
+    in use.
+    """
+
+    def __init__(self, processes=DEFAULT_PROCESSES, source=None, source_options=None,
+                 provider_factory=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.processes = processes
+        self.source = source
+        self.source_options = dict(source_options or {})
+        self.chunk_size = chunk_size
+        self.executor = None
+        self.local_executor = None
+        self.fallback_reason = None
+        if processes <= 1:
+            self.fallback_reason = "single process"
+            return
+        try:
+            # spawn: forking a process that runs Tk or fetch threads isn't safe
+            self.executor = ProcessPoolExecutor(
+                max_workers=processes, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker, initargs=(self.source_options, provider_factory))
+            SharedRows(1, 1).close(unlink=True)
+        except (OSError, ImportError, NotImplementedError, ValueError) as e:
+            self._degrade(e)
+
+    @property
+    def in_process(self):
+        return self.executor is None
+
+    def _degrade(self, error):
+        self.fallback_reason = f"{type(error).__name__}: {error}"
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def _local_source(self):
+        if self.source is None:
+            from tracker_core import make_source
+            self.source = make_source(**self.source_options)
+        return self.source
+
+    def _run_local(self, reduce, block, args):
+        """Submit reduce to the in-process threads; the source is made there too"""
+        if self.local_executor is None:
+            self.local_executor = ThreadPoolExecutor(max_workers=max(1, self.processes),
+                                                     thread_name_prefix="shard-local")
+        return self.local_executor.submit(lambda: reduce(self._local_source(), block, *args))
+
+    def shards(self, items):
+        """Split items into roughly equal shards, one or more per worker"""
+        count = max(1, self.processes * SHARDS_PER_PROCESS)
+        size = max(1, -(-len(items) // count))
+        return [items[i:i + size] for i in range(0, len(items), size)]
+
+    def _submit(self, reduce, rows, columns, args, decode):
+        """Future for decode(block, errors) once reduce has filled a block"""
+        outer = Future()
+        inner = None
+        if self.executor is not None:
+            block = None
+            try:
+                block = SharedRows(rows, columns)
+                inner = self.executor.submit(_run_in_worker, reduce, block.name, rows, columns, args)
+            except (OSError, RuntimeError, BrokenProcessPool) as e:
+                if block is not None:
+                    block.close(unlink=True)
+                self._degrade(e)
+
+        if inner is None:
+            block = SharedRows(rows, columns, shared=False)
+            inner = self._run_local(reduce, block, args)
+        self._chain(outer, inner, block, reduce, args, decode)
+        return outer
+
+    def _chain(self, outer, inner, block, reduce, args, decode):
+        """Resolve outer from inner, redoing the shard in-process if the pool broke"""
+        def finish(inner):
+            if outer.cancelled():
+                block.close(unlink=True)
+                return
+            try:
+                errors = inner.result()
+            except BrokenProcessPool as e:
+                # The parent's mapping of the block is still good; refill it here
+                self._degrade(e)
+                self._chain(outer, self._run_local(reduce, block, args), block, reduce, args, decode)
+                return
+            except BaseException as e:
+                if not outer.done():
+                    outer.set_exception(e)
+                block.close(unlink=True)
+                return
+            try:
+                outer.set_result(decode(block, errors))
+            except BaseException as e:
+                if not outer.done():
+                    outer.set_exception(e)
+            finally:
+                block.close(unlink=True)
+
+        # Cancelling the returned future also drops the shard if it hasn't started
+        outer.add_done_callback(lambda f: f.cancelled() and inner.cancel())
+        inner.add_done_callback(finish)
+
+    def submit_ytd(self, tickers, now=None):
+        """Futures, one per shard, each resolving to a list of YTD result dicts"""
+        start, end = ytd_range(now)
+        futures = []
+        for shard in self.shards(unique_tickers(tickers)):
+            decode = (lambda shard: lambda block, errors: decode_ytd(shard, block, errors))(shard)
+            futures.append(self._submit(_reduce_ytd, len(shard), len(YTD_COLUMNS),
+                                        (shard, start, end, self.chunk_size), decode))
+        return futures
+
+    def submit_portfolio(self, holdings):
+        """Futures, one per shard of symbols, each resolving to (lots, errors)
+        with lots shaped like value_holdings() output"""
+        futures = []
+        ticker_ids = holdings.ticker_ids
+        # Lots refer to shard symbols by their position in the shard
+        position = np.full(len(holdings.symbols), -1, dtype=np.int32)
+        for shard in self.shards(holdings.held_symbols()):
+            shard_ids = np.array([holdings.symbol_ids[ticker] for ticker in shard], dtype=np.int32)
+            lot_index = np.flatnonzero(np.isin(ticker_ids, shard_ids))
+            position[shard_ids] = np.arange(len(shard), dtype=np.int32)
+            args = (shard, position[ticker_ids[lot_index]], holdings.shares[lot_index].copy(),
+                    holdings.purchase_days[lot_index].copy(), self.chunk_size)
+
+            def decode(block, errors, lot_index=lot_index):
+                lots = lots_frame(holdings, lot_index, block.values[:, 0].copy(),
+                                  block.values[:, 1].copy(), block.status.astype(np.int64))
+                return lots, errors
+            futures.append(self._submit(_reduce_lots, len(lot_index), len(LOT_COLUMNS), args, decode))
+        return futures
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        if self.local_executor is not None:
+            self.local_executor.shutdown(wait=False, cancel_futures=True)
+            self.local_executor = None
+
+
+def iter_ytd_sharded(tickers, pool, now=None):
+    """Like tracker_core.iter_ytd, with shards running in the pool's processes.
+
+    Every shard is submitted up front; rows come back in ticker order.
+    """
+    with tracer.span("ytd.sharded", "fetch", symbols=len(tickers), processes=pool.processes):
+        for future in pool.submit_ytd(tickers, now):
+            yield from future.result()
+
+
+def iter_portfolio_sharded(holdings, pool, valuation=None):
+    """Like tracker_core.iter_portfolio, with shards running in the pool's processes.
+
+    The valuation, if any, is applied here in the parent, where its
+    reference data (actions from the shared cache, FX series) is read.
+    """
+    with tracer.span("portfolio.sharded", "fetch", lots=len(holdings), processes=pool.processes):
+        for future in pool.submit_portfolio(holdings):
+            lots, errors = future.result()
+            if valuation is not None:
+                lots, valuation_errors = valuation.apply(lots)
+                errors = {**errors, **valuation_errors}
+            yield lots, errors
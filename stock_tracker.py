@@ -1,8 +1,40 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-import yfinance as yf
+import sys
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Headless commands (python -m stock_tracker ytd ...) run cli as the main
+    # module, so neither tkinter nor this module is loaded, not even by
+    # process-pool workers (spawned workers re-import the main module)
+    import runpy
+    runpy.run_module("cli", run_name="__main__", alter_sys=True)
+    sys.exit()
+
+import os
+if __name__ != "__mp_main__":
+    # GUI-only; skipped when a pool worker re-imports this module
+    import tkinter as tk
+    from tkinter import ttk, messagebox, filedialog
+    from virtual_table import VirtualTreeview
+    from autocomplete import TickerCompleter
 from datetime import datetime
+import numpy as np
 import pandas as pd
+from market_data import chunked, fetch_intraday, fetch_latest_quotes, unique_tickers, ytd_range
+from fetch_worker import BackgroundFetcher
+from price_cache import PriceCache
+from history_cache import HistoryCache
+from portfolio import (Holdings, STATUS_ERROR, STATUS_NO_DATA, STATUS_OK, revalue_lots,
+                       summarize_lots, value_holdings)
+from live_refresh import DEFAULT_INTERVAL, MARKET_TZ, MIN_INTERVAL, LiveScheduler, is_market_open
+from tracker_core import parse_tickers, ytd_result
+from process_pool import ShardPool
+from holdings_io import export_holdings, import_holdings, load_holdings, save_holdings
+from instrumentation import SamplingProfiler, format_summary, tracer
+from analytics import DEFAULT_BENCHMARK, RETURN_WINDOWS, RollingAnalytics, lookback_start
+from portfolio_history import PortfolioHistoryStore, history_stats, update_portfolio_history
+from alerts import CONDITIONS, AlertEngine, desktop_notify, load_rules, log_alerts, save_rules
+from corporate_actions import CURRENCY_SYMBOLS, DEFAULT_BASE_CURRENCY, Valuation, currency_symbol
+from symbol_index import INDEX_MAX_AGE, SymbolIndex, refresh_symbol_index
+from intraday import TIMEFRAMES, IntradayAggregator, bar_arrays
 
 class StockTrackerApp:
     def __init__(self, root):
@@ -44,6 +76,39 @@ class StockTrackerApp:
                                          padx=10, pady=5)
         self.dark_mode_button.pack(side=tk.RIGHT)
         
+        # Live updates toggle and polling interval
+        self.live_var = tk.BooleanVar(value=False)
+        self.live_check = tk.Checkbutton(top_bar, text="⏱ Live Updates", 
+                                         variable=self.live_var,
+                                         command=self.toggle_live_mode,
+                                         font=("Arial", 10, "bold"))
+        self.live_check.pack(side=tk.RIGHT, padx=10)
+        
+        self.live_interval_var = tk.StringVar(value=str(DEFAULT_INTERVAL))
+        live_interval_spinbox = tk.Spinbox(top_bar, from_=MIN_INTERVAL, to=3600, increment=15, width=5,
+                                           textvariable=self.live_interval_var,
+                                           font=("Arial", 10))
+        live_interval_spinbox.pack(side=tk.RIGHT)
+        tk.Label(top_bar, text="Every (s):", font=("Arial", 10)).pack(side=tk.RIGHT, padx=5)
+        
+        # Worker processes for YTD/portfolio refreshes; 0 keeps everything in this process
+        self.processes_var = tk.StringVar(value="0")
+        processes_spinbox = tk.Spinbox(top_bar, from_=0, to=max(1, os.cpu_count() or 1), width=3,
+                                       textvariable=self.processes_var, font=("Arial", 10))
+        processes_spinbox.pack(side=tk.RIGHT, padx=(0, 10))
+        tk.Label(top_bar, text="Processes:", font=("Arial", 10)).pack(side=tk.RIGHT, padx=5)
+        
+        # Most recent triggered alert
+        self.alert_label = tk.Label(top_bar, text="", font=("Arial", 10, "bold"), fg="#E65100", anchor=tk.W)
+        self.alert_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        # Symbol master used to check and complete tickers before anything is fetched
+        try:
+            self.symbol_index = SymbolIndex.load()
+        except (OSError, ValueError):
+            self.symbol_index = SymbolIndex()
+        self._symbols_learned = False
+        
         # Create notebook (tabs)
         self.notebook = ttk.Notebook(root)
         self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
@@ -51,20 +116,107 @@ class StockTrackerApp:
         # Create tabs
         self.ytd_tab = tk.Frame(self.notebook)
         self.portfolio_tab = tk.Frame(self.notebook)
+        self.analytics_tab = tk.Frame(self.notebook)
+        self.intraday_tab = tk.Frame(self.notebook)
+        self.alerts_tab = tk.Frame(self.notebook)
+        self.diagnostics_tab = tk.Frame(self.notebook)
         
         self.notebook.add(self.ytd_tab, text="YTD Performance")
         self.notebook.add(self.portfolio_tab, text="My Portfolio")
+        self.notebook.add(self.analytics_tab, text="Analytics")
+        self.notebook.add(self.intraday_tab, text="Intraday")
+        self.notebook.add(self.alerts_tab, text="Alerts")
+        self.notebook.add(self.diagnostics_tab, text="Diagnostics")
         
         # Setup each tab
         self.setup_ytd_tab()
         self.setup_portfolio_tab()
+        self.setup_analytics_tab()
+        self.setup_intraday_tab()
+        self.setup_alerts_tab()
+        self.setup_diagnostics_tab()
+        
+        # Portfolio holdings, stored column-wise
+        self.portfolio_holdings = Holdings()
+        self.load_saved_holdings()
+        self.portfolio_totals = {'cost': 0, 'value': 0}
+        
+        # Last full refresh, kept so live updates can patch rows in place
+        self.ytd_start_prices = {}
+        self.last_quotes = {}
+        self.portfolio_lots = None
+        self._portfolio_lot_frames = []
+        
+        # Currency symbol the lots on screen are valued in
+        self.money = currency_symbol(DEFAULT_BASE_CURRENCY)
+        
+        # Rolling statistics; kept between runs so new bars are applied incrementally
+        self.analytics = None
+        self._analytics_histories = {}
+        self._analytics_errors = {}
+        
+        # Minute bars per symbol in fixed-size rings, and the symbols the Intraday tab follows
+        self.intraday = IntradayAggregator()
+        self._intraday_symbols = []
+        
+        # Alert rules, checked whenever new prices arrive
+        self.alert_engine = AlertEngine()
+        self.load_alert_rules()
+        
+        # Background fetches stream results back in chunks of this many symbols
+        self.fetcher = BackgroundFetcher(root)
+        self.fetch_chunk_size = 25
+        
+        # Optional process pool (see the Processes box) and its in-flight shards per channel
+        self.shard_pool = None
+        self._shard_futures = {}
+        
+        # Local price store; refreshes only download bars newer than what's on disk
+        self.price_cache = PriceCache()
+        
+        # Daily portfolio value series, extended a day at a time
+        self.history_store = PortfolioHistoryStore()
+        self.history_window = None
+        self.history_money = "$"
         
-        # Portfolio holdings list
-        self.portfolio_holdings = []
+        # In-memory series shared by the YTD and portfolio tabs
+        self.history_cache = HistoryCache(self.price_cache, keep_ohlc=True)
+        
+        # Keep the symbol master current in the background
+        self.refresh_symbols()
+        
+        # Optional live mode: polls latest quotes on a timer
+        self.live_scheduler = LiveScheduler(root, self._live_tick)
+        
+        # Timing of the refresh in progress per channel, plus the opt-in profiler
+        self._refresh_started = {}
+        self._first_row_at = {}
+        self.profile_next = False
+        self.profiler = None
+        
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # Apply initial theme
         self.apply_theme()
     
+    def on_close(self):
+        self.live_scheduler.stop()
+        self.fetcher.shutdown()
+        if self.shard_pool is not None:
+            self.shard_pool.close()
+        try:
+            save_holdings(self.portfolio_holdings)
+        except Exception as e:
+            messagebox.showerror("Save Error", f"Could not save portfolio: {e}")
+        self.save_alert_rules()
+        if self._symbols_learned:
+            try:
+                self.symbol_index.save()
+            except OSError:
+                pass
+        self.price_cache.close()
+        self.root.destroy()
+    
     def toggle_dark_mode(self):
         self.dark_mode = not self.dark_mode
         if self.dark_mode:
@@ -82,6 +234,10 @@ class StockTrackerApp:
         # Configure tabs
         self.ytd_tab.config(bg=colors['bg'])
         self.portfolio_tab.config(bg=colors['bg'])
+        self.analytics_tab.config(bg=colors['bg'])
+        self.intraday_tab.config(bg=colors['bg'])
+        self.alerts_tab.config(bg=colors['bg'])
+        self.diagnostics_tab.config(bg=colors['bg'])
         
         # Configure treeview style
         style = ttk.Style()
@@ -103,12 +259,20 @@ class StockTrackerApp:
         # Update all widgets recursively
         self.update_widget_colors(self.ytd_tab, colors)
         self.update_widget_colors(self.portfolio_tab, colors)
+        self.update_widget_colors(self.analytics_tab, colors)
+        self.update_widget_colors(self.intraday_tab, colors)
+        self.update_widget_colors(self.alerts_tab, colors)
+        self.update_widget_colors(self.diagnostics_tab, colors)
     
     def update_widget_colors(self, widget, colors):
         """Recursively update colors for all widgets"""
         try:
             widget_type = widget.winfo_class()
             
+            # ttk tables are themed through ttk.Style in apply_theme
+            if widget_type in ('Treeview', 'TScrollbar'):
+                return
+            
             if widget_type == 'Frame' or widget_type == 'Labelframe':
                 widget.config(bg=colors['bg'])
                 if widget_type == 'Labelframe':
@@ -116,7 +280,7 @@ class StockTrackerApp:
             elif widget_type == 'Label':
                 if widget.cget('bg') != 'SystemButtonFace':  # Skip button-like labels
                     widget.config(bg=colors['bg'], fg=colors['fg'])
-            elif widget_type == 'Entry':
+            elif widget_type in ('Entry', 'Text'):
                 widget.config(bg=colors['entry_bg'], fg=colors['entry_fg'], 
                             insertbackground=colors['fg'])
             
@@ -143,6 +307,7 @@ class StockTrackerApp:
         self.ticker_entry = tk.Entry(input_frame, width=40, font=("Arial", 11))
         self.ticker_entry.grid(row=0, column=1, padx=5)
         self.ticker_entry.insert(0, "AAPL, TSLA, MSFT, GOOGL")
+        self.ticker_completer = TickerCompleter(self.ticker_entry, lambda: self.symbol_index, multiple=True)
         
         # Fetch Button
         fetch_button = tk.Button(input_frame, text="Get YTD Performance", 
@@ -164,21 +329,15 @@ class StockTrackerApp:
         results_frame = tk.Frame(self.ytd_tab)
         results_frame.pack(pady=20, fill=tk.BOTH, expand=True)
         
-        # Treeview (Table)
+        # Treeview (Table) with its own scrollbar; only visible rows are materialized
         columns = ("Ticker", "Current Price", "YTD Start Price", "YTD Change %", "Status")
-        self.ytd_tree = ttk.Treeview(results_frame, columns=columns, show="headings", height=15)
+        self.ytd_tree = VirtualTreeview(results_frame, columns=columns, height=15)
         
         # Define column headings
         for col in columns:
             self.ytd_tree.heading(col, text=col)
             self.ytd_tree.column(col, anchor=tk.CENTER, width=150)
         
-        # Scrollbar
-        scrollbar = ttk.Scrollbar(results_frame, orient=tk.VERTICAL, command=self.ytd_tree.yview)
-        self.ytd_tree.configure(yscroll=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.ytd_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        
         # Configure tags for color coding
         self.ytd_tree.tag_configure('positive', background='#c8e6c9')  # Light green
         self.ytd_tree.tag_configure('negative', background='#ffcdd2')  # Light red
@@ -204,6 +363,7 @@ class StockTrackerApp:
         self.pf_ticker_label.grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
         self.portfolio_ticker_entry = tk.Entry(input_frame, width=15, font=("Arial", 10))
         self.portfolio_ticker_entry.grid(row=0, column=1, padx=5, pady=5)
+        self.portfolio_completer = TickerCompleter(self.portfolio_ticker_entry, lambda: self.symbol_index)
         
         # Shares input
         self.pf_shares_label = tk.Label(input_frame, text="Shares:", font=("Arial", 10))
@@ -251,14 +411,51 @@ class StockTrackerApp:
                                 padx=10, pady=5)
         clear_button.pack(side=tk.LEFT, padx=5)
         
+        import_button = tk.Button(button_frame, text="📂 Import", 
+                                  command=self.import_portfolio,
+                                  bg="#607D8B", fg="white", 
+                                  font=("Arial", 11, "bold"),
+                                  padx=10, pady=5)
+        import_button.pack(side=tk.LEFT, padx=5)
+        
+        export_button = tk.Button(button_frame, text="💾 Export", 
+                                  command=self.export_portfolio,
+                                  bg="#607D8B", fg="white", 
+                                  font=("Arial", 11, "bold"),
+                                  padx=10, pady=5)
+        export_button.pack(side=tk.LEFT, padx=5)
+        
+        history_button = tk.Button(button_frame, text="📈 History", 
+                                   command=self.show_portfolio_history,
+                                   bg="#9C27B0", fg="white", 
+                                   font=("Arial", 11, "bold"),
+                                   padx=10, pady=5)
+        history_button.pack(side=tk.LEFT, padx=5)
+        
+        # Valuation options: base currency and whether dividends are reinvested
+        options_frame = tk.Frame(self.portfolio_tab)
+        options_frame.pack(pady=2)
+        
+        tk.Label(options_frame, text="Base currency:", font=("Arial", 10)).pack(side=tk.LEFT, padx=5)
+        self.base_currency_var = tk.StringVar(value=DEFAULT_BASE_CURRENCY)
+        base_currency_combo = ttk.Combobox(options_frame, textvariable=self.base_currency_var,
+                                           values=list(CURRENCY_SYMBOLS), width=6, state="readonly")
+        base_currency_combo.pack(side=tk.LEFT, padx=5)
+        base_currency_combo.bind("<<ComboboxSelected>>", lambda e: self.on_valuation_change())
+        
+        self.total_return_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(options_frame, text="Reinvest dividends (total return)",
+                       variable=self.total_return_var, command=self.on_valuation_change,
+                       font=("Arial", 10)).pack(side=tk.LEFT, padx=10)
+        
         # Portfolio table frame
         portfolio_frame = tk.Frame(self.portfolio_tab)
         portfolio_frame.pack(pady=10, fill=tk.BOTH, expand=True, padx=20)
         
-        # Portfolio Treeview
+        # Portfolio Treeview (virtualized, with its own scrollbar)
         columns = ("Ticker", "Shares", "Purchase Date", "Purchase Price", "Current Price", 
-                   "Total Cost", "Current Value", "Gain/Loss $", "Gain/Loss %")
-        self.portfolio_tree = ttk.Treeview(portfolio_frame, columns=columns, show="headings", height=12)
+                   "Total Cost", "Current Value", "Gain/Loss", "Gain/Loss %")
+        self.portfolio_tree = VirtualTreeview(portfolio_frame, columns=columns, height=12)
         
         # Column widths
         column_widths = {
@@ -269,7 +466,7 @@ class StockTrackerApp:
             "Current Price": 100,
             "Total Cost": 100,
             "Current Value": 100,
-            "Gain/Loss $": 100,
+            "Gain/Loss": 100,
             "Gain/Loss %": 100
         }
         
@@ -281,13 +478,6 @@ class StockTrackerApp:
         self.portfolio_tree.tag_configure('gain', background='#c8e6c9')  # Light green
         self.portfolio_tree.tag_configure('loss', background='#ffcdd2')  # Light red
         
-        # Scrollbar
-        portfolio_scrollbar = ttk.Scrollbar(portfolio_frame, orient=tk.VERTICAL, 
-                                           command=self.portfolio_tree.yview)
-        self.portfolio_tree.configure(yscroll=portfolio_scrollbar.set)
-        portfolio_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.portfolio_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        
         # Summary frame
         summary_frame = tk.LabelFrame(self.portfolio_tab, text="Portfolio Summary", 
                                      font=("Arial", 12, "bold"), padx=10, pady=10)
@@ -310,10 +500,278 @@ class StockTrackerApp:
                                               font=("Arial", 10), fg="blue")
         self.portfolio_status_label.pack(pady=5)
     
+    def setup_analytics_tab(self):
+        # Title
+        self.analytics_title_label = tk.Label(self.analytics_tab, text="Risk & Return Analytics", 
+                                              font=("Arial", 16, "bold"))
+        self.analytics_title_label.pack(pady=10)
+        
+        # Input Frame
+        input_frame = tk.Frame(self.analytics_tab)
+        input_frame.pack(pady=5)
+        
+        self.analytics_input_label = tk.Label(input_frame, text="Tickers:", font=("Arial", 11))
+        self.analytics_input_label.grid(row=0, column=0, padx=5)
+        
+        self.analytics_entry = tk.Entry(input_frame, width=40, font=("Arial", 11))
+        self.analytics_entry.grid(row=0, column=1, padx=5)
+        self.analytics_entry.insert(0, "AAPL, TSLA, MSFT, GOOGL")
+        
+        self.benchmark_label = tk.Label(input_frame, text="Benchmark:", font=("Arial", 11))
+        self.benchmark_label.grid(row=0, column=2, padx=5)
+        
+        self.benchmark_entry = tk.Entry(input_frame, width=8, font=("Arial", 11))
+        self.benchmark_entry.grid(row=0, column=3, padx=5)
+        self.benchmark_entry.insert(0, DEFAULT_BENCHMARK)
+        
+        analyze_button = tk.Button(input_frame, text="Analyze", 
+                                   command=self.run_analytics, 
+                                   bg="#4CAF50", fg="white", 
+                                   font=("Arial", 11, "bold"),
+                                   padx=10, pady=5)
+        analyze_button.grid(row=0, column=4, padx=5)
+        
+        use_portfolio_button = tk.Button(input_frame, text="Use Portfolio", 
+                                         command=self.use_portfolio_for_analytics, 
+                                         bg="#607D8B", fg="white", 
+                                         font=("Arial", 11, "bold"),
+                                         padx=10, pady=5)
+        use_portfolio_button.grid(row=0, column=5, padx=5)
+        
+        # Per-symbol statistics
+        results_frame = tk.Frame(self.analytics_tab)
+        results_frame.pack(pady=10, fill=tk.BOTH, expand=True, padx=20)
+        
+        columns = ("Ticker", "Last") + tuple(RETURN_WINDOWS) + ("Volatility", "Max Drawdown", "Beta")
+        self.analytics_tree = VirtualTreeview(results_frame, columns=columns, height=10)
+        for col in columns:
+            self.analytics_tree.heading(col, text=col)
+            self.analytics_tree.column(col, anchor=tk.CENTER, width=90)
+        
+        # Most correlated pairs; the full matrix can be exported
+        corr_frame = tk.LabelFrame(self.analytics_tab, text="Most Correlated Pairs (1Y daily returns)", 
+                                   font=("Arial", 12, "bold"), padx=10, pady=10)
+        corr_frame.pack(pady=5, padx=20, fill=tk.BOTH)
+        
+        corr_table_frame = tk.Frame(corr_frame)
+        corr_table_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.correlation_tree = VirtualTreeview(corr_table_frame, 
+                                                columns=("Ticker A", "Ticker B", "Correlation"), 
+                                                height=5)
+        for col in ("Ticker A", "Ticker B", "Correlation"):
+            self.correlation_tree.heading(col, text=col)
+            self.correlation_tree.column(col, anchor=tk.CENTER, width=120)
+        
+        export_corr_button = tk.Button(corr_frame, text="💾 Export Matrix", 
+                                       command=self.export_correlation,
+                                       bg="#607D8B", fg="white", 
+                                       font=("Arial", 11, "bold"),
+                                       padx=10, pady=5)
+        export_corr_button.pack(side=tk.RIGHT, padx=10)
+        
+        # Status Label
+        self.analytics_status_label = tk.Label(self.analytics_tab, text="Ready", 
+                                               font=("Arial", 10), fg="blue")
+        self.analytics_status_label.pack(pady=5)
+    
+    def setup_intraday_tab(self):
+        # Title
+        self.intraday_title_label = tk.Label(self.intraday_tab, text="Intraday Session", 
+                                             font=("Arial", 16, "bold"))
+        self.intraday_title_label.pack(pady=10)
+        
+        # Input Frame
+        input_frame = tk.Frame(self.intraday_tab)
+        input_frame.pack(pady=5)
+        
+        tk.Label(input_frame, text="Tickers:", font=("Arial", 11)).grid(row=0, column=0, padx=5)
+        self.intraday_entry = tk.Entry(input_frame, width=30, font=("Arial", 11))
+        self.intraday_entry.grid(row=0, column=1, padx=5)
+        self.intraday_entry.insert(0, "AAPL, TSLA, MSFT, GOOGL")
+        self.intraday_completer = TickerCompleter(self.intraday_entry, lambda: self.symbol_index, multiple=True)
+        
+        load_button = tk.Button(input_frame, text="Load Bars", 
+                                command=self.load_intraday, 
+                                bg="#4CAF50", fg="white", 
+                                font=("Arial", 11, "bold"),
+                                padx=10, pady=5)
+        load_button.grid(row=0, column=2, padx=5)
+        
+        # Live mode polls minute bars instead of daily quotes when this is on
+        self.intraday_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(input_frame, text="Use minute bars for live updates", 
+                       variable=self.intraday_var, font=("Arial", 10)).grid(row=0, column=3, padx=10)
+        
+        # Session figures per symbol
+        session_frame = tk.Frame(self.intraday_tab)
+        session_frame.pack(pady=5, fill=tk.BOTH, expand=True, padx=20)
+        
+        columns = ("Ticker", "Last", "Prev Close", "Session Change %", "Open", "High", "Low", "Volume", "As Of")
+        self.session_tree = VirtualTreeview(session_frame, columns=columns, height=8)
+        for col in columns:
+            self.session_tree.heading(col, text=col)
+            self.session_tree.column(col, anchor=tk.CENTER, width=90)
+        self.session_tree.tag_configure('positive', background='#c8e6c9')
+        self.session_tree.tag_configure('negative', background='#ffcdd2')
+        
+        # Bars for one symbol, rolled up to the chosen timeframe
+        bars_frame = tk.LabelFrame(self.intraday_tab, text="Session Bars", 
+                                   font=("Arial", 12, "bold"), padx=10, pady=10)
+        bars_frame.pack(pady=5, padx=20, fill=tk.BOTH, expand=True)
+        
+        bars_controls = tk.Frame(bars_frame)
+        bars_controls.pack(fill=tk.X)
+        tk.Label(bars_controls, text="Symbol:", font=("Arial", 10)).pack(side=tk.LEFT, padx=5)
+        self.bars_symbol_var = tk.StringVar()
+        self.bars_symbol_combo = ttk.Combobox(bars_controls, textvariable=self.bars_symbol_var, 
+                                              width=10, state="readonly")
+        self.bars_symbol_combo.pack(side=tk.LEFT, padx=5)
+        self.bars_symbol_combo.bind("<<ComboboxSelected>>", lambda e: self.render_intraday_bars())
+        tk.Label(bars_controls, text="Timeframe:", font=("Arial", 10)).pack(side=tk.LEFT, padx=5)
+        self.timeframe_var = tk.StringVar(value="5m")
+        timeframe_combo = ttk.Combobox(bars_controls, textvariable=self.timeframe_var, 
+                                       values=list(TIMEFRAMES), width=5, state="readonly")
+        timeframe_combo.pack(side=tk.LEFT, padx=5)
+        timeframe_combo.bind("<<ComboboxSelected>>", lambda e: self.render_intraday_bars())
+        
+        bars_table_frame = tk.Frame(bars_frame)
+        bars_table_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        bar_columns = ("Time", "Open", "High", "Low", "Close", "Volume")
+        self.bars_tree = VirtualTreeview(bars_table_frame, columns=bar_columns, height=8)
+        for col in bar_columns:
+            self.bars_tree.heading(col, text=col)
+            self.bars_tree.column(col, anchor=tk.CENTER, width=100)
+        
+        # Status Label
+        self.intraday_status_label = tk.Label(self.intraday_tab, text="Ready", 
+                                              font=("Arial", 10), fg="blue")
+        self.intraday_status_label.pack(pady=5)
+    
+    def setup_alerts_tab(self):
+        # Title
+        self.alerts_title_label = tk.Label(self.alerts_tab, text="Price Alerts", 
+                                           font=("Arial", 16, "bold"))
+        self.alerts_title_label.pack(pady=10)
+        
+        # Input Frame
+        input_frame = tk.LabelFrame(self.alerts_tab, text="New Alert", 
+                                    font=("Arial", 12, "bold"), padx=10, pady=10)
+        input_frame.pack(pady=5, padx=20, fill=tk.X)
+        
+        self.alert_ticker_label = tk.Label(input_frame, text="Ticker:", font=("Arial", 10))
+        self.alert_ticker_label.grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
+        self.alert_ticker_entry = tk.Entry(input_frame, width=10, font=("Arial", 10))
+        self.alert_ticker_entry.grid(row=0, column=1, padx=5, pady=5)
+        
+        self.alert_condition_var = tk.StringVar(value=CONDITIONS[0][0])
+        condition_box = ttk.Combobox(input_frame, textvariable=self.alert_condition_var, state="readonly",
+                                     values=[label for label, _, _ in CONDITIONS], width=22)
+        condition_box.grid(row=0, column=2, padx=5, pady=5)
+        
+        self.alert_value_entry = tk.Entry(input_frame, width=10, font=("Arial", 10))
+        self.alert_value_entry.grid(row=0, column=3, padx=5, pady=5)
+        
+        add_button = tk.Button(input_frame, text="Add Alert", 
+                               command=self.add_alert_rule,
+                               bg="#2196F3", fg="white",
+                               font=("Arial", 10, "bold"))
+        add_button.grid(row=0, column=4, padx=10, pady=5)
+        
+        self.notify_var = tk.BooleanVar(value=False)
+        notify_check = tk.Checkbutton(input_frame, text="Desktop notifications", 
+                                      variable=self.notify_var, font=("Arial", 10))
+        notify_check.grid(row=0, column=5, padx=10, pady=5)
+        
+        # Rules table
+        rules_frame = tk.Frame(self.alerts_tab)
+        rules_frame.pack(pady=5, fill=tk.BOTH, expand=True, padx=20)
+        columns = ("Ticker", "Condition", "Threshold", "Last Triggered")
+        self.alert_rules_tree = VirtualTreeview(rules_frame, columns=columns, height=8)
+        for col in columns:
+            self.alert_rules_tree.heading(col, text=col)
+            self.alert_rules_tree.column(col, anchor=tk.CENTER, width=160)
+        self.alert_rules_tree.tag_configure('fired', background='#ffe0b2')  # Light orange
+        
+        button_frame = tk.Frame(self.alerts_tab)
+        button_frame.pack(pady=5)
+        
+        remove_button = tk.Button(button_frame, text="Remove Selected", 
+                                  command=self.remove_alert_rules,
+                                  bg="#f44336", fg="white", 
+                                  font=("Arial", 11, "bold"),
+                                  padx=10, pady=5)
+        remove_button.pack(side=tk.LEFT, padx=5)
+        
+        clear_button = tk.Button(button_frame, text="Clear All", 
+                                 command=self.clear_alert_rules,
+                                 bg="#607D8B", fg="white", 
+                                 font=("Arial", 11, "bold"),
+                                 padx=10, pady=5)
+        clear_button.pack(side=tk.LEFT, padx=5)
+        
+        # Recently triggered, newest first; everything also goes to alerts.log
+        self.alerts_text = tk.Text(self.alerts_tab, height=6, font=("Courier", 10), wrap=tk.NONE,
+                                   state=tk.DISABLED)
+        self.alerts_text.pack(pady=5, padx=20, fill=tk.X)
+    
+    def setup_diagnostics_tab(self):
+        # Title
+        self.diagnostics_title_label = tk.Label(self.diagnostics_tab, text="Refresh Diagnostics", 
+                                                font=("Arial", 16, "bold"))
+        self.diagnostics_title_label.pack(pady=10)
+        
+        # Buttons
+        button_frame = tk.Frame(self.diagnostics_tab)
+        button_frame.pack(pady=5)
+        
+        export_json_button = tk.Button(button_frame, text="Export JSON", 
+                                       command=lambda: self.export_trace("json"),
+                                       bg="#607D8B", fg="white", 
+                                       font=("Arial", 11, "bold"),
+                                       padx=10, pady=5)
+        export_json_button.pack(side=tk.LEFT, padx=5)
+        
+        export_trace_button = tk.Button(button_frame, text="Export Chrome Trace", 
+                                        command=lambda: self.export_trace("chrome"),
+                                        bg="#607D8B", fg="white", 
+                                        font=("Arial", 11, "bold"),
+                                        padx=10, pady=5)
+        export_trace_button.pack(side=tk.LEFT, padx=5)
+        
+        self.profile_button = tk.Button(button_frame, text="🔬 Profile Next Refresh", 
+                                        command=self.toggle_profile_next,
+                                        bg="#2196F3", fg="white", 
+                                        font=("Arial", 11, "bold"),
+                                        padx=10, pady=5)
+        self.profile_button.pack(side=tk.LEFT, padx=5)
+        
+        clear_button = tk.Button(button_frame, text="Clear", 
+                                 command=self.clear_diagnostics,
+                                 bg="#f44336", fg="white", 
+                                 font=("Arial", 11, "bold"),
+                                 padx=10, pady=5)
+        clear_button.pack(side=tk.LEFT, padx=5)
+        
+        # Report of the most recent refreshes, newest first
+        report_frame = tk.Frame(self.diagnostics_tab)
+        report_frame.pack(pady=10, fill=tk.BOTH, expand=True, padx=20)
+        
+        self.diagnostics_text = tk.Text(report_frame, height=20, font=("Courier", 10), wrap=tk.NONE)
+        diagnostics_scrollbar = ttk.Scrollbar(report_frame, orient=tk.VERTICAL,
+                                              command=self.diagnostics_text.yview)
+        self.diagnostics_text.configure(yscrollcommand=diagnostics_scrollbar.set, state=tk.DISABLED)
+        self.diagnostics_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        diagnostics_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # Status Label
+        self.diagnostics_status_label = tk.Label(self.diagnostics_tab, 
+                                                 text="Timings appear here after each refresh", 
+                                                 font=("Arial", 10), fg="blue")
+        self.diagnostics_status_label.pack(pady=5)
+    
     def fetch_ytd_data(self):
         # Clear previous results
-        for item in self.ytd_tree.get_children():
-            self.ytd_tree.delete(item)
+        self.ytd_tree.clear()
         
         # Get tickers from input
         tickers_input = self.ticker_entry.get().strip()
@@ -321,54 +779,179 @@ class StockTrackerApp:
             messagebox.showwarning("Input Error", "Please enter at least one ticker symbol!")
             return
         
-        tickers = [ticker.strip().upper() for ticker in tickers_input.split(",")]
+        # Typos are caught here rather than after a network round trip each
+        tickers = self.check_tickers(tickers_input.split(","))
+        if not tickers:
+            return
         
         self.ytd_status_label.config(text="Fetching data...", fg="orange")
-        self.root.update()
+        self.ytd_start_prices = {}
         
-        # Get current year start date
-        current_year = datetime.now().year
-        ytd_start = f"{current_year}-01-01"
-        today = datetime.now().strftime("%Y-%m-%d")
+        # Jan 1 through today's bar
+        ytd_start, end = ytd_range()
         
-        # Fetch data for each ticker
-        for ticker in tickers:
-            try:
-                stock = yf.Ticker(ticker)
-                hist = stock.history(start=ytd_start, end=today)
-                
-                if hist.empty:
-                    self.ytd_tree.insert("", tk.END, values=(ticker, "N/A", "N/A", "N/A", "No Data"))
-                    continue
-                
-                ytd_start_price = hist['Close'].iloc[0]
-                current_price = hist['Close'].iloc[-1]
-                ytd_change = ((current_price - ytd_start_price) / ytd_start_price) * 100
-                status = "📈 UP" if ytd_change > 0 else "📉 DOWN" if ytd_change < 0 else "→ FLAT"
-                
-                # Determine tag for color coding
-                if ytd_change > 0:
-                    tag = 'positive'
-                elif ytd_change < 0:
-                    tag = 'negative'
-                else:
-                    tag = 'neutral'
-                
-                self.ytd_tree.insert("", tk.END, values=(
-                    ticker,
-                    f"${current_price:.2f}",
-                    f"${ytd_start_price:.2f}",
-                    f"{ytd_change:+.2f}%",
-                    status
-                ), tags=(tag,))
-                
-            except Exception as e:
-                self.ytd_tree.insert("", tk.END, values=(ticker, "Error", "Error", "Error", str(e)[:20]))
-        
-        self.ytd_status_label.config(text="Data fetched successfully!", fg="green")
+        # Fetch chunks in the background; rows appear as each chunk lands.
+        # Starting a new fetch cancels any refresh still in flight.
+        pool = self._get_shard_pool()
+        if pool is not None:
+            tasks = self._shard_tasks("ytd", pool.submit_ytd(tickers))
+        else:
+            tasks = [self._ytd_task(chunk, ytd_start, end)
+                     for chunk in chunked(tickers, self.fetch_chunk_size)]
+        self._begin_refresh("ytd")
+        self.fetcher.start("ytd", tasks,
+                           on_result=self._on_ytd_chunk,
+                           on_done=self._on_ytd_done)
+    
+    def check_tickers(self, entered):
+        """Canonical, de-duplicated tickers from user input; malformed ones
+        are dropped and unknown ones only kept if the user confirms"""
+        tickers, problems = self.symbol_index.check(entered)
+        invalid = {ticker: problem for ticker, problem in problems.items() if problem == "not a valid ticker"}
+        unknown = {ticker: problem for ticker, problem in problems.items() if ticker not in invalid}
+        if invalid:
+            messagebox.showwarning("Input Error", "Skipping invalid tickers:\n" +
+                                   "\n".join(f"  {ticker}" for ticker in invalid))
+        if unknown:
+            details = "\n".join(f"  {ticker}: {problem}" for ticker, problem in unknown.items())
+            if messagebox.askyesno("Unknown Symbols", f"Not in the symbol list:\n{details}\n\nFetch anyway?"):
+                tickers, _ = self.symbol_index.check(entered, allow_unknown=True)
+                tickers = [ticker for ticker in tickers if ticker not in invalid]
+        return tickers
+    
+    def learn_symbols(self, tickers):
+        # Tickers that returned prices are real even if the listings don't have them
+        if self.symbol_index.learn(tickers):
+            self._symbols_learned = True
+    
+    def refresh_symbols(self):
+        """Re-download the symbol listings when the local copy is stale; re-checked hourly"""
+        self.root.after(3600 * 1000, self.refresh_symbols)
+        if not self.symbol_index.is_stale(INDEX_MAX_AGE) or self.fetcher.is_running("symbols"):
+            return
+        # Offline, the copy on disk stays in use until the next check succeeds
+        records = self.symbol_index.records()
+        
+        def on_result(index):
+            self.symbol_index = index
+        
+        self.fetcher.start("symbols", [lambda: refresh_symbol_index(records)], on_result=on_result)
+    
+    def _on_ytd_done(self):
+        self.ytd_status_label.config(
+            text=f"Data fetched successfully! ({self.history_cache.describe()})", fg="green")
+        self._end_refresh("ytd")
+    
+    def _fetch_task(self, tickers, start, end=None):
+        def task():
+            histories, errors = self.history_cache.fetch_histories(tickers, start=start, end=end)
+            return tickers, histories, errors
+        return task
+    
+    def _ytd_task(self, tickers, start, end):
+        # Fetch and reduce to ytd_result rows on the worker thread
+        def task():
+            histories, errors = self.history_cache.fetch_histories(tickers, start=start, end=end)
+            results = []
+            for ticker in tickers:
+                with tracer.span("ytd_result", "compute", symbol=ticker):
+                    try:
+                        row = ytd_result(ticker, histories.get(ticker), errors.get(ticker))
+                    except Exception as e:
+                        row = ytd_result(ticker, None, str(e))
+                results.append(row)
+            return results
+        return task
+    
+    def _get_shard_pool(self):
+        """The process pool for the current Processes setting, or None to use threads"""
+        try:
+            processes = int(self.processes_var.get())
+        except ValueError:
+            processes = 0
+        if processes <= 1:
+            return None
+        if self.shard_pool is None or self.shard_pool.processes != processes:
+            if self.shard_pool is not None:
+                self.shard_pool.close()
+            self.shard_pool = ShardPool(processes, source=self.history_cache,
+                                        source_options={'use_cache': True},
+                                        chunk_size=self.fetch_chunk_size)
+        if self.shard_pool.in_process:
+            # Pool unavailable here; the thread path does the same work
+            self.diagnostics_status_label.config(
+                text=f"Process pool unavailable ({self.shard_pool.fallback_reason}); using threads",
+                fg="orange")
+            return None
+        return self.shard_pool
+    
+    def _shard_tasks(self, channel, futures):
+        # Each task waits on one shard; cancel the shards of the previous job on this channel
+        for future in self._shard_futures.pop(channel, []):
+            future.cancel()
+        self._shard_futures[channel] = futures
+        return [future.result for future in futures]
+    
+    def _on_ytd_chunk(self, results):
+        with tracer.span("render.ytd", "render", rows=len(results)):
+            for row in results:
+                self._insert_ytd_row(row['ticker'], row)
+        self._first_row_at.setdefault("ytd", tracer.now())
+        
+        quotes = {}
+        for row in results:
+            ticker = row['ticker']
+            if row['current_price'] is None:
+                continue
+            quotes[ticker] = row['current_price']
+            if ticker in self.alert_engine.buckets:
+                self.alert_engine.set_reference(ticker, open=row['session_open'],
+                                                ytd_start=row['ytd_start_price'],
+                                                high=row['high'])
+        self.learn_symbols(quotes)
+        self.check_alerts(quotes)
+    
+    def _insert_ytd_row(self, ticker, result):
+        if result['status'] == 'ERROR':
+            self.ytd_tree.insert("", tk.END, iid=ticker,
+                                 values=(ticker, "Error", "Error", "Error", (result['error'] or "")[:20]))
+            return
+        
+        if result['status'] == 'NO DATA':
+            self.ytd_tree.insert("", tk.END, iid=ticker, values=(ticker, "N/A", "N/A", "N/A", "No Data"))
+            return
+        
+        ytd_start_price = result['ytd_start_price']
+        current_price = result['current_price']
+        values, tag = self._ytd_row(ticker, ytd_start_price, current_price)
+        
+        self.ytd_start_prices[ticker] = ytd_start_price
+        self.last_quotes[ticker] = current_price
+        self.ytd_tree.insert("", tk.END, iid=ticker, values=values, tags=(tag,))
+    
+    def _ytd_row(self, ticker, ytd_start_price, current_price):
+        ytd_change = ((current_price - ytd_start_price) / ytd_start_price) * 100
+        status = "📈 UP" if ytd_change > 0 else "📉 DOWN" if ytd_change < 0 else "→ FLAT"
+        
+        # Determine tag for color coding
+        if ytd_change > 0:
+            tag = 'positive'
+        elif ytd_change < 0:
+            tag = 'negative'
+        else:
+            tag = 'neutral'
+        
+        values = (
+            ticker,
+            f"${current_price:.2f}",
+            f"${ytd_start_price:.2f}",
+            f"{ytd_change:+.2f}%",
+            status
+        )
+        return values, tag
     
     def add_to_portfolio(self):
-        ticker = self.portfolio_ticker_entry.get().strip().upper()
+        ticker = self.portfolio_ticker_entry.get().strip()
         shares = self.shares_entry.get().strip()
         purchase_date = self.purchase_date_entry.get().strip()
         
@@ -376,6 +959,11 @@ class StockTrackerApp:
             messagebox.showwarning("Input Error", "Please fill in all fields!")
             return
         
+        tickers = self.check_tickers([ticker])
+        if not tickers:
+            return
+        ticker = tickers[0]
+        
         try:
             shares = float(shares)
             datetime.strptime(purchase_date, "%Y-%m-%d")
@@ -383,12 +971,8 @@ class StockTrackerApp:
             messagebox.showerror("Input Error", "Invalid shares or date format! Use YYYY-MM-DD for date.")
             return
         
-        # Add to holdings list
-        self.portfolio_holdings.append({
-            'ticker': ticker,
-            'shares': shares,
-            'purchase_date': purchase_date
-        })
+        # Add to holdings
+        self.portfolio_holdings.append(ticker, shares, purchase_date)
         
         # Clear inputs
         self.portfolio_ticker_entry.delete(0, tk.END)
@@ -402,90 +986,756 @@ class StockTrackerApp:
             return
         
         # Clear previous results
-        for item in self.portfolio_tree.get_children():
-            self.portfolio_tree.delete(item)
+        self.portfolio_tree.clear()
         
         self.portfolio_status_label.config(text="Calculating...", fg="orange")
-        self.root.update()
-        
-        total_cost = 0
-        total_value = 0
         
-        for holding in self.portfolio_holdings:
-            ticker = holding['ticker']
-            shares = holding['shares']
-            purchase_date = holding['purchase_date']
-            
-            try:
-                stock = yf.Ticker(ticker)
-                
-                # Get historical data from purchase date to today
-                hist = stock.history(start=purchase_date)
-                
-                if hist.empty:
-                    self.portfolio_tree.insert("", tk.END, values=(
-                        ticker, shares, purchase_date, "N/A", "N/A", "N/A", "N/A", "N/A", "N/A"
-                    ))
-                    continue
-                
-                # Get purchase price and current price
-                purchase_price = hist['Close'].iloc[0]
-                current_price = hist['Close'].iloc[-1]
-                
-                # Calculate costs and gains
-                cost = purchase_price * shares
-                current_val = current_price * shares
-                gain_loss_dollar = current_val - cost
-                gain_loss_percent = ((current_price - purchase_price) / purchase_price) * 100
-                
-                total_cost += cost
-                total_value += current_val
-                
-                # Determine tag for color coding
-                tag = 'gain' if gain_loss_dollar >= 0 else 'loss'
-                
-                # Insert into table
-                self.portfolio_tree.insert("", tk.END, values=(
-                    ticker,
-                    f"{shares:.2f}",
-                    purchase_date,
-                    f"${purchase_price:.2f}",
-                    f"${current_price:.2f}",
-                    f"${cost:.2f}",
-                    f"${current_val:.2f}",
-                    f"${gain_loss_dollar:+.2f}",
-                    f"{gain_loss_percent:+.2f}%"
-                ), tags=(tag,))
-                
-            except Exception as e:
-                self.portfolio_tree.insert("", tk.END, values=(
-                    ticker, shares, purchase_date, "Error", "Error", "Error", "Error", "Error", str(e)[:15]
-                ))
-        
-        # Update summary
+        self.portfolio_totals = {'cost': 0, 'value': 0}
+        self.portfolio_lots = None
+        self._portfolio_lot_frames = []
+        self.update_portfolio_summary()
+        
+        # Lots are valued off the Tk thread against a snapshot of the holdings,
+        # split-adjusted and converted into the base currency
+        holdings = self.portfolio_holdings.copy()
+        valuation = Valuation(self.history_cache, base_currency=self.base_currency_var.get(),
+                              total_return=self.total_return_var.get())
+        self.money = currency_symbol(valuation.base_currency)
+        pool = self._get_shard_pool()
+        if pool is not None:
+            tasks = [self._valued_shard_task(task, valuation)
+                     for task in self._shard_tasks("portfolio", pool.submit_portfolio(holdings))]
+        else:
+            # Each symbol is fetched once, from its earliest purchase date
+            earliest_dates = holdings.earliest_dates()
+            tasks = [self._portfolio_task(holdings, chunk,
+                                          min(earliest_dates[ticker] for ticker in chunk), valuation)
+                     for chunk in chunked(list(earliest_dates), self.fetch_chunk_size)]
+        
+        self._begin_refresh("portfolio")
+        self.fetcher.start("portfolio", tasks,
+                           on_result=self._on_portfolio_chunk,
+                           on_done=self._on_portfolio_done)
+    
+    def _on_portfolio_done(self):
+        if self._portfolio_lot_frames:
+            self.portfolio_lots = pd.concat(self._portfolio_lot_frames, ignore_index=True)
+        self._portfolio_lot_frames = []
+        self.portfolio_status_label.config(
+            text=f"Portfolio calculated successfully! ({self.history_cache.describe()})",
+            fg="green")
+        self._end_refresh("portfolio")
+    
+    def _portfolio_task(self, holdings, tickers, start, valuation):
+        def task():
+            histories, errors = self.history_cache.fetch_histories(tickers, start=start)
+            # Value every lot of this chunk's symbols in one vectorized pass
+            chunk_ids = [holdings.symbol_ids[ticker] for ticker in tickers]
+            with tracer.span("value_holdings", "compute", symbols=len(chunk_ids)) as span:
+                lots, _ = value_holdings(holdings, histories, errors,
+                                         mask=np.isin(holdings.ticker_ids, chunk_ids))
+                span['lots'] = len(lots)
+            with tracer.span("valuation", "compute", lots=len(lots)):
+                lots, valuation_errors = valuation.apply(lots, histories)
+            return lots, {**errors, **valuation_errors}
+        return task
+    
+    def _valued_shard_task(self, wait, valuation):
+        # Shards come back unadjusted; apply the valuation on the waiting thread
+        def task():
+            lots, errors = wait()
+            lots, valuation_errors = valuation.apply(lots)
+            return lots, {**errors, **valuation_errors}
+        return task
+    
+    def on_valuation_change(self):
+        # Revalue what's on screen in the new currency/return mode
+        if self.portfolio_lots is not None or self.fetcher.is_running("portfolio"):
+            self.calculate_portfolio()
+    
+    def _on_portfolio_chunk(self, result):
+        lots, errors = result
+        totals = summarize_lots(lots)
+        
+        self.portfolio_totals['cost'] += totals['cost']
+        self.portfolio_totals['value'] += totals['value']
+        self._portfolio_lot_frames.append(lots)
+        
+        with tracer.span("render.portfolio", "render", rows=len(lots)):
+            for lot in lots.itertuples(index=False):
+                self._insert_portfolio_row(lot, errors.get(lot.ticker))
+                if lot.status not in (STATUS_ERROR, STATUS_NO_DATA):
+                    # Quotes are kept in the listing currency
+                    self.last_quotes[lot.ticker] = float(lot.current_price / lot.fx_rate)
+            self.update_portfolio_summary()
+        self._first_row_at.setdefault("portfolio", tracer.now())
+        self.learn_symbols(lots.loc[lots['status'] == STATUS_OK, 'ticker'].unique())
+        
+        # Cost basis per symbol for "% since purchase" alerts
+        priced = lots[(lots['status'] == STATUS_OK) & lots['ticker'].isin(self.alert_engine.buckets.keys())]
+        if len(priced):
+            # Alerts watch listing-currency prices, so undo the conversion
+            local = pd.DataFrame({'ticker': priced['ticker'], 'shares': priced['shares'],
+                                  'cost': priced['cost'] / priced['purchase_fx'],
+                                  'price': priced['current_price'] / priced['fx_rate']})
+            by_ticker = local.groupby('ticker')[['cost', 'shares']].sum()
+            for ticker, cost, shares in by_ticker.itertuples():
+                self.alert_engine.set_reference(ticker, cost_basis=cost / shares)
+            self.check_alerts(local.groupby('ticker')['price'].last().to_dict())
+    
+    def _insert_portfolio_row(self, lot, error=None):
+        values, tags = self._portfolio_row(lot, error)
+        self.portfolio_tree.insert("", tk.END, iid=f"lot{lot.lot}", values=values, tags=tags)
+    
+    def _portfolio_row(self, lot, error=None):
+        ticker = lot.ticker
+        shares = lot.shares
+        purchase_date = str(lot.purchase_date)[:10]
+        
+        if lot.status == STATUS_ERROR:
+            return (ticker, shares, purchase_date, "Error", "Error", "Error", "Error", "Error",
+                    (error or "")[:15]), ()
+        
+        if lot.status == STATUS_NO_DATA:
+            return (ticker, shares, purchase_date, "N/A", "N/A", "N/A", "N/A", "N/A", "N/A"), ()
+        
+        # Determine tag for color coding
+        tag = 'gain' if lot.gain >= 0 else 'loss'
+        if not lot.adjusted:
+            # Splits/dividends unknown (e.g. an archive written without them)
+            ticker = f"{ticker} *"
+        
+        money = self.money
+        values = (
+            ticker,
+            f"{shares:.2f}",
+            purchase_date,
+            f"{money}{lot.purchase_price:.2f}",
+            f"{money}{lot.current_price:.2f}",
+            f"{money}{lot.cost:.2f}",
+            f"{money}{lot.value:.2f}",
+            f"{money}{lot.gain:+.2f}",
+            f"{lot.gain_pct:+.2f}%"
+        )
+        return values, (tag,)
+    
+    def update_portfolio_summary(self):
+        total_cost = self.portfolio_totals['cost']
+        total_value = self.portfolio_totals['value']
         total_gain = total_value - total_cost
         total_gain_percent = ((total_value - total_cost) / total_cost * 100) if total_cost > 0 else 0
         
-        self.total_cost_label.config(text=f"Total Investment: ${total_cost:,.2f}")
-        self.total_value_label.config(text=f"Current Value: ${total_value:,.2f}")
+        # Labels are only reconfigured when their text actually changes
+        self._set_label(self.total_cost_label, f"Total Investment: {self.money}{total_cost:,.2f}")
+        self._set_label(self.total_value_label, f"Current Value: {self.money}{total_value:,.2f}")
         
         gain_color = "green" if total_gain >= 0 else "red"
-        self.total_gain_label.config(
-            text=f"Total Gain/Loss: ${total_gain:+,.2f} ({total_gain_percent:+.2f}%)",
-            fg=gain_color
-        )
+        self._set_label(self.total_gain_label,
+                        f"Total Gain/Loss: {self.money}{total_gain:+,.2f} ({total_gain_percent:+.2f}%)",
+                        fg=gain_color)
+    
+    def _set_label(self, label, text, **kwargs):
+        if label.cget('text') != text or any(label.cget(k) != v for k, v in kwargs.items()):
+            label.config(text=text, **kwargs)
+    
+    def toggle_live_mode(self):
+        if self.live_var.get():
+            try:
+                interval = int(self.live_interval_var.get())
+            except ValueError:
+                interval = DEFAULT_INTERVAL
+            self.live_scheduler.interval = max(MIN_INTERVAL, interval)
+            self.live_scheduler.start()
+        else:
+            self.live_scheduler.stop()
+            self.fetcher.cancel("live")
+    
+    def _live_tick(self, done):
+        # A manual refresh in progress will bring everything up to date anyway
+        if any(self.fetcher.is_running(channel) for channel in ("ytd", "portfolio", "analytics")):
+            done(True)
+            return
+        
+        # With minute bars, the last bar's close is the live price and no daily history is fetched
+        intraday = self.intraday_var.get()
+        tickers = list(self.ytd_start_prices)
+        if self.portfolio_lots is not None:
+            tickers += list(self.portfolio_lots['ticker'].unique())
+        if self.analytics is not None:
+            tickers += self.analytics.columns
+        if intraday:
+            tickers += self._intraday_symbols
+        tickers = unique_tickers(tickers)
+        if not tickers:
+            done(True)
+            return
+        
+        outcome = {'ok': True, 'changed': 0}
+        
+        def on_result(result):
+            if intraday:
+                errors = result[1]
+                quotes = self._on_intraday_chunk(result)
+            else:
+                quotes, errors = result
+            if errors and not quotes:
+                outcome['ok'] = False
+            outcome['changed'] += self._apply_live_quotes(quotes)
+        
+        def on_error(error):
+            outcome['ok'] = False
+        
+        def on_done():
+            if outcome['ok']:
+                now = datetime.now().strftime("%H:%M:%S")
+                self.ytd_status_label.config(
+                    text=f"Live: {outcome['changed']} symbols changed at {now}", fg="green")
+            else:
+                self.ytd_status_label.config(text="Live update failed, backing off...", fg="red")
+            done(outcome['ok'])
+        
+        if intraday:
+            tasks = self._intraday_tasks(tickers, 100)
+        else:
+            tasks = [lambda chunk=chunk: fetch_latest_quotes(chunk)
+                     for chunk in chunked(tickers, 100)]
+        self.fetcher.start("live", tasks, on_result=on_result, on_error=on_error, on_done=on_done)
+    
+    def _apply_live_quotes(self, quotes):
+        """Patch only the rows whose price moved; returns how many symbols changed"""
+        changed = {ticker: price for ticker, price in quotes.items()
+                   if self.last_quotes.get(ticker) != price}
+        self.last_quotes.update(changed)
+        
+        for ticker, price in changed.items():
+            ytd_start_price = self.ytd_start_prices.get(ticker)
+            if ytd_start_price is not None and self.ytd_tree.exists(ticker):
+                values, tag = self._ytd_row(ticker, ytd_start_price, price)
+                self.ytd_tree.update_row(ticker, values, (tag,))
+        
+        if self.portfolio_lots is not None:
+            # revalue_lots diffs against each lot's own price, so pass every quote
+            changed_lots = revalue_lots(self.portfolio_lots, quotes)
+            if changed_lots.any():
+                for lot in self.portfolio_lots[changed_lots].itertuples(index=False):
+                    values, tags = self._portfolio_row(lot)
+                    self.portfolio_tree.update_row(f"lot{lot.lot}", values, tags)
+                self.portfolio_totals = summarize_lots(self.portfolio_lots)
+                self.update_portfolio_summary()
+        
+        self.check_alerts(changed)
+        
+        # During the session live quotes are today's bar for the analytics as well
+        if self.analytics is not None and changed and is_market_open():
+            today = (datetime.now(MARKET_TZ) if MARKET_TZ else datetime.now()).strftime("%Y-%m-%d")
+            if self.analytics.update_quotes(changed, today):
+                self.render_analytics()
+        
+        return len(changed)
+    
+    def load_saved_holdings(self):
+        try:
+            load_holdings(holdings=self.portfolio_holdings)
+        except Exception as e:
+            self.portfolio_status_label.config(text=f"Could not load saved portfolio: {e}", fg="red")
+            return
+        if self.portfolio_holdings:
+            self.portfolio_status_label.config(
+                text=f"Loaded {len(self.portfolio_holdings):,} saved lots", fg="blue")
+    
+    def import_portfolio(self):
+        path = filedialog.askopenfilename(
+            title="Import Holdings",
+            filetypes=[("Holdings files", "*.csv *.json *.jsonl *.ndjson"), ("All files", "*.*")])
+        if not path:
+            return
         
-        self.portfolio_status_label.config(text="Portfolio calculated successfully!", fg="green")
+        self.portfolio_status_label.config(text="Importing...", fg="orange")
+        self.root.update_idletasks()
+        try:
+            _, report = import_holdings(path, self.portfolio_holdings)
+        except Exception as e:
+            messagebox.showerror("Import Error", f"Could not import {path}:\n{e}")
+            self.portfolio_status_label.config(text="Import failed", fg="red")
+            return
+        
+        # One report for the whole file instead of a popup per row
+        self.portfolio_status_label.config(text=report.summary(), fg="green" if not report.errors else "orange")
+        if report.errors:
+            details = "\n".join(report.error_lines(limit=15))
+            if len(report.errors) > 15:
+                details += f"\n... and {len(report.errors) - 15:,} more"
+            messagebox.showwarning("Import Report", f"{report.summary()}\n\n{details}")
+    
+    def export_portfolio(self):
+        if not self.portfolio_holdings:
+            messagebox.showwarning("No Holdings", "There are no holdings to export!")
+            return
+        path = filedialog.asksaveasfilename(
+            title="Export Holdings", defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            export_holdings(self.portfolio_holdings, path)
+        except Exception as e:
+            messagebox.showerror("Export Error", f"Could not export to {path}:\n{e}")
+            return
+        self.portfolio_status_label.config(
+            text=f"Exported {len(self.portfolio_holdings):,} lots", fg="green")
+    
+    def show_portfolio_history(self):
+        if not self.portfolio_holdings:
+            messagebox.showwarning("No Holdings", "Please add at least one stock to your portfolio!")
+            return
+        
+        if self.history_window is None or not self.history_window.winfo_exists():
+            self.history_window = tk.Toplevel(self.root)
+            self.history_window.title("Portfolio History")
+            self.history_window.geometry("820x480")
+            self.history_canvas = tk.Canvas(self.history_window, bg="white", highlightthickness=0)
+            self.history_canvas.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+            self.history_canvas.bind("<Configure>", lambda e: self.draw_history_chart())
+            self.history_stats_label = tk.Label(self.history_window, text="", font=("Arial", 11, "bold"))
+            self.history_stats_label.pack(pady=5)
+            self.history_series = None
+        self.history_window.lift()
+        self.history_stats_label.config(text="Updating history...", fg="orange")
+        
+        # Values a snapshot of the lots in the background; the stored series is extended in place.
+        # Same currency and return mode as the portfolio table.
+        holdings = self.portfolio_holdings.copy()
+        valuation = Valuation(self.history_cache, base_currency=self.base_currency_var.get(),
+                              total_return=self.total_return_var.get())
+        self.history_money = currency_symbol(valuation.base_currency)
+        task = lambda: update_portfolio_history(holdings, self.history_cache, self.history_store,
+                                                valuation=valuation)
+        self._begin_refresh("history")
+        self.fetcher.start("history", [task],
+                           on_result=self._on_history_result,
+                           on_error=lambda e: self.history_stats_label.config(
+                               text=f"History failed: {e}", fg="red"),
+                           on_done=lambda: self._end_refresh("history"))
+    
+    def _on_history_result(self, result):
+        series, errors = result
+        if self.history_window is None or not self.history_window.winfo_exists():
+            return
+        self.history_series = series
+        self.draw_history_chart()
+        
+        stats = history_stats(series)
+        if stats['start'] is None:
+            self.history_stats_label.config(text="No price history for these holdings yet", fg="red")
+            return
+        twr = "N/A" if stats['twr'] is None else f"{stats['twr'] * 100:+.2f}%"
+        irr = "N/A" if stats['xirr'] is None else f"{stats['xirr'] * 100:+.2f}%/yr"
+        text = (f"{stats['start']:%Y-%m-%d} → {stats['end']:%Y-%m-%d}   "
+                f"Value: {self.history_money}{stats['value']:,.2f}   "
+                f"Invested: {self.history_money}{stats['invested']:,.2f}   "
+                f"Time-weighted: {twr}   Money-weighted (XIRR): {irr}")
+        if errors:
+            text += f"\n{len(errors):,} symbols failed to download or convert; history not saved"
+        self.history_stats_label.config(text=text, fg="black" if not errors else "orange")
+    
+    def draw_history_chart(self):
+        """Value and cumulative money invested, one point per pixel column at most"""
+        canvas = self.history_canvas
+        canvas.delete("all")
+        series = self.history_series
+        if series is None or series.empty:
+            return
+        
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        left, right, top, bottom = 80, 20, 20, 30
+        plot_w, plot_h = max(1, width - left - right), max(1, height - top - bottom)
+        
+        rows = np.unique(np.linspace(0, len(series) - 1, min(len(series), plot_w)).astype(int))
+        value = series['value'].to_numpy()[rows]
+        invested = np.cumsum(series['flow'].to_numpy())[rows]
+        low = min(value.min(), invested.min())
+        high = max(value.max(), invested.max())
+        span = (high - low) or 1.0
+        
+        xs = left + rows / max(1, len(series) - 1) * plot_w
+        for line, color in ((invested, "#9E9E9E"), (value, "#4CAF50")):
+            ys = top + (high - line) / span * plot_h
+            points = np.column_stack([xs, ys]).ravel().tolist()
+            if len(points) >= 4:
+                canvas.create_line(*points, fill=color, width=2)
+        
+        canvas.create_line(left, top, left, top + plot_h, fill="#757575")
+        canvas.create_line(left, top + plot_h, left + plot_w, top + plot_h, fill="#757575")
+        canvas.create_text(left - 5, top, text=f"{self.history_money}{high:,.0f}", anchor=tk.E)
+        canvas.create_text(left - 5, top + plot_h, text=f"{self.history_money}{low:,.0f}", anchor=tk.E)
+        canvas.create_text(left, top + plot_h + 5, text=f"{series.index[0]:%Y-%m-%d}", anchor=tk.NW)
+        canvas.create_text(left + plot_w, top + plot_h + 5, text=f"{series.index[-1]:%Y-%m-%d}", anchor=tk.NE)
+        canvas.create_text(left + 10, top, text="■ Value", fill="#4CAF50", anchor=tk.NW)
+        canvas.create_text(left + 80, top, text="■ Invested", fill="#9E9E9E", anchor=tk.NW)
     
     def clear_portfolio(self):
         if messagebox.askyesno("Clear Portfolio", "Are you sure you want to clear all holdings?"):
-            self.portfolio_holdings = []
-            for item in self.portfolio_tree.get_children():
-                self.portfolio_tree.delete(item)
-            self.total_cost_label.config(text="Total Investment: $0.00")
-            self.total_value_label.config(text="Current Value: $0.00")
-            self.total_gain_label.config(text="Total Gain/Loss: $0.00 (0.00%)", fg="black")
+            self.fetcher.cancel("portfolio")
+            self.portfolio_holdings.clear()
+            self.portfolio_lots = None
+            self.portfolio_tree.clear()
+            self.total_cost_label.config(text=f"Total Investment: {self.money}0.00")
+            self.total_value_label.config(text=f"Current Value: {self.money}0.00")
+            self.total_gain_label.config(text=f"Total Gain/Loss: {self.money}0.00 (0.00%)", fg="black")
             self.portfolio_status_label.config(text="Portfolio cleared", fg="blue")
+    
+    def use_portfolio_for_analytics(self):
+        symbols = self.portfolio_holdings.held_symbols()
+        if not symbols:
+            messagebox.showwarning("No Holdings", "Please add at least one stock to your portfolio!")
+            return
+        self.analytics_entry.delete(0, tk.END)
+        self.analytics_entry.insert(0, ", ".join(symbols))
+    
+    def run_analytics(self):
+        symbols = parse_tickers(self.analytics_entry.get().strip())
+        symbols = [symbol for symbol in symbols if symbol]
+        if not symbols:
+            messagebox.showwarning("Input Error", "Please enter at least one ticker symbol!")
+            return
+        benchmark = self.benchmark_entry.get().strip().upper() or None
+        
+        # Same universe as last time: only bars since the last one we have are needed
+        analytics = self.analytics
+        if (analytics is not None and analytics.symbols == symbols
+                and analytics.benchmark == benchmark and len(analytics)):
+            start = str(analytics.last_date)
+        else:
+            self.analytics = None
+            self.analytics_tree.clear()
+            self.correlation_tree.clear()
+            start = lookback_start()
+        
+        self.analytics_status_label.config(text="Fetching data...", fg="orange")
+        self._analytics_histories = {}
+        self._analytics_errors = {}
+        fetch_symbols = symbols + ([benchmark] if benchmark and benchmark not in symbols else [])
+        tasks = [self._fetch_task(chunk, start)
+                 for chunk in chunked(fetch_symbols, self.fetch_chunk_size)]
+        self._begin_refresh("analytics")
+        self.fetcher.start("analytics", tasks,
+                           on_result=self._on_analytics_chunk,
+                           on_done=lambda: self._on_analytics_done(symbols, benchmark))
+    
+    def _on_analytics_chunk(self, result):
+        _, histories, errors = result
+        self._analytics_histories.update(histories)
+        self._analytics_errors.update(errors)
+    
+    def _on_analytics_done(self, symbols, benchmark):
+        histories, self._analytics_histories = self._analytics_histories, {}
+        with tracer.span("analytics.update", "compute", symbols=len(symbols)) as span:
+            if self.analytics is None:
+                self.analytics = RollingAnalytics.from_histories(histories, symbols, benchmark)
+                span['full'] = True
+            else:
+                self.analytics.update_histories(histories)
+        self.render_analytics()
+        
+        message = f"Analyzed {len(symbols):,} symbols over {len(self.analytics):,} days"
+        if benchmark and benchmark in self._analytics_errors:
+            message += f" (benchmark {benchmark} failed)"
+        failed = len([s for s in symbols if s in self._analytics_errors])
+        if failed:
+            message += f"; {failed:,} symbols failed"
+        self.analytics_status_label.config(text=message, fg="green" if not failed else "orange")
+        self._end_refresh("analytics")
+    
+    def render_analytics(self):
+        """Write the current statistics into the analytics tables (unchanged rows are skipped)"""
+        if self.analytics is None:
+            return
+        summary = self.analytics.summary()
+        with tracer.span("render.analytics", "render", rows=len(summary)):
+            for row in summary.itertuples(index=False):
+                values = self._analytics_row(row)
+                if self.analytics_tree.exists(row.ticker):
+                    self.analytics_tree.update_row(row.ticker, values)
+                else:
+                    self.analytics_tree.insert("", tk.END, iid=row.ticker, values=values)
+            
+            self.correlation_tree.clear()
+            for ticker_a, ticker_b, corr in self.analytics.top_pairs():
+                self.correlation_tree.insert("", tk.END, values=(ticker_a, ticker_b, f"{corr:+.3f}"))
+    
+    def _analytics_row(self, row):
+        def pct(value):
+            return "N/A" if np.isnan(value) else f"{value * 100:+.2f}%"
+        
+        if np.isnan(row.last_price):
+            return (row.ticker,) + ("N/A",) * (len(RETURN_WINDOWS) + 4)
+        return ((row.ticker, f"${row.last_price:.2f}")
+                + tuple(pct(getattr(row, f"return_{label}")) for label in RETURN_WINDOWS)
+                + ("N/A" if np.isnan(row.volatility) else f"{row.volatility * 100:.1f}%",
+                   pct(row.max_drawdown),
+                   "N/A" if np.isnan(row.beta) else f"{row.beta:.2f}"))
+    
+    def export_correlation(self):
+        if self.analytics is None:
+            messagebox.showwarning("No Analytics", "Run the analytics first!")
+            return
+        path = filedialog.asksaveasfilename(
+            title="Export Correlation Matrix", defaultextension=".csv", filetypes=[("CSV", "*.csv")])
+        if not path:
+            return
+        try:
+            self.analytics.correlation().to_csv(path, float_format="%.4f")
+        except Exception as e:
+            messagebox.showerror("Export Error", f"Could not export to {path}:\n{e}")
+            return
+        self.analytics_status_label.config(
+            text=f"Exported {len(self.analytics.symbols):,}x{len(self.analytics.symbols):,} "
+                 f"correlation matrix", fg="green")
+    
+    def load_intraday(self):
+        tickers = self.check_tickers(self.intraday_entry.get().split(","))
+        if not tickers:
+            return
+        self._intraday_symbols = tickers
+        self.intraday_status_label.config(text="Fetching minute bars...", fg="orange")
+        
+        def on_done():
+            self.intraday_status_label.config(
+                text=f"Minute bars for {len(self.intraday)} symbols "
+                     f"({self.intraday.nbytes / 1e6:,.1f} MB of bar buffers)", fg="green")
+        
+        def on_error(error):
+            self.intraday_status_label.config(text=f"Could not fetch minute bars: {error}", fg="red")
+        
+        self.fetcher.start("intraday", self._intraday_tasks(tickers, self.fetch_chunk_size),
+                           on_result=self._on_intraday_chunk, on_done=on_done, on_error=on_error)
+    
+    def _intraday_tasks(self, tickers, chunk_size):
+        """Fetch tasks for minute bars: symbols already buffered only need today's,
+        new ones also get the previous session (for the previous close)"""
+        known = [ticker for ticker in tickers if ticker in self.intraday]
+        new = [ticker for ticker in tickers if ticker not in self.intraday]
+        
+        def task(chunk, period):
+            # Bars are reduced to arrays here; the rings are only touched on the Tk thread
+            bars, errors = fetch_intraday(chunk, period=period)
+            return {ticker: bar_arrays(frame) for ticker, frame in bars.items()}, errors
+        
+        return ([lambda chunk=chunk: task(chunk, "1d") for chunk in chunked(known, chunk_size)]
+                + [lambda chunk=chunk: task(chunk, "2d") for chunk in chunked(new, chunk_size)])
+    
+    def _on_intraday_chunk(self, result):
+        """Add a chunk of minute bars to the rings; returns the symbols' last prices"""
+        arrays, errors = result
+        with tracer.span("intraday.ingest", "compute", symbols=len(arrays)):
+            for ticker, (minutes, values) in arrays.items():
+                self.intraday.add_bars(ticker, minutes, values)
+        self.render_intraday()
+        return self.intraday.last_prices(arrays)
+    
+    def render_intraday(self):
+        symbols = self.intraday.symbols()
+        with tracer.span("render.intraday", "render", rows=len(symbols)):
+            for ticker in symbols:
+                values, tags = self._session_row(self.intraday.session(ticker))
+                if self.session_tree.exists(ticker):
+                    self.session_tree.update_row(ticker, values, tags)
+                else:
+                    self.session_tree.insert("", tk.END, iid=ticker, values=values, tags=tags)
+        self.bars_symbol_combo.config(values=symbols)
+        if symbols and self.bars_symbol_var.get() not in symbols:
+            self.bars_symbol_var.set(symbols[0])
+        self.render_intraday_bars()
+    
+    def _session_row(self, session):
+        change = session['change_pct']
+        values = (
+            session['ticker'],
+            f"${session['last']:.2f}",
+            "N/A" if session['previous_close'] is None else f"${session['previous_close']:.2f}",
+            "N/A" if change is None else f"{change:+.2f}%",
+            f"${session['open']:.2f}",
+            f"${session['high']:.2f}",
+            f"${session['low']:.2f}",
+            f"{session['volume']:,.0f}",
+            session['time'].strftime("%H:%M"),
+        )
+        tags = () if not change else ('positive',) if change > 0 else ('negative',)
+        return values, tags
+    
+    def render_intraday_bars(self):
+        ticker = self.bars_symbol_var.get()
+        self.bars_tree.clear()
+        if ticker not in self.intraday:
+            return
+        bars = self.intraday.bars(ticker, TIMEFRAMES.get(self.timeframe_var.get(), 1))
+        for time, bar in zip(bars.index.strftime("%H:%M"), bars.itertuples(index=False)):
+            self.bars_tree.insert("", tk.END, values=(time, f"{bar.Open:.2f}", f"{bar.High:.2f}",
+                                                      f"{bar.Low:.2f}", f"{bar.Close:.2f}",
+                                                      f"{bar.Volume:,.0f}"))
+    
+    def load_alert_rules(self):
+        try:
+            load_rules(self.alert_engine)
+        except Exception as e:
+            self.alert_label.config(text=f"Could not load alert rules: {e}")
+        self.refresh_alert_rules()
+    
+    def save_alert_rules(self):
+        try:
+            save_rules(self.alert_engine)
+        except Exception as e:
+            messagebox.showerror("Save Error", f"Could not save alert rules: {e}")
+    
+    def refresh_alert_rules(self):
+        self.alert_rules_tree.clear()
+        for rule in self.alert_engine.rules.values():
+            label = next(label for label, metric, op in CONDITIONS if (metric, op) == (rule.metric, rule.op))
+            threshold = f"${rule.threshold:,.2f}" if rule.metric == 'price' else f"{rule.threshold:+.2f}%"
+            self.alert_rules_tree.insert("", tk.END, iid=f"rule{rule.id}",
+                                         values=(rule.symbol, label, threshold, ""))
+    
+    def add_alert_rule(self):
+        ticker = self.alert_ticker_entry.get().strip().upper()
+        if not ticker:
+            messagebox.showwarning("Input Error", "Please enter a ticker symbol!")
+            return
+        try:
+            threshold = float(self.alert_value_entry.get().replace('$', '').replace('%', '').replace(',', ''))
+        except ValueError:
+            messagebox.showerror("Input Error", "Please enter a valid number for the threshold!")
+            return
+        _, metric, op = next(c for c in CONDITIONS if c[0] == self.alert_condition_var.get())
+        self.alert_engine.add_rule(ticker, metric, op, threshold)
+        self.refresh_alert_rules()
+        self.save_alert_rules()
+        self.alert_ticker_entry.delete(0, tk.END)
+        self.alert_value_entry.delete(0, tk.END)
+        
+        # Check straight away against the latest known price
+        if ticker in self.last_quotes:
+            self.alert_engine.stale.add(ticker)
+            self.check_alerts({ticker: self.last_quotes[ticker]})
+    
+    def remove_alert_rules(self):
+        keys = self.alert_rules_tree.selected_keys()
+        if not keys:
+            messagebox.showwarning("No Selection", "Select the alerts to remove first!")
+            return
+        for key in keys:
+            self.alert_engine.remove_rule(int(key[len("rule"):]))
+        self.refresh_alert_rules()
+        self.save_alert_rules()
+    
+    def clear_alert_rules(self):
+        if self.alert_engine.rules and messagebox.askyesno("Clear Alerts", "Remove all alert rules?"):
+            self.alert_engine.clear()
+            self.refresh_alert_rules()
+            self.save_alert_rules()
+    
+    def check_alerts(self, quotes):
+        """Run the rules against new prices and report whatever fired"""
+        if not self.alert_engine.rules or not quotes:
+            return
+        with tracer.span("alerts.check", "compute", symbols=len(quotes)) as span:
+            fired = self.alert_engine.check(quotes)
+            span['fired'] = len(fired)
+        if not fired:
+            return
+        
+        now = fired[0].time.strftime("%H:%M:%S")
+        latest = fired[-1].message()
+        more = f" (+{len(fired) - 1} more)" if len(fired) > 1 else ""
+        self.alert_label.config(text=f"🔔 {now} {latest}{more}")
+        
+        self.alerts_text.config(state=tk.NORMAL)
+        self.alerts_text.insert("1.0", "".join(f"{a.time:%H:%M:%S}  {a.message()}\n" for a in reversed(fired)))
+        self.alerts_text.config(state=tk.DISABLED)
+        for alert in fired:
+            key = f"rule{alert.rule.id}"
+            if self.alert_rules_tree.exists(key):
+                values, _ = self.alert_rules_tree.model.get(key)
+                self.alert_rules_tree.update_row(key, values[:3] + (f"{alert.time:%Y-%m-%d %H:%M:%S}",),
+                                                 ('fired',))
+        try:
+            log_alerts(fired)
+        except OSError as e:
+            self.alert_label.config(text=f"🔔 {latest}{more} (could not write alert log: {e})")
+        if self.notify_var.get():
+            desktop_notify("Stock Alert" if len(fired) == 1 else f"{len(fired)} Stock Alerts", latest + more)
+    
+    def _begin_refresh(self, channel):
+        self._refresh_started[channel] = tracer.now()
+        self._first_row_at.pop(channel, None)
+        if self.profile_next and self.profiler is None:
+            self.profile_next = False
+            self.profiler = SamplingProfiler()
+            self.profiler.start()
+            self.profile_button.config(text="🔬 Profiling...")
+    
+    def _end_refresh(self, channel):
+        """Append the timing breakdown of the refresh that just finished to the diagnostics tab"""
+        start = self._refresh_started.pop(channel, None)
+        if start is None:
+            return
+        end = tracer.now()
+        lines = [f"[{datetime.now().strftime('%H:%M:%S')}] {channel} refresh: "
+                 f"{(end - start) * 1000:,.1f} ms wall"]
+        first_row = self._first_row_at.pop(channel, None)
+        if first_row is not None:
+            lines[0] += f", first rows after {(first_row - start) * 1000:,.1f} ms"
+        lines += format_summary(tracer.summary(since=start))
+        
+        if self.profiler is not None:
+            self.profiler.stop()
+            profile_dir = os.path.join(os.path.expanduser("~"), ".stock_tracker")
+            os.makedirs(profile_dir, exist_ok=True)
+            path = os.path.join(profile_dir, f"profile-{datetime.now():%Y%m%d-%H%M%S}.txt")
+            self.profiler.write_collapsed(path)
+            lines.append(f"  Profile: {self.profiler.samples:,} samples written to {path}")
+            for frame, count in self.profiler.top(10):
+                lines.append(f"    {count:>6,}  {frame}")
+            self.profiler = None
+            self.profile_button.config(text="🔬 Profile Next Refresh")
+        
+        self.diagnostics_text.config(state=tk.NORMAL)
+        self.diagnostics_text.insert("1.0", "\n".join(lines) + "\n\n")
+        self.diagnostics_text.config(state=tk.DISABLED)
+    
+    def toggle_profile_next(self):
+        if self.profiler is not None:
+            return
+        self.profile_next = not self.profile_next
+        self.profile_button.config(
+            text="🔬 Armed: next refresh" if self.profile_next else "🔬 Profile Next Refresh")
+    
+    def export_trace(self, fmt):
+        if fmt == "chrome":
+            path = filedialog.asksaveasfilename(
+                title="Export Chrome Trace", defaultextension=".json",
+                filetypes=[("Trace Event JSON", "*.json")])
+        else:
+            path = filedialog.asksaveasfilename(
+                title="Export Timings", defaultextension=".json", filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            if fmt == "chrome":
+                tracer.export_chrome_trace(path)
+            else:
+                tracer.export_json(path)
+        except Exception as e:
+            messagebox.showerror("Export Error", f"Could not export to {path}:\n{e}")
+            return
+        self.diagnostics_status_label.config(
+            text=f"Exported {len(tracer.spans):,} spans to {os.path.basename(path)}", fg="green")
+    
+    def clear_diagnostics(self):
+        tracer.clear()
+        self.diagnostics_text.config(state=tk.NORMAL)
+        self.diagnostics_text.delete("1.0", tk.END)
+        self.diagnostics_text.config(state=tk.DISABLED)
+        self.diagnostics_status_label.config(text="Timings cleared", fg="blue")
 
 # Run the application
 if __name__ == "__main__":
@@ -0,0 +1,297 @@
+# Local symbol master: validates and normalizes tickers before anything is
+# fetched, and backs the ticker autocomplete.
+import bisect
+import csv
+import io
+import os
+import re
+import time
+import urllib.request
+from corporate_actions import CURRENCY_SUFFIXES
+from market_data import unique_tickers
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".stock_tracker", "symbols.csv")
+
+# The index is re-downloaded when the file is older than this
+INDEX_MAX_AGE = 24 * 3600
+
+# NASDAQ Trader's symbol directory: every NASDAQ-listed and other
+# US-exchange-listed security, pipe-delimited, refreshed daily
+NASDAQ_SYMBOL_URLS = (
+    "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt",
+    "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt",
+)
+OTHER_EXCHANGES = {'A': "NYSE American", 'N': "NYSE", 'P': "NYSE Arca", 'Z': "Cboe BZX", 'V': "IEX"}
+
+# What a Yahoo symbol can look like: ^GSPC, BRK-B, 0700.HK, EURUSD=X, CL=F
+TICKER_PATTERN = r"\^?[A-Z0-9][A-Z0-9.\-&]{0,19}(=[A-Z])?"
+_TICKER_RE = re.compile(TICKER_PATTERN)
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_ticker(text):
+    """Upper-cased ticker without whitespace or a leading '$' (as in "$aapl ")"""
+    return re.sub(r"\s+", "", str(text)).lstrip("$").upper()
+
+
+def is_valid_ticker(ticker):
+    return _TICKER_RE.fullmatch(ticker) is not None
+
+
+def ticker_family(ticker):
+    """Which kind of symbol a ticker is: '' for a plain US ticker, else its
+    exchange suffix ('.L'), '^' for indices or '=X'/'=F' for FX and futures.
+    An index only vouches for the families it has listings for."""
+    if ticker.startswith("^"):
+        return "^"
+    if "=" in ticker:
+        return ticker[ticker.index("="):]
+    dot = ticker.rfind(".")
+    # Other one-letter tails after a dot are US share classes (BRK.B), not exchanges
+    if dot > 0 and (len(ticker) - dot > 2 or ticker[dot:] in CURRENCY_SUFFIXES):
+        return ticker[dot:]
+    return ""
+
+
+def _deletes(ticker):
+    return {ticker[:i] + ticker[i + 1:] for i in range(len(ticker))}
+
+
+class SymbolIndex:
+    """Sorted arrays of tickers, names and exchanges.
+
+    Prefix lookups are a bisect into the sorted tickers (and into a sorted
+    list of (name word, position) pairs for company names), so completion
+    costs O(log n + limit) per keystroke. Typos are found through a
+    deletion index: every ticker is filed under itself and each string
+    with one character dropped, so any ticker one insertion, deletion,
+    substitution or transposition away from the input shares a key with
+    it. The deletion index is built on first use.
+    """
+
+    def __init__(self, records=(), refreshed_at=None):
+        self.refreshed_at = refreshed_at
+        self._set(records)
+
+    def _set(self, records):
+        by_ticker = {}
+        for ticker, name, exchange in records:
+            ticker = normalize_ticker(ticker)
+            if is_valid_ticker(ticker):
+                by_ticker[ticker] = (name or "", exchange or "")
+        self.tickers = sorted(by_ticker)
+        self.names = [by_ticker[ticker][0] for ticker in self.tickers]
+        self.exchanges = [by_ticker[ticker][1] for ticker in self.tickers]
+        self.positions = {ticker: i for i, ticker in enumerate(self.tickers)}
+        # Only listings (entries with an exchange) say which kinds of symbol
+        # the index covers; one learned '^GSPC' says nothing about '^DJI'
+        self.families = {ticker_family(ticker) for ticker, exchange in zip(self.tickers, self.exchanges)
+                         if exchange}
+        self.words = sorted((word, i) for i, name in enumerate(self.names)
+                            for word in set(_WORD_RE.findall(name.lower())))
+        self._fuzzy = None
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __contains__(self, ticker):
+        return ticker in self.positions
+
+    def records(self):
+        return list(zip(self.tickers, self.names, self.exchanges))
+
+    def get(self, ticker):
+        """(ticker, name, exchange), or None if the ticker isn't listed"""
+        i = self.positions.get(ticker)
+        return None if i is None else (ticker, self.names[i], self.exchanges[i])
+
+    def add(self, records):
+        """Merge in (ticker, name, exchange) records; existing entries keep their details"""
+        records = [record for record in records if normalize_ticker(record[0]) not in self.positions]
+        if records:
+            self._set(self.records() + records)
+
+    def learn(self, tickers):
+        """Add tickers that have been fetched successfully but aren't listed;
+        returns how many were new. Learned tickers have no exchange, so
+        they don't make the index cover their family."""
+        new = [ticker for ticker in unique_tickers(tickers) if ticker not in self.positions]
+        self.add([(ticker, "", "") for ticker in new])
+        return len(new)
+
+    def covers(self, ticker):
+        """Whether a ticker missing from the index can be taken as unknown"""
+        return ticker_family(ticker) in self.families
+
+    def _prefix(self, text, limit):
+        lo = bisect.bisect_left(self.tickers, text)
+        hi = bisect.bisect_left(self.tickers, text + "\uffff", lo)
+        return range(lo, min(hi, lo + limit))
+
+    def _name_prefix(self, text, limit):
+        word = text.lower()
+        lo = bisect.bisect_left(self.words, (word,))
+        positions = []
+        for found, i in self.words[lo:]:
+            if not found.startswith(word) or len(positions) >= limit:
+                break
+            positions.append(i)
+        return positions
+
+    def _near(self, ticker):
+        if self._fuzzy is None:
+            self._fuzzy = {}
+            for i, known in enumerate(self.tickers):
+                for key in _deletes(known) | {known}:
+                    self._fuzzy.setdefault(key, []).append(i)
+        positions = set()
+        for key in _deletes(ticker) | {ticker}:
+            positions.update(self._fuzzy.get(key, ()))
+        positions.discard(self.positions.get(ticker))
+        # Same length first (substitutions and swaps), then shorter/longer
+        return sorted(positions, key=lambda i: (len(self.tickers[i]) != len(ticker), self.tickers[i]))
+
+    def suggest(self, ticker, limit=3):
+        """Listed tickers a typo was probably meant to be"""
+        ticker = normalize_ticker(ticker)
+        return [self.tickers[i] for i in self._near(ticker)[:limit]] if len(ticker) > 1 else []
+
+    def complete(self, text, limit=10):
+        """Up to limit (ticker, name, exchange) matches for partial input:
+        tickers starting with it, then company names with a word starting
+        with it, then tickers one typo away"""
+        ticker = normalize_ticker(text)
+        if not ticker:
+            return []
+        positions = list(self._prefix(ticker, limit))
+        if len(positions) < limit and len(ticker) > 1:
+            positions += self._name_prefix(ticker, limit)
+            if len(ticker) > 2:
+                positions += self._near(ticker)
+        seen = set()
+        matches = []
+        for i in positions:
+            if i not in seen:
+                seen.add(i)
+                matches.append((self.tickers[i], self.names[i], self.exchanges[i]))
+                if len(matches) == limit:
+                    break
+        return matches
+
+    def resolve(self, text):
+        """Canonical form of an input ticker: normalized, with US share
+        classes written the way Yahoo expects (BRK.B -> BRK-B) when listed so"""
+        ticker = normalize_ticker(text)
+        if ticker not in self.positions and "." in ticker:
+            dashed = ticker.replace(".", "-")
+            if dashed in self.positions:
+                return dashed
+        return ticker
+
+    def check(self, tickers, allow_unknown=False):
+        """Validate input tickers before fetching.
+
+        Returns (valid, problems): valid is the canonical, de-duplicated
+        tickers worth fetching; problems maps each rejected ticker to why,
+        with suggestions for likely typos. A ticker the index doesn't list
+        is only rejected when the index covers its kind of symbol (an index
+        of US listings says nothing about '^GSPC' or '0700.HK'), so an
+        empty index accepts anything well-formed. With allow_unknown,
+        only malformed tickers are rejected.
+        """
+        valid = []
+        problems = {}
+        seen = set()
+        for text in tickers:
+            if not str(text).strip():
+                continue
+            ticker = self.resolve(text)
+            if not is_valid_ticker(ticker):
+                problems[ticker or text] = "not a valid ticker"
+            elif ticker not in self.positions and self.covers(ticker) and not allow_unknown:
+                near = self.suggest(ticker)
+                problems[ticker] = "unknown symbol" + (f" (did you mean {', '.join(near)}?)" if near else "")
+            elif ticker not in seen:
+                seen.add(ticker)
+                valid.append(ticker)
+        return valid, problems
+
+    def is_stale(self, max_age=INDEX_MAX_AGE, now=None):
+        return self.refreshed_at is None or (now or time.time()) - self.refreshed_at > max_age
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_PATH):
+        """Index from a ticker,name,exchange CSV (as save() writes) or a
+        NASDAQ symbol directory file; empty if the file doesn't exist"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, newline="", encoding="utf-8") as f:
+            text = f.read()
+        return cls(parse_symbol_file(text), refreshed_at=os.path.getmtime(path))
+
+    def save(self, path=DEFAULT_INDEX_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["ticker", "name", "exchange"])
+            writer.writerows(self.records())
+        os.replace(tmp, path)
+        self.refreshed_at = os.path.getmtime(path)
+
+
+def parse_symbol_file(text):
+    """(ticker, name, exchange) records from a CSV or NASDAQ pipe-delimited listing"""
+    lines = text.splitlines()
+    if not lines:
+        return []
+    if "|" not in lines[0]:
+        rows = csv.reader(io.StringIO(text))
+        header = [column.strip().lower() for column in next(rows)]
+        column = {name: header.index(name) for name in ("ticker", "name", "exchange") if name in header}
+        if 'ticker' not in column:
+            raise ValueError("symbol file needs a 'ticker' column")
+        return [tuple(row[column[name]] if name in column and column[name] < len(row) else ""
+                      for name in ("ticker", "name", "exchange"))
+                for row in rows if row]
+
+    header = lines[0].split("|")
+    records = []
+    for line in lines[1:]:
+        if line.startswith("File Creation Time"):
+            continue
+        row = dict(zip(header, line.split("|")))
+        if row.get('Test Issue') == "Y":
+            continue
+        if 'ACT Symbol' in row:
+            # Other exchanges write share classes as BRK.B; Yahoo uses BRK-B
+            ticker = row['ACT Symbol'].replace(".", "-")
+            exchange = OTHER_EXCHANGES.get(row.get('Exchange', ""), row.get('Exchange', ""))
+        else:
+            ticker = row.get('Symbol', "")
+            exchange = "NASDAQ"
+        records.append((ticker, row.get('Security Name', ""), exchange))
+    return records
+
+
+def download_symbol_index(urls=NASDAQ_SYMBOL_URLS, timeout=30):
+    """A fresh SymbolIndex built from the NASDAQ Trader symbol directory"""
+    records = []
+    for url in urls:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            records += parse_symbol_file(response.read().decode("utf-8", errors="replace"))
+    return SymbolIndex(records)
+
+
+def refresh_symbol_index(records=(), path=DEFAULT_INDEX_PATH, urls=NASDAQ_SYMBOL_URLS):
+    """Re-download the listings, save them to path and return the new index.
+
+    Of the old index's records, those from other sources (learned tickers,
+    foreign listings added to the file by hand) are kept; delisted ones
+    drop out.
+    """
+    fresh = download_symbol_index(urls)
+    downloaded = set(fresh.exchanges)
+    fresh.add([record for record in records if record[2] not in downloaded])
+    fresh.save(path)
+    return fresh
@@ -0,0 +1,50 @@
+import os
+import sys
+import pandas as pd
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_provider import SyntheticProvider
+
+
+class AsOfProvider(SyntheticProvider):
+    """Synthetic bars as a provider would have served them on `cutoff`.
+
+    The base series are taken as split-adjusted, dividend-unadjusted
+    prices. Only the actions listed (date, dividend, split) are used:
+    those on or before the cutoff show up in the action columns and adjust
+    the bars before them, later splits aren't applied yet. With `only`,
+    just those symbols have the actions (FX rates never do).
+    """
+
+    def __init__(self, cutoff, actions=(), only=None, **kwargs):
+        super().__init__(history_start="2024-01-01", **kwargs)
+        self.cutoff = pd.Timestamp(cutoff)
+        self.actions = [(pd.Timestamp(date), dividend, split) for date, dividend, split in actions]
+        self.only = only
+        self.requests = []
+
+    def series(self, ticker):
+        hist = super().series(ticker)
+        hist = hist[hist.index <= self.cutoff].copy()
+        hist['Dividends'] = 0.0
+        hist['Stock Splits'] = 0.0
+        raw = hist['Close'].copy()
+        prices = ['Open', 'High', 'Low', 'Close']
+        for date, dividend, split in (self.actions if self.only is None or ticker in self.only else ()):
+            before = hist.index < date
+            if date > self.cutoff:
+                hist.loc[before, prices] *= split
+                hist.loc[before, 'Volume'] /= split
+                continue
+            if dividend:
+                hist.loc[before, prices] *= 1 - dividend / raw[before].iloc[-1]
+                hist.loc[date, 'Dividends'] = dividend
+            if split != 1.0:
+                hist.loc[date, 'Stock Splits'] = split
+        return hist
+
+    def download(self, tickers, start=None, end=None):
+        self.requests.append((tuple(tickers), start))
+        return super().download(tickers, start=start, end=end)
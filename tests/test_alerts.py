@@ -0,0 +1,69 @@
+from alerts import AlertEngine
+
+
+def fired(engine, price, symbol="AAPL"):
+    return sorted(alert.rule.threshold for alert in engine.check({symbol: price}))
+
+
+def test_rule_fires_on_first_price_only_if_it_already_holds():
+    engine = AlertEngine()
+    engine.add_rule("aapl", 'price', '>=', 100)
+    engine.add_rule("AAPL", 'price', '<=', 90)
+    assert fired(engine, 101) == [100]
+
+
+def test_rule_fires_again_only_after_crossing_back():
+    engine = AlertEngine()
+    engine.add_rule("AAPL", 'price', '>=', 100)
+    assert fired(engine, 95) == []
+    assert fired(engine, 100) == [100]
+    # Staying above, or the same price again, doesn't re-fire
+    assert fired(engine, 102) == []
+    assert fired(engine, 102) == []
+    assert fired(engine, 99) == []
+    assert fired(engine, 101) == [100]
+
+
+def test_one_jump_crosses_every_threshold_in_between():
+    engine = AlertEngine()
+    for threshold in (100, 105, 110, 120):
+        engine.add_rule("AAPL", 'price', '>=', threshold)
+    for threshold in (90, 80):
+        engine.add_rule("AAPL", 'price', '<=', threshold)
+    assert fired(engine, 95) == []
+    assert fired(engine, 112) == [100, 105, 110]
+    assert fired(engine, 79) == [80, 90]
+
+
+def test_percentage_metrics_use_the_references():
+    engine = AlertEngine()
+    engine.add_rule("AAPL", 'move_open', '>=', 5)
+    engine.add_rule("AAPL", 'drawdown', '>=', 10)
+    engine.set_reference("AAPL", open=100.0, high=120.0)
+    assert fired(engine, 104) == [10]
+    assert fired(engine, 105) == [5]
+
+
+def test_metric_without_a_reference_is_not_evaluated():
+    engine = AlertEngine()
+    engine.add_rule("AAPL", 'move_open', '<=', -1)
+    assert fired(engine, 50) == []
+    engine.set_reference("AAPL", open=100.0)
+    # A new reference re-checks the symbol even at the same price
+    assert fired(engine, 50) == [-1]
+
+
+def test_rule_added_while_its_condition_holds_fires_on_next_check():
+    engine = AlertEngine()
+    engine.add_rule("AAPL", 'price', '>=', 100)
+    fired(engine, 110)
+    engine.add_rule("AAPL", 'price', '>=', 105)
+    assert [alert.rule.threshold for alert in engine.check({})] == [105]
+
+
+def test_removed_rule_no_longer_fires():
+    engine = AlertEngine()
+    rule = engine.add_rule("AAPL", 'price', '>=', 100)
+    engine.remove_rule(rule.id)
+    assert len(engine) == 0
+    assert fired(engine, 150) == []
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from analytics import RollingAnalytics
+from fake_provider import SyntheticProvider
+from market_data import fetch_histories
+from portfolio import build_price_matrix
+
+SYMBOLS = ["AAA", "BBB", "CCC", "DDD"]
+
+
+@pytest.fixture(scope="module")
+def prices():
+    provider = SyntheticProvider(seed=7, history_start="2023-01-01")
+    histories, _ = fetch_histories(SYMBOLS + ["SPY"], start="2023-01-01", end="2024-07-01", provider=provider)
+    dates, matrix = build_price_matrix(histories, SYMBOLS + ["SPY"])
+    # A late listing and a gap, so per-symbol and pairwise counts differ
+    matrix[:40, 2] = np.nan
+    matrix[100:103, 3] = np.nan
+    return dates, matrix
+
+
+def assert_same_stats(incremental, full):
+    assert len(incremental) == len(full)
+    for label, values in full.trailing_returns().items():
+        np.testing.assert_allclose(incremental.trailing_returns()[label], values, rtol=1e-9)
+    np.testing.assert_allclose(incremental.volatility(), full.volatility(), rtol=1e-7)
+    np.testing.assert_allclose(incremental.covariance(), full.covariance(), rtol=1e-6, atol=1e-12)
+    np.testing.assert_allclose(incremental.beta(), full.beta(), rtol=1e-6)
+    np.testing.assert_allclose(incremental.max_drawdown, full.max_drawdown, rtol=1e-12)
+    np.testing.assert_allclose(incremental.correlation().to_numpy(), full.correlation().to_numpy(),
+                               rtol=1e-6, atol=1e-9)
+
+
+def test_appended_bars_match_a_full_rebuild(prices):
+    dates, matrix = prices
+    incremental = RollingAnalytics(SYMBOLS, window=63)
+    incremental.load(dates[:150], matrix[:150])
+    # Overlaps the last loaded bar (revised) and runs the window past old rows
+    incremental.update(dates[149:], matrix[149:])
+
+    full = RollingAnalytics(SYMBOLS, window=63)
+    full.load(dates, matrix)
+    assert_same_stats(incremental, full)
+
+
+def test_bar_by_bar_from_empty_matches_a_full_rebuild(prices):
+    dates, matrix = prices
+    incremental = RollingAnalytics(SYMBOLS, window=21)
+    for date, row in zip(dates, matrix):
+        incremental.append_bar(date, row)
+
+    full = RollingAnalytics(SYMBOLS, window=21)
+    full.load(dates, matrix)
+    assert_same_stats(incremental, full)
+
+
+def test_revised_quotes_match_a_full_rebuild(prices):
+    dates, matrix = prices
+    incremental = RollingAnalytics(SYMBOLS, window=63)
+    incremental.load(dates, matrix)
+    last = dict(zip(SYMBOLS + ["SPY"], matrix[-1]))
+    # Two intraday revisions of the latest bar, the second back down
+    incremental.update_quotes({ticker: price * 1.05 for ticker, price in last.items()}, dates[-1])
+    incremental.update_quotes({"AAA": last["AAA"] * 0.9, "SPY": last["SPY"] * 0.97}, dates[-1])
+
+    revised = matrix.copy()
+    revised[-1] *= 1.05
+    revised[-1, 0] = last["AAA"] * 0.9
+    revised[-1, 4] = last["SPY"] * 0.97
+    full = RollingAnalytics(SYMBOLS, window=63)
+    full.load(dates, revised)
+    assert_same_stats(incremental, full)
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+from compact_series import CompactHistory, PriceArchive, day_index, day_numbers, write_archive
+from fake_provider import SyntheticProvider
+from market_data import fetch_histories
+from portfolio import build_price_matrix
+
+SYMBOLS = ["AAA", "BBB", "CCC"]
+
+
+class Source:
+    """fetch_histories() on synthetic data, recording each request"""
+
+    def __init__(self):
+        self.provider = SyntheticProvider(seed=5, history_start="2024-01-01")
+        self.requests = []
+
+    def fetch_histories(self, tickers, start=None, end=None):
+        self.requests.append(list(tickers))
+        return fetch_histories(tickers, start=start, end=end, provider=self.provider)
+
+
+@pytest.fixture(scope="module")
+def histories():
+    histories, _ = fetch_histories(SYMBOLS, start="2024-01-01", end="2024-07-01",
+                                   provider=SyntheticProvider(seed=5, history_start="2024-01-01"))
+    # Symbols on different calendars: one starts later, one has a gap
+    histories["BBB"] = histories["BBB"].loc["2024-03-01":]
+    histories["CCC"] = histories["CCC"].drop(histories["CCC"].index[20:30])
+    return histories
+
+
+def test_day_numbers_round_trip_through_day_index():
+    index = pd.DatetimeIndex(["2024-01-02", "2024-03-15"], name='Date').tz_localize("America/New_York")
+    days = day_numbers(index)
+
+    assert days.dtype == np.int32
+    assert days.tolist() == [19724, 19797]
+    assert day_index(days).equals(pd.DatetimeIndex(["2024-01-02", "2024-03-15"], name='Date'))
+
+
+def test_compact_history_keeps_only_the_close_unless_asked(histories):
+    hist = histories["AAA"]
+    compact = CompactHistory.from_frame(hist)
+    with_ohlc = CompactHistory.from_frame(hist, dtype=np.float32, keep_ohlc=True)
+
+    assert list(compact.to_frame().columns) == ['Close']
+    np.testing.assert_array_equal(compact.to_frame()['Close'].to_numpy(), hist['Close'].to_numpy())
+    assert list(with_ohlc.to_frame().columns) == ['Open', 'High', 'Low', 'Close']
+    assert with_ohlc.close.dtype == np.float32 and with_ohlc.ohlc.shape == (len(hist), 3)
+    assert CompactHistory.from_frame(pd.DataFrame()).to_frame().empty
+
+
+def test_slice_is_half_open_and_shares_memory(histories):
+    compact = CompactHistory.from_frame(histories["AAA"], keep_ohlc=True)
+    window = compact.slice("2024-02-01", "2024-03-01")
+
+    expected = histories["AAA"].loc["2024-02-01":"2024-02-29"]
+    assert day_index(window.days).equals(pd.DatetimeIndex(expected.index, name='Date'))
+    assert np.shares_memory(window.close, compact.close)
+    assert len(compact.slice(end="2024-01-01")) == 0
+    assert len(compact.slice("2024-02-01")) == len(histories["AAA"].loc["2024-02-01":])
+
+
+@pytest.mark.parametrize("keep_ohlc", [False, True])
+def test_archive_series_match_the_histories_written(histories, tmp_path, keep_ohlc):
+    assert write_archive(str(tmp_path), histories, dtype=np.float64, keep_ohlc=keep_ohlc) == 3
+    archive = PriceArchive(str(tmp_path))
+
+    assert len(archive) == 3 and "BBB" in archive and "ZZZ" not in archive
+    for ticker, hist in histories.items():
+        frame = archive.series(ticker).to_frame()
+        assert frame.index.equals(pd.DatetimeIndex(hist.index, name='Date'))
+        columns = ['Open', 'High', 'Low', 'Close'] if keep_ohlc else ['Close']
+        np.testing.assert_array_equal(frame[columns].to_numpy(), hist[columns].to_numpy())
+
+
+def test_archive_matrix_matches_build_price_matrix(histories, tmp_path):
+    write_archive(str(tmp_path), histories, dtype=np.float64)
+    archive = PriceArchive(str(tmp_path))
+    dates, matrix = archive.matrix(SYMBOLS + ["ZZZ"], start="2024-02-01", end="2024-05-01")
+    expected_dates, expected = build_price_matrix(
+        {ticker: hist.loc["2024-02-01":"2024-04-30"] for ticker, hist in histories.items()}, SYMBOLS)
+
+    np.testing.assert_array_equal(dates, np.asarray(expected_dates, dtype='datetime64[D]'))
+    np.testing.assert_array_equal(matrix[:, :3], expected)
+    assert np.isnan(matrix[:, 3]).all()
+
+
+def test_symbols_not_archived_go_to_the_fallback(histories, tmp_path):
+    write_archive(str(tmp_path), {"AAA": histories["AAA"]})
+    source = Source()
+    archived, errors = PriceArchive(str(tmp_path)).fetch_histories(["AAA", "ZZZ"], start="2024-06-01")
+    assert sorted(archived) == ["AAA"]
+    assert errors == {"ZZZ": "not in price archive"}
+
+    archived, errors = PriceArchive(str(tmp_path), fallback=source).fetch_histories(
+        ["AAA", "ZZZ"], start="2024-06-01", end="2024-07-01")
+    assert source.requests == [["ZZZ"]]
+    assert errors == {} and sorted(archived) == ["AAA", "ZZZ"]
+    assert archived["AAA"].index[0] >= pd.Timestamp("2024-06-01")
+    assert archived["AAA"]['Close'].dtype == np.float32
+
+
+def test_unknown_archive_versions_are_refused(histories, tmp_path):
+    write_archive(str(tmp_path), histories)
+    meta = tmp_path / "meta.json"
+    meta.write_text(meta.read_text().replace('"version": 1', '"version": 99'))
+    with pytest.raises(ValueError, match="unsupported archive version"):
+        PriceArchive(str(tmp_path))
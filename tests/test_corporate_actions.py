@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import AsOfProvider
+from compact_series import PriceArchive, write_archive
+from corporate_actions import UNADJUSTED, ActionTable, Valuation, action_rows
+from market_data import fetch_histories
+from portfolio import STATUS_ERROR, STATUS_OK, Holdings
+from price_cache import PriceCache
+from tracker_core import iter_portfolio
+
+# A dividend, then a 2-for-1 split, both after the lot was bought
+ACTIONS = [("2024-03-12", 1.25, 1.0), ("2024-04-02", 0.0, 2.0)]
+CUTOFF = "2024-04-15"
+
+
+class Uncached:
+    """A source without a price cache: actions only come with the frames"""
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def fetch_histories(self, tickers, start=None, end=None):
+        return fetch_histories(tickers, start=start, end=end, provider=self.provider)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = PriceCache(str(tmp_path / "prices.db"), provider=AsOfProvider(CUTOFF, ACTIONS))
+    yield cache
+    cache.close()
+
+
+def holdings_of(*lots):
+    holdings = Holdings()
+    for ticker, shares, date in lots:
+        holdings.append(ticker, shares, date)
+    return holdings
+
+
+def valued(source, holdings, **options):
+    valuation = Valuation(source, **options)
+    frames, errors = [], {}
+    for lots, chunk_errors in iter_portfolio(holdings, source, valuation=valuation):
+        frames.append(lots)
+        errors.update(chunk_errors)
+    return pd.concat(frames, ignore_index=True).set_index('ticker'), errors
+
+
+def test_price_return_values_the_lot_at_what_was_paid(cache):
+    raw = AsOfProvider(CUTOFF).series("AAA")['Close']
+    lots, errors = valued(cache, holdings_of(("AAA", 10, "2024-03-01")))
+    lot = lots.loc["AAA"]
+
+    assert errors == {}
+    # 10 shares bought before the split are 20 now, at half the actual price paid
+    assert lot['shares'] == 20
+    assert lot['purchase_price'] == pytest.approx(raw["2024-03-01"], rel=1e-9)
+    assert lot['cost'] == pytest.approx(10 * 2 * raw["2024-03-01"], rel=1e-9)
+    assert lot['current_price'] == pytest.approx(raw[CUTOFF], rel=1e-9)
+
+
+def test_total_return_reinvests_the_dividend_at_the_same_cost(cache):
+    raw = AsOfProvider(CUTOFF).series("AAA")['Close']
+    lots, _ = valued(cache, holdings_of(("AAA", 10, "2024-03-01")), total_return=True)
+    lot = lots.loc["AAA"]
+
+    factor = 1 - 1.25 / raw["2024-03-11"]
+    assert lot['shares'] == pytest.approx(20 / factor, rel=1e-9)
+    assert lot['cost'] == pytest.approx(10 * 2 * raw["2024-03-01"], rel=1e-9)
+    assert lot['value'] == pytest.approx(20 / factor * raw[CUTOFF], rel=1e-9)
+
+
+def test_uncached_frames_give_the_same_valuation(cache):
+    holdings = holdings_of(("AAA", 10, "2024-03-01"), ("AAA", 5, "2024-03-12"), ("BBB", 7, "2024-04-08"))
+    cached, _ = valued(cache, holdings)
+    uncached, _ = valued(Uncached(AsOfProvider(CUTOFF, ACTIONS)), holdings)
+
+    columns = ['shares', 'purchase_price', 'current_price', 'cost', 'value']
+    np.testing.assert_allclose(uncached[columns].to_numpy(), cached[columns].to_numpy(), rtol=1e-9)
+    # Bought on the ex-date: the dividend went to the seller
+    assert cached['shares'].tolist() == [20, 10, 7]
+
+
+def test_archive_keeps_the_actions_its_prices_are_adjusted_for(cache, tmp_path):
+    holdings = holdings_of(("AAA", 10, "2024-03-01"), ("BBB", 7, "2024-02-05"))
+    histories, _ = cache.fetch_histories(["AAA", "BBB"], start="2024-01-02")
+    write_archive(str(tmp_path / "archive"), histories, dtype=np.float64,
+                  actions=action_rows(cache, list(histories)))
+    archived, errors = valued(PriceArchive(str(tmp_path / "archive")), holdings)
+    cached, _ = valued(cache, holdings)
+
+    assert errors == {}
+    assert archived['adjusted'].all()
+    columns = ['shares', 'purchase_price', 'cost', 'value']
+    np.testing.assert_allclose(archived[columns].to_numpy(), cached[columns].to_numpy(), rtol=1e-9)
+
+
+def test_lots_with_unknown_actions_are_flagged_not_failed(cache, tmp_path):
+    histories, _ = cache.fetch_histories(["AAA"], start="2024-01-02")
+    write_archive(str(tmp_path / "archive"), histories)
+    # BBB isn't archived; its actions come from the cache behind the archive
+    archive = PriceArchive(str(tmp_path / "archive"), fallback=cache)
+    lots, errors = valued(archive, holdings_of(("AAA", 10, "2024-03-01"), ("BBB", 7, "2024-02-05")))
+
+    assert errors == {"AAA": UNADJUSTED}
+    assert lots['status'].tolist() == [STATUS_OK, STATUS_OK]
+    assert lots['adjusted'].tolist() == [False, True]
+    assert lots.loc["AAA", 'shares'] == 10
+
+
+def test_action_table_matches_per_lot_products():
+    rng = np.random.default_rng(4)
+    tickers = ["AAA", "BBB", "CCC", "DDD"]
+    rows = [(ticker, int(day), float(rng.choice([1.0, 2.0, 0.5])), float(rng.uniform(0.95, 1.0)))
+            for ticker in tickers[:3] for day in rng.choice(np.arange(19000, 19400), 6, replace=False)]
+    table = ActionTable(rows[::-1], covered=tickers)
+
+    # Random purchases, some before or after all the actions, plus one on each action day
+    lot_tickers = np.concatenate([rng.choice(tickers + ["EEE"], 300), [row[0] for row in rows]])
+    days = np.concatenate([rng.integers(18990, 19410, 300), [row[1] for row in rows]]).astype(np.int32)
+    splits, dividends = table.factors(table.ids(lot_tickers), days)
+
+    for ticker, day, split, dividend in zip(lot_tickers, days, splits, dividends):
+        after = [row for row in rows if row[0] == ticker and row[1] > day]
+        assert split == pytest.approx(np.prod([row[2] for row in after]), rel=1e-12)
+        assert dividend == pytest.approx(np.prod([row[3] for row in after]), rel=1e-12)
+    assert "DDD" in table and "EEE" not in table
+
+
+def test_prices_are_converted_at_the_purchase_and_latest_fx_close(tmp_path):
+    provider = AsOfProvider(CUTOFF, missing=["CHFUSD=X"])
+    cache = PriceCache(str(tmp_path / "prices.db"), provider=provider)
+    # 2024-03-02 is a Saturday: Friday's rate applies
+    holdings = holdings_of(("AAA.DE", 10, "2024-03-01"), ("BBB.L", 100, "2024-03-02"),
+                           ("CCC", 5, "2024-03-01"), ("DDD.SW", 3, "2024-03-01"))
+    lots, errors = valued(cache, holdings)
+    cache.close()
+
+    eur = provider.series("EURUSD=X")['Close']
+    gbp = provider.series("GBPUSD=X")['Close']
+    aaa, bbb = provider.series("AAA.DE")['Close'], provider.series("BBB.L")['Close']
+    assert lots.loc["AAA.DE", 'purchase_price'] == pytest.approx(aaa["2024-03-01"] * eur["2024-03-01"], rel=1e-9)
+    assert lots.loc["AAA.DE", 'current_price'] == pytest.approx(aaa[CUTOFF] * eur[CUTOFF], rel=1e-9)
+    # Pence to pounds, then pounds to dollars
+    assert lots.loc["BBB.L", 'purchase_fx'] == pytest.approx(gbp["2024-03-01"] / 100, rel=1e-9)
+    assert lots.loc["BBB.L", 'value'] == pytest.approx(100 * bbb[CUTOFF] * gbp[CUTOFF] / 100, rel=1e-9)
+    assert lots.loc["CCC", 'fx_rate'] == 1.0
+    assert lots.loc["CCC", 'status'] == STATUS_OK
+    # No rate: the lot is an error rather than a wrong number
+    assert lots.loc["DDD.SW", 'status'] == STATUS_ERROR
+    assert "DDD.SW" in errors and np.isnan(lots.loc["DDD.SW", 'value'])
@@ -0,0 +1,97 @@
+import threading
+import numpy as np
+from fake_provider import SyntheticProvider
+from history_cache import HistoryCache
+from market_data import fetch_histories
+
+
+class CountingBackend:
+    """fetch_histories() on synthetic data, recording each request"""
+
+    def __init__(self, latency=0.0):
+        self.provider = SyntheticProvider(seed=11, latency=latency, history_start="2023-01-01")
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def fetch_histories(self, tickers, start=None, end=None):
+        with self.lock:
+            self.requests.append((tuple(tickers), start))
+        return fetch_histories(tickers, start=start, end=end, provider=self.provider)
+
+
+def test_narrower_ranges_are_sliced_from_memory():
+    backend = CountingBackend()
+    cache = HistoryCache(backend)
+    cache.fetch_histories(["AAA", "BBB"], start="2023-06-01")
+    histories, errors = cache.fetch_histories(["BBB", "AAA"], start="2024-01-02", end="2024-02-01")
+
+    assert errors == {}
+    assert backend.requests == [(("AAA", "BBB"), "2023-06-01")]
+    expected = backend.provider.series("AAA").loc["2024-01-02":"2024-01-31", 'Close']
+    assert list(histories["AAA"].columns) == ['Close']
+    np.testing.assert_array_equal(histories["AAA"].index, expected.index)
+    np.testing.assert_allclose(histories["AAA"]['Close'].to_numpy(), expected.to_numpy())
+    assert cache.stats()['hits'] == 2
+
+
+def test_an_earlier_start_refetches_only_that_symbol():
+    backend = CountingBackend()
+    cache = HistoryCache(backend, keep_ohlc=True)
+    cache.fetch_histories(["AAA", "BBB"], start="2024-01-02")
+    histories, _ = cache.fetch_histories(["AAA", "BBB"], start="2023-06-01")
+    backend.requests.clear()
+    cache.fetch_histories(["AAA"], start="2023-09-01")
+
+    assert backend.requests == []
+    assert histories["AAA"].index[0].strftime("%Y-%m-%d") == "2023-06-01"
+    assert list(histories["AAA"].columns) == ['Open', 'High', 'Low', 'Close']
+
+
+def test_least_recently_used_symbols_are_evicted_past_max_bytes():
+    backend = CountingBackend()
+    probe = HistoryCache(backend)
+    probe.fetch_histories(["AAA"], start="2024-01-02")
+    per_symbol = probe.stats()['bytes']
+
+    cache = HistoryCache(backend, max_bytes=int(per_symbol * 2.5))
+    cache.fetch_histories(["AAA", "BBB"], start="2024-01-02")
+    cache.fetch_histories(["AAA"], start="2024-01-02")
+    cache.fetch_histories(["CCC"], start="2024-01-02")
+
+    assert list(cache.entries) == ["AAA", "CCC"]
+    assert cache.stats()['bytes'] == 2 * per_symbol
+
+
+def test_expired_entries_are_fetched_again():
+    backend = CountingBackend()
+    cache = HistoryCache(backend, ttl=-1)
+    cache.fetch_histories(["AAA"], start="2024-01-02")
+    cache.fetch_histories(["AAA"], start="2024-01-02")
+    assert len(backend.requests) == 2
+
+
+def test_concurrent_requests_share_one_fetch():
+    backend = CountingBackend(latency=0.2)
+    cache = HistoryCache(backend)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.fetch_histories(["AAA"], start="2024-01-02")))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(backend.requests) == 1
+    assert len(results) == 4
+    assert all(histories["AAA"].equals(results[0][0]["AAA"]) for histories, _ in results)
+
+
+def test_failed_symbols_are_not_cached():
+    backend = CountingBackend()
+    backend.provider.error_rate = 1.0
+    cache = HistoryCache(backend)
+    _, errors = cache.fetch_histories(["AAA"], start="2024-01-02")
+    cache.fetch_histories(["AAA"], start="2024-01-02")
+
+    assert errors == {"AAA": "synthetic error"}
+    assert len(backend.requests) == 2 and not cache.entries
@@ -0,0 +1,73 @@
+import json
+import pytest
+from holdings_io import export_holdings, import_holdings, load_holdings, save_holdings
+from portfolio import Holdings
+
+
+def lots(holdings):
+    frame = holdings.to_frame()
+    return list(zip(frame['ticker'], frame['shares'], frame['purchase_date'].astype(str)))
+
+
+def test_bad_rows_are_reported_and_the_rest_imported(tmp_path):
+    path = tmp_path / "export.csv"
+    path.write_text("Symbol,Quantity,Date Acquired\n"
+                    "$aapl,\"1,200\",2024-01-05\n"
+                    ",3,2024-01-05\n"
+                    "MSFT,-2,2024-01-05\n"
+                    "BRK.B,4.5,2024-02-30\n"
+                    "NOT A TICKER!,1,2024-01-05\n"
+                    "spy ,2,2024-03-01 09:30:00\n")
+    holdings, report = import_holdings(str(path), chunk_size=2)
+
+    assert lots(holdings) == [("AAPL", 1200.0, "2024-01-05"), ("SPY", 2.0, "2024-03-01")]
+    assert report.rows_read == 6 and report.rows_added == 2
+    assert [row for row, _ in report.errors] == [3, 4, 5, 6]
+    assert report.error_lines(limit=2) == ["row 3: missing ticker", "row 4: invalid shares '-2'"]
+    assert "invalid date '2024-02-30'" in report.errors[2][1]
+    assert "invalid ticker" in report.errors[3][1]
+    assert report.summary() == "Imported 2 of 6 lots from export.csv; 4 rows rejected"
+
+
+def test_a_missing_column_stops_the_import(tmp_path):
+    path = tmp_path / "export.csv"
+    path.write_text("ticker,shares\nAAPL,1\n")
+    with pytest.raises(ValueError, match="purchase_date"):
+        import_holdings(str(path))
+
+
+@pytest.mark.parametrize("name", ["lots.csv", "lots.json"])
+def test_export_round_trips(tmp_path, name):
+    holdings = Holdings()
+    holdings.extend(["AAA", "BBB", "AAA"], [1.5, 2, 3], ["2024-01-02", "2024-01-03", "2024-02-01"])
+    path = str(tmp_path / name)
+    export_holdings(holdings, path)
+    imported, report = import_holdings(path)
+
+    assert lots(imported) == lots(holdings)
+    assert report.errors == []
+
+
+def test_json_lines_and_wrapped_json_exports(tmp_path):
+    records = [{"symbol": "AAA", "units": 2, "trade_date": "2024-01-02"},
+               {"symbol": "BBB", "units": 0, "trade_date": "2024-01-03"}]
+    (tmp_path / "lots.jsonl").write_text("\n".join(json.dumps(r) for r in records))
+    (tmp_path / "lots.json").write_text(json.dumps({"holdings": records}))
+
+    for name in ["lots.jsonl", "lots.json"]:
+        holdings, report = import_holdings(str(tmp_path / name))
+        assert lots(holdings) == [("AAA", 2.0, "2024-01-02")]
+        assert [row for row, _ in report.errors] == [3]
+
+
+def test_saved_portfolio_replaces_the_previous_one(tmp_path):
+    path = str(tmp_path / "holdings.db")
+    assert len(load_holdings(path)) == 0
+
+    holdings = Holdings()
+    holdings.extend(["AAA", "BBB"], [1, 2], ["2024-01-02", "2024-01-03"])
+    save_holdings(holdings, path)
+    holdings.append("CCC", 3, "2024-01-04")
+    save_holdings(holdings, path)
+
+    assert lots(load_holdings(path)) == lots(holdings)
@@ -0,0 +1,106 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from fake_provider import SyntheticProvider
+from intraday import BarRing, IntradayAggregator, bar_arrays, local_minutes, rollup
+from live_refresh import MARKET_TZ
+
+# 2024-03-05 09:30 in exchange minutes
+OPEN = int(np.datetime64("2024-03-05T09:30", "m").astype(np.int64))
+
+
+def bars(minutes, base=100.0):
+    minutes = np.asarray(minutes, dtype=np.int64)
+    close = base + np.arange(len(minutes), dtype=np.float64)
+    values = np.column_stack([close - 0.5, close + 1, close - 1, close, np.full(len(minutes), 10.0)])
+    return minutes, values
+
+
+@pytest.fixture(scope="module")
+def provider():
+    # Two full sessions: the clock is after the close on 2024-03-05
+    clock = datetime(2024, 3, 5, 17, 0, tzinfo=MARKET_TZ) if MARKET_TZ else datetime(2024, 3, 5, 17, 0)
+    return SyntheticProvider(seed=3, history_start="2024-01-01", clock=lambda: clock)
+
+
+def test_ring_keeps_the_newest_bars_across_wraparound():
+    ring = BarRing(capacity=5)
+    assert ring.add_bars(*bars(OPEN + np.arange(3))) == 3
+    assert ring.add_bars(*bars(OPEN + np.arange(3, 8), base=200.0)) == 5
+
+    minutes, values = ring.bars()
+    assert len(ring) == 5
+    assert minutes.tolist() == (OPEN + np.arange(3, 8)).tolist()
+    assert values[:, 3].tolist() == [200.0, 201.0, 202.0, 203.0, 204.0]
+    # The storage itself wrapped: the oldest bar isn't in slot 0
+    assert ring.start != 0
+
+
+def test_ring_revises_the_last_minute_and_ignores_older_bars():
+    ring = BarRing(capacity=4)
+    ring.add_bars(*bars(OPEN + np.arange(3)))
+    # Re-polled: the open minute was revised, the rest is old
+    minutes, values = bars([OPEN, OPEN + 1, OPEN + 2, OPEN + 3], base=500.0)
+    assert ring.add_bars(minutes, values) == 2
+
+    minutes, values = ring.bars()
+    assert minutes.tolist() == [OPEN, OPEN + 1, OPEN + 2, OPEN + 3]
+    assert values[:, 3].tolist() == [100.0, 101.0, 502.0, 503.0]
+
+
+def test_ticks_fold_into_the_current_minute():
+    ring = BarRing(capacity=3)
+    ring.add_bars(*bars([OPEN]))
+    assert ring.add_tick(OPEN, 110.0, 5)
+    assert ring.add_tick(OPEN, 90.0, 5)
+    assert not ring.add_tick(OPEN - 1, 95.0)
+    assert ring.add_tick(OPEN + 1, 91.0, 2)
+
+    minutes, values = ring.bars()
+    assert minutes.tolist() == [OPEN, OPEN + 1]
+    assert values[0].tolist() == [99.5, 110.0, 90.0, 90.0, 20.0]
+    assert values[1].tolist() == [91.0, 91.0, 91.0, 91.0, 2.0]
+    assert ring.last_close() == 91.0
+
+
+def test_rollup_anchors_buckets_at_the_session_open():
+    # 9:32-9:41: the first 5m bar is 9:30 even though it starts at 9:32
+    minutes, values = bars(OPEN + np.arange(2, 12))
+    rolled_minutes, rolled = rollup(minutes, values, 5)
+
+    assert (rolled_minutes - OPEN).tolist() == [0, 5, 10]
+    assert rolled[0].tolist() == [values[0, 0], values[:3, 1].max(), values[:3, 2].min(), values[2, 3], 30.0]
+    assert rolled[1].tolist() == [values[3, 0], values[3:8, 1].max(), values[3:8, 2].min(), values[7, 3], 50.0]
+    assert rolled[2, 4] == 20.0
+
+
+@pytest.mark.parametrize("size", [5, 15, 60])
+def test_rollup_matches_pandas_resample(provider, size):
+    frame = provider.intraday("AAA", sessions=2)
+    minutes, values = bar_arrays(frame)
+    rolled_minutes, rolled = rollup(minutes, values, size)
+
+    naive = frame.copy()
+    naive.index = pd.DatetimeIndex(local_minutes(frame.index).astype("datetime64[m]").astype("datetime64[ns]"))
+    expected = naive.resample(f"{size}min", origin="start_day", offset="30min").agg(
+        {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}).dropna()
+
+    assert rolled_minutes.astype("datetime64[m]").astype("datetime64[ns]").tolist() == \
+        expected.index.values.tolist()
+    np.testing.assert_allclose(rolled, expected.to_numpy(), rtol=1e-12)
+
+
+def test_session_figures_use_the_previous_session_close(provider):
+    frame = provider.intraday("AAA", sessions=2)
+    aggregator = IntradayAggregator()
+    aggregator.ingest("AAA", frame)
+    today = frame[frame.index.normalize() == frame.index[-1].normalize()]
+    yesterday = frame[frame.index.normalize() < frame.index[-1].normalize()]
+
+    session = aggregator.session("AAA")
+    assert session['open'] == today['Open'].iloc[0]
+    assert session['last'] == today['Close'].iloc[-1]
+    assert session['previous_close'] == yesterday['Close'].iloc[-1]
+    assert session['change_pct'] == pytest.approx((session['last'] / session['previous_close'] - 1) * 100)
+    assert len(aggregator.bars("AAA", 60)) == 7
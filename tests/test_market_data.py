@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+from fake_provider import SyntheticProvider
+from market_data import fetch_histories, missing_errors
+
+
+class RecordingProvider(SyntheticProvider):
+    """Synthetic data that notes each requested chunk; chunks with a
+    symbol in `broken` raise, as a failed request would"""
+
+    def __init__(self, broken=(), **kwargs):
+        super().__init__(history_start="2024-01-01", **kwargs)
+        self.broken = set(broken)
+        self.chunks = []
+
+    def download(self, tickers, start=None, end=None):
+        self.chunks.append(list(tickers))
+        if self.broken & set(tickers):
+            raise ConnectionError("request failed")
+        return super().download(tickers, start=start, end=end)
+
+
+def wide(columns):
+    index = pd.bdate_range("2024-03-01", periods=3, name='Date')
+    return pd.concat({ticker: pd.DataFrame({'Close': closes}, index=index) for ticker, closes in columns.items()},
+                     axis=1)
+
+
+def test_symbols_are_fetched_once_in_chunks():
+    provider = RecordingProvider()
+    tickers = [f"S{i:03d}" for i in range(250)]
+    histories, errors = fetch_histories(tickers + tickers[:10], start="2024-03-01", provider=provider,
+                                        chunk_size=100)
+
+    assert [len(chunk) for chunk in provider.chunks] == [100, 100, 50]
+    assert sum(provider.chunks, []) == tickers
+    assert errors == {}
+    assert sorted(histories) == tickers
+    assert all(not hist.empty for hist in histories.values())
+
+
+def test_a_failed_request_only_fails_its_own_chunk():
+    provider = RecordingProvider(broken=["S004"])
+    tickers = [f"S{i:03d}" for i in range(9)]
+    histories, errors = fetch_histories(tickers, start="2024-03-01", provider=provider, chunk_size=3)
+
+    assert errors == {"S003": "request failed", "S004": "request failed", "S005": "request failed"}
+    assert sorted(histories) == tickers[:3] + tickers[6:]
+
+
+def test_per_symbol_errors_are_split_from_the_rest_of_the_chunk():
+    provider = RecordingProvider(error_rate=0.3)
+    tickers = [f"S{i:03d}" for i in range(40)]
+    histories, errors = fetch_histories(tickers, start="2024-03-01", provider=provider, chunk_size=100)
+
+    failing = [ticker for ticker in tickers if provider.fails(ticker)]
+    assert len(provider.chunks) == 1
+    assert 0 < len(failing) < len(tickers)
+    assert errors == {ticker: "synthetic error" for ticker in failing}
+    assert sorted(histories) == [ticker for ticker in tickers if ticker not in failing]
+
+
+def test_missing_errors_flags_absent_and_all_nan_symbols():
+    frame = wide({"AAA": [1.0, 2.0, 3.0], "BBB": [np.nan] * 3, "CCC": [np.nan, np.nan, 4.0]})
+
+    assert missing_errors(frame, ["AAA", "BBB", "CCC", "DDD"]) == {
+        "BBB": "no data returned", "DDD": "no data returned"}
+    assert missing_errors(pd.DataFrame(), ["AAA", "BBB"]) == {"AAA": "no data returned", "BBB": "no data returned"}
+    # Single-symbol downloads can have flat columns
+    assert missing_errors(frame["AAA"], ["AAA"]) == {}
+    assert missing_errors(frame["BBB"], ["BBB"]) == {"BBB": "no data returned"}
+
+
+def test_symbols_reported_missing_get_an_error_not_an_empty_history():
+    class Missing(RecordingProvider):
+        def download(self, tickers, start=None, end=None):
+            frame, errors = super().download(tickers, start=start, end=end)
+            return frame, {**missing_errors(frame, tickers), **errors}
+
+    histories, errors = fetch_histories(["AAA", "GONE", "BBB"], start="2024-03-01",
+                                        provider=Missing(missing=["GONE"]))
+    assert errors == {"GONE": "no data returned"}
+    assert sorted(histories) == ["AAA", "BBB"]
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fake_provider import SyntheticProvider
+from market_data import fetch_histories
+from portfolio import STATUS_ERROR, STATUS_NO_DATA, STATUS_OK, Holdings, revalue_lots, value_holdings
+
+SYMBOLS = ["AAA", "BBB", "CCC", "DDD", "EEE"]
+
+
+@pytest.fixture(scope="module")
+def histories():
+    provider = SyntheticProvider(seed=2, history_start="2023-01-01")
+    histories, _ = fetch_histories(SYMBOLS, start="2023-01-01", end="2024-06-01", provider=provider)
+    # A gap, and a symbol that only starts trading later
+    histories["BBB"] = histories["BBB"].drop(histories["BBB"].index[100:110])
+    histories["CCC"] = histories["CCC"].loc["2024-01-01":]
+    return histories
+
+
+@pytest.fixture(scope="module")
+def holdings():
+    rng = np.random.default_rng(9)
+    holdings = Holdings(capacity=4)
+    days = np.datetime64("2022-12-01") + rng.integers(0, 560, 400)
+    holdings.extend(rng.choice(SYMBOLS + ["ZZZ"], 400), rng.uniform(1, 50, 400).round(2), days)
+    return holdings
+
+
+def naive_prices(hist, purchase_date):
+    """First close on or after the purchase date and the last close, one lot at a time"""
+    if hist is None or hist.empty:
+        return np.nan, np.nan
+    after = hist.loc[hist.index >= pd.Timestamp(purchase_date), 'Close']
+    if after.empty:
+        return np.nan, np.nan
+    return after.iloc[0], hist['Close'].iloc[-1]
+
+
+def test_matches_valuing_one_lot_at_a_time(histories, holdings):
+    lots, totals = value_holdings(holdings, histories, errors={"DDD": "synthetic error"})
+
+    assert len(lots) == len(holdings) == 400
+    for lot in lots.itertuples():
+        purchase, current = naive_prices(histories.get(lot.ticker), lot.purchase_date)
+        if lot.ticker == "DDD":
+            assert lot.status == STATUS_ERROR
+        elif np.isnan(purchase):
+            assert lot.status == STATUS_NO_DATA
+        else:
+            assert lot.status == STATUS_OK
+            assert lot.purchase_price == purchase and lot.current_price == current
+            assert lot.gain == pytest.approx(lot.shares * (current - purchase))
+
+    ok = lots[lots['status'] == STATUS_OK]
+    assert totals['cost'] == pytest.approx(ok['cost'].sum())
+    assert totals['value'] == pytest.approx(ok['value'].sum())
+    assert set(lots.loc[lots['ticker'] == "ZZZ", 'status']) == {STATUS_NO_DATA}
+
+
+def test_mask_values_only_the_selected_lots(histories, holdings):
+    everything, _ = value_holdings(holdings, histories)
+    mask = np.isin(holdings.ticker_ids, [holdings.symbol_ids["AAA"], holdings.symbol_ids["CCC"]])
+    some, _ = value_holdings(holdings, {t: histories[t] for t in ["AAA", "CCC"]}, mask=mask)
+
+    assert some['lot'].tolist() == np.flatnonzero(mask).tolist()
+    pd.testing.assert_frame_equal(some.reset_index(drop=True),
+                                  everything[mask].reset_index(drop=True))
+
+
+def test_holdings_grow_and_copy_independently():
+    holdings = Holdings(capacity=2)
+    for i in range(5):
+        holdings.append(SYMBOLS[i % 2], i + 1, f"2024-01-0{i + 1}")
+    snapshot = holdings.copy()
+    holdings.append("CCC", 9, "2024-02-01")
+
+    assert len(snapshot) == 5 and len(holdings) == 6
+    assert snapshot.held_symbols() == ["AAA", "BBB"]
+    assert snapshot.shares.tolist() == [1, 2, 3, 4, 5]
+    assert holdings.earliest_dates() == {"AAA": "2024-01-01", "BBB": "2024-01-02", "CCC": "2024-02-01"}
+
+
+def test_revalue_only_touches_lots_with_a_new_quote(histories, holdings):
+    lots, _ = value_holdings(holdings, histories)
+    before = lots.copy()
+    last = float(histories["AAA"]['Close'].iloc[-1])
+    changed = revalue_lots(lots, {"AAA": last * 1.1, "BBB": float(histories["BBB"]['Close'].iloc[-1])})
+
+    aaa = (before['ticker'] == "AAA") & (before['status'] == STATUS_OK)
+    assert changed.tolist() == aaa.tolist()
+    assert lots.loc[aaa, 'current_price'].tolist() == pytest.approx([last * 1.1] * aaa.sum())
+    assert lots.loc[aaa, 'value'].tolist() == pytest.approx((before.loc[aaa, 'shares'] * last * 1.1).tolist())
+    pd.testing.assert_frame_equal(lots[~aaa], before[~aaa])
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import AsOfProvider
+from corporate_actions import Valuation
+from portfolio import Holdings, summarize_lots
+from portfolio_history import (PortfolioHistoryStore, history_stats, time_weighted_returns,
+                               update_portfolio_history, xirr)
+from price_cache import PriceCache
+from tracker_core import iter_portfolio
+
+ACTIONS = [("2024-03-12", 1.25, 1.0), ("2024-04-02", 0.0, 2.0)]
+
+
+@pytest.fixture
+def holdings():
+    holdings = Holdings()
+    holdings.append("AAA", 10, "2024-02-01")
+    holdings.append("AAA", 4, "2024-03-20")
+    holdings.append("BBB.DE", 25, "2024-02-15")
+    holdings.append("CCC.SW", 3, "2024-02-15")
+    return holdings
+
+
+def cache_as_of(path, cutoff):
+    provider = AsOfProvider(cutoff, ACTIONS, only={"AAA", "BBB.DE"}, missing=["CHFEUR=X"])
+    return PriceCache(str(path), today_ttl=0, provider=provider)
+
+
+def test_xirr_matches_known_result():
+    # The worked example from the spreadsheet XIRR documentation
+    amounts = [-10000, 2750, 4250, 3250, 2750]
+    dates = ["2008-01-01", "2008-03-01", "2008-10-30", "2009-02-15", "2009-04-01"]
+    assert xirr(amounts, dates) == pytest.approx(0.373362535, abs=1e-8)
+
+
+def test_xirr_single_period():
+    # 10% over 365 days; flows don't need to be in date order
+    assert xirr([1100, -1000], ["2021-01-01", "2020-01-02"]) == pytest.approx(0.10, abs=1e-10)
+
+
+def test_xirr_near_total_loss():
+    # 1000 in, 1 back a year later
+    assert xirr([-1000, 1], ["2020-01-01", "2020-12-31"]) == pytest.approx(-0.999, abs=1e-8)
+
+
+def test_xirr_without_a_sign_change_is_none():
+    assert xirr([-100, -50], ["2020-01-01", "2021-01-01"]) is None
+    assert xirr([100], ["2020-01-01"]) is None
+
+
+def test_contributions_are_not_performance():
+    index = pd.DatetimeIndex(pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-04"]), name='Date')
+    # +10%, then 1000 added and no price move
+    series = pd.DataFrame({'value': [1000.0, 1100.0, 2100.0], 'flow': [1000.0, 0.0, 1000.0]}, index=index)
+
+    twr = time_weighted_returns(series)
+    assert twr.tolist() == pytest.approx([0.0, 0.10, 0.10])
+
+    stats = history_stats(series)
+    assert stats['invested'] == 2000.0
+    assert stats['value'] == 2100.0
+    assert stats['xirr'] > 0
+
+
+@pytest.mark.parametrize("total_return", [False, True])
+def test_history_ends_at_the_portfolio_totals(tmp_path, holdings, total_return):
+    cache = cache_as_of(tmp_path / "prices.db", "2024-04-15")
+    valuation = Valuation(cache, base_currency="EUR", total_return=total_return)
+    series, errors = update_portfolio_history(holdings, cache, valuation=valuation)
+    lots = pd.concat([lots for lots, _ in iter_portfolio(holdings, cache, valuation=valuation)])
+    cache.close()
+
+    # No CHF rate: that lot is reported and left out of both
+    assert list(errors) == ["CCC.SW"]
+    totals = summarize_lots(lots)
+    assert series['value'].iloc[-1] == pytest.approx(totals['value'], rel=1e-9)
+    assert series['flow'].sum() == pytest.approx(totals['cost'], rel=1e-9)
+
+
+@pytest.mark.parametrize("total_return", [False, True])
+def test_extending_across_new_actions_matches_a_rebuild(tmp_path, holdings, total_return):
+    store = PortfolioHistoryStore(str(tmp_path / "history.db"))
+    # Built before the dividend and the split, then extended after both
+    for cutoff in ["2024-03-01", "2024-04-15"]:
+        cache = cache_as_of(tmp_path / "prices.db", cutoff)
+        extended, _ = update_portfolio_history(holdings, cache, store,
+                                               valuation=Valuation(cache, total_return=total_return))
+        cache.close()
+    cache = cache_as_of(tmp_path / "prices.db", "2024-04-15")
+    rebuilt, _ = update_portfolio_history(holdings, cache, valuation=Valuation(cache, total_return=total_return))
+    cache.close()
+
+    assert list(extended.index) == list(rebuilt.index)
+    np.testing.assert_allclose(extended.to_numpy(), rebuilt.to_numpy(), rtol=1e-9)
+    assert store.load()[1].to_numpy() == pytest.approx(rebuilt.to_numpy(), rel=1e-9)
+
+
+def test_valuation_settings_are_part_of_the_fingerprint(tmp_path, holdings):
+    store = PortfolioHistoryStore(str(tmp_path / "history.db"))
+    cache = cache_as_of(tmp_path / "prices.db", "2024-04-15")
+    in_usd, _ = update_portfolio_history(holdings, cache, store, valuation=Valuation(cache))
+    in_eur, _ = update_portfolio_history(holdings, cache, store, valuation=Valuation(cache, base_currency="EUR"))
+    cache.close()
+
+    # Rebuilt in EUR, not extended from the USD rows
+    assert in_eur['value'].iloc[0] != pytest.approx(in_usd['value'].iloc[0])
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import AsOfProvider
+from price_cache import BAR_COLUMNS, PriceCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = PriceCache(str(tmp_path / "prices.db"), today_ttl=0)
+    yield cache
+    cache.close()
+
+
+def assert_same_bars(stored, expected):
+    assert list(stored.index.strftime("%Y-%m-%d")) == list(expected.index.strftime("%Y-%m-%d"))
+    np.testing.assert_allclose(stored[BAR_COLUMNS].to_numpy(), expected[BAR_COLUMNS].to_numpy(), rtol=1e-9)
+
+
+def test_incremental_refresh_only_fetches_new_bars(cache):
+    tickers = ["AAA", "BBB"]
+    cache.fetch_histories(tickers, start="2024-01-02", provider=AsOfProvider("2024-03-01"))
+    last_date = cache.last_bar_date("AAA")
+    assert last_date == "2024-03-01"
+
+    later = AsOfProvider("2024-04-15")
+    histories, errors = cache.fetch_histories(tickers, start="2024-01-02", provider=later)
+
+    assert errors == {}
+    # One bulk request from the last stored bar (re-fetched, it may have changed)
+    assert later.requests == [(("AAA", "BBB"), last_date)]
+    for ticker in tickers:
+        assert_same_bars(histories[ticker], later.series(ticker).loc["2024-01-02":])
+
+
+def test_cached_range_is_served_without_a_request(tmp_path):
+    cache = PriceCache(str(tmp_path / "prices.db"))
+    provider = AsOfProvider("2024-03-01")
+    cache.fetch_histories(["AAA"], start="2024-01-02", provider=provider)
+    histories, _ = cache.fetch_histories(["AAA"], start="2024-02-01", end="2024-03-01", provider=provider)
+    cache.close()
+
+    assert len(provider.requests) == 1
+    assert histories["AAA"].index[0] == pd.Timestamp("2024-02-01")
+    assert histories["AAA"].index[-1] < pd.Timestamp("2024-03-01")
+
+
+def test_new_split_and_dividend_rebase_stored_bars(cache):
+    actions = [("2024-03-12", 1.25, 1.0), ("2024-04-02", 0.0, 2.0)]
+    cache.fetch_histories(["AAA"], start="2024-01-02", provider=AsOfProvider("2024-03-01", actions))
+
+    later = AsOfProvider("2024-04-15", actions)
+    histories, _ = cache.fetch_histories(["AAA"], start="2024-01-02", provider=later)
+
+    # Bars stored before either action now match a full download made afterwards
+    assert_same_bars(histories["AAA"], later.series("AAA").loc["2024-01-02":])
+    stored = cache.actions(["AAA"])["AAA"]
+    assert list(stored.index.strftime("%Y-%m-%d")) == ["2024-03-12", "2024-04-02"]
+    assert list(stored['split']) == [1.0, 2.0]
+    assert stored['dividend'].iloc[0] == pytest.approx(1.25)
+
+
+def test_failed_refresh_still_serves_stored_bars(cache):
+    cache.fetch_histories(["AAA"], start="2024-01-02", provider=AsOfProvider("2024-03-01"))
+    failing = AsOfProvider("2024-04-15", error_rate=1.0)
+    histories, errors = cache.fetch_histories(["AAA"], start="2024-01-02", provider=failing)
+
+    assert errors == {}
+    assert histories["AAA"].index[-1] == pd.Timestamp("2024-03-01")
@@ -0,0 +1,100 @@
+import functools
+import multiprocessing
+import os
+import threading
+from datetime import datetime
+import numpy as np
+import pytest
+from fake_provider import SyntheticProvider
+from market_data import fetch_histories
+from process_pool import YTD_COLUMNS, ShardPool, SharedRows, _reduce_ytd, decode_ytd
+from tracker_core import iter_ytd
+
+TICKERS = [f"S{i:02d}" for i in range(12)]
+NOW = datetime(2024, 6, 3, 12, 0)
+PROVIDER = functools.partial(SyntheticProvider, seed=5, history_start="2023-06-01")
+
+
+class Source:
+    """fetch_histories() on a synthetic provider, noting the threads it ran on"""
+
+    def __init__(self):
+        self.provider = PROVIDER()
+        self.threads = set()
+
+    def fetch_histories(self, tickers, start=None, end=None):
+        self.threads.add(threading.current_thread().name)
+        return fetch_histories(tickers, start=start, end=end, provider=self.provider)
+
+
+def _reduce_or_die(source, block, *args):
+    # Kills the worker process, as an OOM kill would; runs normally in-process
+    if multiprocessing.parent_process() is not None:
+        os._exit(1)
+    return _reduce_ytd(source, block, *args)
+
+
+def expected_ytd():
+    return list(iter_ytd(TICKERS, Source(), now=NOW))
+
+
+def test_shared_rows_are_visible_through_the_segment_name():
+    block = SharedRows(3, 2)
+    try:
+        assert np.isnan(block.values).all() and (block.status == -1).all()
+        other = SharedRows(3, 2, name=block.name)
+        other.values[1] = [1.5, 2.5]
+        other.status[1] = 4
+        other.close()
+        assert block.values[1].tolist() == [1.5, 2.5]
+        assert block.status.tolist() == [-1, 4, -1]
+    finally:
+        block.close(unlink=True)
+
+
+def test_in_process_shards_match_iter_ytd_off_the_caller_thread():
+    source = Source()
+    pool = ShardPool(1, source=source, chunk_size=5)
+    try:
+        assert pool.in_process
+        results = [row for future in pool.submit_ytd(TICKERS, now=NOW) for row in future.result()]
+    finally:
+        pool.close()
+
+    assert results == expected_ytd()
+    assert threading.current_thread().name not in source.threads
+
+
+def test_worker_processes_match_iter_ytd():
+    pool = ShardPool(2, source_options={'use_cache': False}, provider_factory=PROVIDER, chunk_size=5)
+    try:
+        if pool.in_process:
+            pytest.skip(f"no process pool here: {pool.fallback_reason}")
+        results = [row for future in pool.submit_ytd(TICKERS, now=NOW) for row in future.result()]
+        assert not pool.in_process
+    finally:
+        pool.close()
+
+    assert results == expected_ytd()
+
+
+def test_broken_pool_redoes_shards_in_process():
+    source = Source()
+    pool = ShardPool(2, source=source, source_options={'use_cache': False},
+                     provider_factory=PROVIDER, chunk_size=5)
+    try:
+        if pool.in_process:
+            pytest.skip(f"no process pool here: {pool.fallback_reason}")
+        from market_data import ytd_range
+        start, end = ytd_range(NOW)
+        futures = [pool._submit(_reduce_or_die, len(shard), len(YTD_COLUMNS),
+                                (shard, start, end, 5),
+                                functools.partial(decode_ytd, shard))
+                   for shard in pool.shards(TICKERS)]
+        results = [row for future in futures for row in future.result(timeout=120)]
+    finally:
+        pool.close()
+
+    assert pool.in_process and "BrokenProcessPool" in pool.fallback_reason
+    assert results == expected_ytd()
+    assert source.threads and all(name.startswith("shard-local") for name in source.threads)
@@ -0,0 +1,63 @@
+from symbol_index import SymbolIndex
+
+
+def make_index():
+    return SymbolIndex([
+        ("AAPL", "Apple Inc.", "NASDAQ"),
+        ("MSFT", "Microsoft Corporation", "NASDAQ"),
+        ("VOD.L", "Vodafone Group", "LSE"),
+    ])
+
+
+def test_learned_tickers_do_not_cover_their_family():
+    index = make_index()
+    assert index.learn(["^GSPC", "EURUSD=X", "VOD.L"]) == 2
+
+    valid, problems = index.check(["^DJI", "GBPUSD=X", "^GSPC"])
+    assert valid == ["^DJI", "GBPUSD=X", "^GSPC"]
+    assert problems == {}
+
+
+def test_learned_tickers_survive_save_and_load(tmp_path):
+    index = make_index()
+    index.learn(["^GSPC"])
+    path = str(tmp_path / "symbols.csv")
+    index.save(path)
+
+    loaded = SymbolIndex.load(path)
+    assert "^GSPC" in loaded
+    assert loaded.check(["^DJI"]) == (["^DJI"], {})
+
+
+def test_check_normalizes_and_deduplicates():
+    index = make_index()
+    index.add([("BRK-B", "Berkshire Hathaway Inc. Class B", "NYSE")])
+    valid, problems = index.check(["$aapl ", "AAPL", "msft", "BRK.B", "  "])
+    assert valid == ["AAPL", "MSFT", "BRK-B"]
+    assert problems == {}
+
+
+def test_check_rejects_malformed_and_suggests_for_unknown():
+    valid, problems = make_index().check(["AAPL", "AAPL!", "APPL", "MSFX"])
+    assert valid == ["AAPL"]
+    assert problems == {
+        "AAPL!": "not a valid ticker",
+        "APPL": "unknown symbol (did you mean AAPL?)",
+        "MSFX": "unknown symbol (did you mean MSFT?)",
+    }
+
+
+def test_check_only_rejects_unknown_tickers_of_covered_families():
+    valid, problems = make_index().check(["0700.HK", "^GSPC", "EURUSD=X", "BARC.L", "ZZZZ"])
+    assert valid == ["0700.HK", "^GSPC", "EURUSD=X"]
+    assert set(problems) == {"BARC.L", "ZZZZ"}
+
+
+def test_check_allow_unknown_still_rejects_malformed():
+    valid, problems = make_index().check(["ZZZZ", "??"], allow_unknown=True)
+    assert valid == ["ZZZZ"]
+    assert problems == {"??": "not a valid ticker"}
+
+
+def test_empty_index_accepts_any_wellformed_ticker():
+    assert SymbolIndex().check(["ZZZZ", "^DJI"]) == (["ZZZZ", "^DJI"], {})
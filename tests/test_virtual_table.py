@@ -0,0 +1,58 @@
+import pytest
+
+# TableModel itself needs no display, but the module imports tkinter
+pytest.importorskip("tkinter")
+from virtual_table import TableModel, sort_key
+
+
+def model_of(*rows):
+    model = TableModel()
+    for ticker, price, change in rows:
+        model.append((ticker, price, change), key=ticker)
+    return model
+
+
+def column(model, index):
+    return [values[index] for _, values, _ in model.window(0, len(model))]
+
+
+def test_money_and_percentages_sort_as_numbers():
+    assert sort_key("$1,234.56") < sort_key("$10,000.00")
+    assert sort_key("-3.5%") < sort_key("+2.0%")
+    # Every base currency's symbol, including letter prefixes
+    assert sort_key("€-3.10") < sort_key("£2.00") < sort_key("CHF 12.00") < sort_key("HK$1,000.00")
+    assert sort_key("kr 5.00") == (0, 5.0, '')
+    assert sort_key("N/A")[0] == 1
+
+
+def test_sorting_keeps_text_rows_at_the_bottom_both_ways():
+    model = model_of(("AAA", "$9.50", "+1.0%"), ("BBB", "N/A", "N/A"), ("CCC", "$1,200.00", "-2.5%"),
+                     ("DDD", "Error", "Error"), ("EEE", "$80.00", "+0.1%"))
+    model.sort(1)
+    assert column(model, 0) == ["AAA", "EEE", "CCC", "DDD", "BBB"]
+    model.sort(2, reverse=True)
+    assert column(model, 0) == ["AAA", "EEE", "CCC", "DDD", "BBB"]
+    model.sort(2)
+    assert column(model, 0) == ["CCC", "EEE", "AAA", "DDD", "BBB"]
+
+
+def test_updates_move_rows_on_the_next_read():
+    model = model_of(("AAA", "$1.00", ""), ("BBB", "$2.00", ""), ("CCC", "$3.00", ""))
+    model.sort(1)
+    assert model.update("AAA", ("AAA", "$5.00", ""), ("gain",))
+    assert not model.update("BBB", ("BBB", "$2.00", ""))
+
+    assert column(model, 0) == ["BBB", "CCC", "AAA"]
+    assert model.get("AAA") == (("AAA", "$5.00", ""), ("gain",))
+    assert model.window(1, 5) == [["CCC", ("CCC", "$3.00", ""), ()], ["AAA", ("AAA", "$5.00", ""), ("gain",)]]
+
+
+def test_rows_appended_after_a_sort_are_sorted_in():
+    model = model_of(("AAA", "$3.00", ""), ("BBB", "$1.00", ""))
+    model.sort(1)
+    key = model.append(("CCC", "$2.00", ""))
+
+    assert column(model, 0) == ["BBB", "CCC", "AAA"]
+    assert key in model and len(model) == 3
+    model.clear()
+    assert len(model) == 0 and key not in model
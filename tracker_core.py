@@ -0,0 +1,109 @@
+# Fetch and compute logic shared by the GUI and the command line.
+# Nothing here imports tkinter, so it runs on servers without a display.
+import numpy as np
+from market_data import DEFAULT_CHUNK_SIZE, chunked, unique_tickers, ytd_range
+from portfolio import value_holdings
+from instrumentation import tracer
+from symbol_index import normalize_ticker
+
+
+def make_source(use_cache=True, cache_path=None, archive_path=None):
+    """Price source with the same fetch_histories() contract as market_data.
+
+    With use_cache the SQLite store and in-memory LRU sit in front of the
+    provider; without it every call goes to the network. With archive_path
+    symbols are served from a memory-mapped price archive first
+    (compact_series.write_archive) and only the rest use the source above.
+    """
+    if not use_cache:
+        import market_data
+        source = market_data
+    else:
+        from price_cache import DEFAULT_CACHE_PATH, PriceCache
+        from history_cache import HistoryCache
+        # Open is kept so "% since open" alerts measure from the real open
+        source = HistoryCache(PriceCache(cache_path or DEFAULT_CACHE_PATH), keep_ohlc=True)
+
+    if archive_path:
+        from compact_series import PriceArchive
+        source = PriceArchive(archive_path, fallback=source)
+    return source
+
+
+def parse_tickers(text):
+    """Split a comma-separated ticker string into unique normalized symbols,
+    so "aapl, AAPL, $AAPL" is fetched once"""
+    return unique_tickers([normalize_ticker(ticker) for ticker in text.split(",")])
+
+
+def ytd_result(ticker, hist, error=None):
+    """YTD figures for one ticker from its history since Jan 1.
+
+    status is 'UP', 'DOWN', 'FLAT', 'NO DATA' or 'ERROR'; prices are None
+    unless there is data. session_open (the latest bar's open; None for
+    close-only histories) and high (highest close) are the references
+    price alerts measure from.
+    """
+    result = {
+        'ticker': ticker,
+        'current_price': None,
+        'ytd_start_price': None,
+        'ytd_change_pct': None,
+        'session_open': None,
+        'high': None,
+        'status': 'ERROR',
+        'error': error,
+    }
+    if error is not None:
+        return result
+    if hist is None or hist.empty:
+        result['status'] = 'NO DATA'
+        return result
+
+    ytd_start_price = float(hist['Close'].iloc[0])
+    current_price = float(hist['Close'].iloc[-1])
+    ytd_change = ((current_price - ytd_start_price) / ytd_start_price) * 100
+    result.update(
+        session_open=float(hist['Open'].iloc[-1]) if 'Open' in hist.columns else None,
+        high=float(hist['Close'].max()),
+        current_price=current_price,
+        ytd_start_price=ytd_start_price,
+        ytd_change_pct=ytd_change,
+        status='UP' if ytd_change > 0 else 'DOWN' if ytd_change < 0 else 'FLAT',
+    )
+    return result
+
+
+def iter_ytd(tickers, source, chunk_size=DEFAULT_CHUNK_SIZE, now=None):
+    """Yield a ytd_result() per ticker, fetching a chunk at a time"""
+    ytd_start, end = ytd_range(now)
+    for chunk in chunked(unique_tickers(tickers), chunk_size):
+        histories, errors = source.fetch_histories(chunk, start=ytd_start, end=end)
+        for ticker in chunk:
+            with tracer.span("ytd_result", "compute", symbol=ticker):
+                result = ytd_result(ticker, histories.get(ticker), errors.get(ticker))
+            yield result
+
+
+def iter_portfolio(holdings, source, chunk_size=DEFAULT_CHUNK_SIZE, valuation=None):
+    """Yield (lots, errors) per chunk of symbols.
+
+    Each symbol is fetched once from its earliest purchase date and all of
+    its lots are valued together with value_holdings(). With a valuation
+    (corporate_actions.Valuation) lots are split-, dividend- and
+    currency-adjusted as well.
+    """
+    earliest_dates = holdings.earliest_dates()
+    for chunk in chunked(list(earliest_dates), chunk_size):
+        start = min(earliest_dates[ticker] for ticker in chunk)
+        histories, errors = source.fetch_histories(chunk, start=start)
+        chunk_ids = [holdings.symbol_ids[ticker] for ticker in chunk]
+        with tracer.span("value_holdings", "compute", symbols=len(chunk)) as span:
+            lots, _ = value_holdings(holdings, histories, errors,
+                                     mask=np.isin(holdings.ticker_ids, chunk_ids))
+            span['lots'] = len(lots)
+        if valuation is not None:
+            with tracer.span("valuation", "compute", lots=len(lots)):
+                lots, valuation_errors = valuation.apply(lots, histories)
+            errors = {**errors, **valuation_errors}
+        yield lots, errors
@@ -0,0 +1,247 @@
+import itertools
+import tkinter as tk
+from tkinter import ttk
+from instrumentation import tracer
+from corporate_actions import CURRENCY_SYMBOLS
+
+# Prefixes amounts are shown with in any base currency, longest first ("HK$" before "$")
+MONEY_PREFIXES = sorted(set(CURRENCY_SYMBOLS.values()) | {'$'}, key=len, reverse=True)
+
+
+def sort_key(value):
+    """Sort numbers (including "$1,234.56", "€-3.10" and "+3.2%") numerically, then text"""
+    text = str(value).strip()
+    for prefix in MONEY_PREFIXES:
+        if text.startswith(prefix):
+            text = text[len(prefix):]
+            break
+    text = text.replace('$', '').replace(',', '').replace('%', '').replace('+', '').strip()
+    try:
+        return (0, float(text), '')
+    except ValueError:
+        return (1, 0.0, str(value))
+
+
+class TableModel:
+    """Backing rows for a VirtualTreeview: (key, values, tags) in display order"""
+
+    def __init__(self):
+        self.rows = []
+        self.positions = {}
+        self.sort_column = None
+        self.sort_reverse = False
+        self._sorted = True
+        self._keys = itertools.count()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def append(self, values, tags=(), key=None):
+        if key is None:
+            key = f"r{next(self._keys)}"
+        self.positions[key] = len(self.rows)
+        self.rows.append([key, tuple(values), tuple(tags)])
+        self._sorted = self.sort_column is None
+        return key
+
+    def update(self, key, values=None, tags=None):
+        """Change one row in place; returns True if anything changed"""
+        row = self.rows[self.positions[key]]
+        changed = False
+        if values is not None and tuple(values) != row[1]:
+            row[1] = tuple(values)
+            changed = True
+        if tags is not None and tuple(tags) != row[2]:
+            row[2] = tuple(tags)
+            changed = True
+        if changed and self.sort_column is not None:
+            self._sorted = False
+        return changed
+
+    def get(self, key):
+        row = self.rows[self.positions[key]]
+        return row[1], row[2]
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def clear(self):
+        self.rows = []
+        self.positions = {}
+        self._sorted = True
+
+    def sort(self, column, reverse=False):
+        self.sort_column = column
+        self.sort_reverse = reverse
+        self._sorted = False
+        self.ensure_sorted()
+
+    def ensure_sorted(self):
+        if self._sorted:
+            return
+        column = self.sort_column
+        keyed = [(sort_key(row[1][column]) if column < len(row[1]) else (2, 0.0, ''), row)
+                 for row in self.rows]
+        # Numbers sort in the requested direction; "N/A"/"Error" rows stay at the bottom
+        numeric = [item for item in keyed if item[0][0] == 0]
+        other = [item for item in keyed if item[0][0] != 0]
+        numeric.sort(key=lambda item: item[0], reverse=self.sort_reverse)
+        other.sort(key=lambda item: item[0])
+        self.rows = [row for _, row in numeric + other]
+        self.positions = {row[0]: i for i, row in enumerate(self.rows)}
+        self._sorted = True
+
+    def window(self, start, count):
+        self.ensure_sorted()
+        return self.rows[start:start + count]
+
+
+class VirtualTreeview:
+    """A Treeview that only materializes the rows currently in view.
+
+    Rows live in a TableModel. The widget holds a fixed set of item slots
+    (one per visible line) and scrolling just rebinds those slots to a
+    different window of the model, writing values with item(...) only
+    where a cell actually changed. Inserts and updates are batched into a
+    single redraw on the next idle. Clicking a heading sorts the model.
+    """
+
+    def __init__(self, parent, columns, height=15, row_height=30):
+        self.columns = tuple(columns)
+        self.model = TableModel()
+        self.row_height = row_height
+        self.offset = 0
+        self.slots = []
+        self.shown = {}
+        self._redraw_pending = False
+
+        self.tree = ttk.Treeview(parent, columns=self.columns, show="headings", height=height)
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self._resize_slots(height)
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self._scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda e: self._scroll_by(3))
+
+    # Treeview passthroughs used when setting up the table
+    def heading(self, column, text=None, **kwargs):
+        if text is not None:
+            kwargs['text'] = text
+        kwargs.setdefault('command', lambda c=column: self.sort_by(c))
+        return self.tree.heading(column, **kwargs)
+
+    def column(self, column, **kwargs):
+        return self.tree.column(column, **kwargs)
+
+    def tag_configure(self, tag, **kwargs):
+        return self.tree.tag_configure(tag, **kwargs)
+
+    # Row API
+    def insert(self, parent, index, values=(), tags=(), iid=None):
+        """Append a row to the model (parent and index are accepted for Treeview compatibility)"""
+        key = self.model.append(values, tags, key=iid)
+        self.schedule_redraw()
+        return key
+
+    def update_row(self, key, values=None, tags=None):
+        if self.model.update(key, values, tags):
+            self.schedule_redraw()
+
+    def exists(self, key):
+        return key in self.model
+
+    def clear(self):
+        self.model.clear()
+        self.offset = 0
+        self.schedule_redraw()
+
+    def __len__(self):
+        return len(self.model)
+
+    def selected_keys(self):
+        """Model keys of the rows currently selected in the view"""
+        rows = self.model.window(self.offset, len(self.slots))
+        keys = []
+        for slot in self.tree.selection():
+            position = self.slots.index(slot) if slot in self.slots else len(rows)
+            if position < len(rows):
+                keys.append(rows[position][0])
+        return keys
+
+    def sort_by(self, column):
+        index = self.columns.index(column)
+        reverse = self.model.sort_column == index and not self.model.sort_reverse
+        self.model.sort(index, reverse)
+        for i, name in enumerate(self.columns):
+            arrow = (" ▼" if reverse else " ▲") if i == index else ""
+            self.tree.heading(name, text=name + arrow)
+        self.schedule_redraw()
+
+    # Scrolling
+    def yview(self, *args):
+        if not args:
+            return
+        if args[0] == 'moveto':
+            self.offset = int(float(args[1]) * len(self.model))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= max(1, len(self.slots) - 1)
+            self.offset += step
+        self.redraw()
+
+    def _scroll_by(self, lines):
+        self.offset += lines
+        self.redraw()
+        return "break"
+
+    def _on_mousewheel(self, event):
+        return self._scroll_by(-1 if event.delta > 0 else 1)
+
+    def _on_configure(self, event):
+        visible = max(1, (event.height - self.row_height) // self.row_height)
+        if visible != len(self.slots):
+            self._resize_slots(visible)
+            self.redraw()
+
+    def _resize_slots(self, count):
+        while len(self.slots) < count:
+            self.slots.append(self.tree.insert("", tk.END, values=(), tags=()))
+        while len(self.slots) > count:
+            slot = self.slots.pop()
+            self.tree.delete(slot)
+            self.shown.pop(slot, None)
+
+    # Rendering
+    def schedule_redraw(self):
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.tree.after_idle(self.redraw)
+
+    def redraw(self):
+        self._redraw_pending = False
+        total = len(self.model)
+        visible = len(self.slots)
+        self.offset = max(0, min(self.offset, total - visible))
+
+        with tracer.span("treeview.redraw", "render", rows=total) as span:
+            rows = self.model.window(self.offset, visible)
+            written = 0
+            for i, slot in enumerate(self.slots):
+                if i < len(rows):
+                    _, values, tags = rows[i]
+                else:
+                    values, tags = ("",) * len(self.columns), ()
+                if self.shown.get(slot) != (values, tags):
+                    self.tree.item(slot, values=values, tags=tags)
+                    self.shown[slot] = (values, tags)
+                    written += 1
+            span['cells_written'] = written
+
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)